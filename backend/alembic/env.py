@@ -8,9 +8,7 @@ from alembic import context
 
 # Import your models here
 from app.db.database import Base
-from app.models.base import BaseModel  # Import all your models
-from app.models.user import User  # Import User model
-from app.models.project import Project
+import app.models  # noqa: F401 - регистрирует все модели в Base.metadata
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
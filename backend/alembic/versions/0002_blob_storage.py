@@ -0,0 +1,135 @@
+"""move defect photos and images to blob storage
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 22:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.services.storage import get_blob_store
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько BLOB-ов читаем из базы за один запрос
+BATCH_SIZE = 50
+
+
+def _mime_type(stored) -> str:
+    # Раньше всё отдавалось как image/jpeg - оставляем это значение для неизвестных форматов
+    if stored.mime_type == "application/octet-stream":
+        return "image/jpeg"
+    return stored.mime_type
+
+
+def _move_blobs_out(bind, table: str, data_column: str, columns: dict) -> None:
+    store = get_blob_store()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                f"SELECT id, {data_column} AS data FROM {table} "
+                f"WHERE {data_column} IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            stored = store.put(bytes(row.data))
+            bind.execute(
+                sa.text(
+                    f"UPDATE {table} SET {columns['key']} = :key, {columns['size']} = :size, "
+                    f"{columns['mime_type']} = :mime_type, {columns['sha256']} = :sha256 WHERE id = :id"
+                ),
+                {
+                    "key": stored.key,
+                    "size": stored.size,
+                    "mime_type": _mime_type(stored),
+                    "sha256": stored.sha256,
+                    "id": row.id,
+                },
+            )
+        last_id = rows[-1].id
+
+
+def _move_blobs_in(bind, table: str, data_column: str, key_column: str) -> None:
+    store = get_blob_store()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                f"SELECT id, {key_column} AS key FROM {table} "
+                f"WHERE {key_column} IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            bind.execute(
+                sa.text(f"UPDATE {table} SET {data_column} = :data WHERE id = :id"),
+                {"data": store.read(row.key), "id": row.id},
+            )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if context.is_offline_mode():
+        raise RuntimeError("Миграция переносит файлы в хранилище и не поддерживает --sql режим")
+
+    op.add_column('defects', sa.Column('photo_key', sa.String(length=255), nullable=True))
+    op.add_column('defects', sa.Column('photo_size', sa.BigInteger(), nullable=True))
+    op.add_column('defects', sa.Column('photo_mime_type', sa.String(length=100), nullable=True))
+    op.add_column('defects', sa.Column('photo_sha256', sa.String(length=64), nullable=True))
+    op.add_column('defect_images', sa.Column('storage_key', sa.String(length=255), nullable=True))
+    op.add_column('defect_images', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('defect_images', sa.Column('mime_type', sa.String(length=100), nullable=True))
+    op.add_column('defect_images', sa.Column('sha256', sa.String(length=64), nullable=True))
+
+    bind = op.get_bind()
+    _move_blobs_out(bind, 'defects', 'photo', {
+        'key': 'photo_key', 'size': 'photo_size', 'mime_type': 'photo_mime_type', 'sha256': 'photo_sha256',
+    })
+    _move_blobs_out(bind, 'defect_images', 'image_data', {
+        'key': 'storage_key', 'size': 'size', 'mime_type': 'mime_type', 'sha256': 'sha256',
+    })
+
+    op.alter_column('defect_images', 'storage_key', nullable=False)
+    op.alter_column('defect_images', 'size', nullable=False)
+    op.alter_column('defect_images', 'mime_type', nullable=False)
+    op.alter_column('defect_images', 'sha256', nullable=False)
+    op.drop_column('defects', 'photo')
+    op.drop_column('defect_images', 'image_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if context.is_offline_mode():
+        raise RuntimeError("Миграция переносит файлы из хранилища и не поддерживает --sql режим")
+
+    op.add_column('defects', sa.Column('photo', sa.LargeBinary(), nullable=True))
+    op.add_column('defect_images', sa.Column('image_data', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    _move_blobs_in(bind, 'defects', 'photo', 'photo_key')
+    _move_blobs_in(bind, 'defect_images', 'image_data', 'storage_key')
+
+    op.alter_column('defect_images', 'image_data', nullable=False)
+    op.drop_column('defect_images', 'sha256')
+    op.drop_column('defect_images', 'mime_type')
+    op.drop_column('defect_images', 'size')
+    op.drop_column('defect_images', 'storage_key')
+    op.drop_column('defects', 'photo_sha256')
+    op.drop_column('defects', 'photo_mime_type')
+    op.drop_column('defects', 'photo_size')
+    op.drop_column('defects', 'photo_key')
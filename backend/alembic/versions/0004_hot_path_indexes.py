@@ -0,0 +1,65 @@
+"""hot path indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 23:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_defect_comments_defect_id', 'defect_comments', ['defect_id', 'created_at'], unique=False)
+    op.create_index('ix_defect_history_defect_id', 'defect_history', ['defect_id', 'created_at'], unique=False)
+    op.create_index('ix_defect_images_defect_id', 'defect_images', ['defect_id'], unique=False)
+    op.create_index('ix_defect_images_storage_key', 'defect_images', ['storage_key'], unique=False)
+    op.create_index('ix_defect_users_defect_id', 'defect_users', ['defect_id'], unique=False)
+    op.create_index('ix_defects_closed_updated_at', 'defects', ['updated_at'], unique=False, postgresql_where=sa.text("status = 'CLOSED'"))
+    op.create_index('ix_defects_created_at', 'defects', ['created_at', 'id'], unique=False)
+    op.create_index('ix_defects_due_date', 'defects', ['due_date'], unique=False, postgresql_where=sa.text('due_date IS NOT NULL'))
+    op.create_index('ix_defects_object_id_created_at', 'defects', ['object_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_defects_photo_key', 'defects', ['photo_key'], unique=False, postgresql_where=sa.text('photo_key IS NOT NULL'))
+    op.create_index('ix_defects_status_created_at', 'defects', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_defects_updated_at', 'defects', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_image_variants_storage_key', 'image_variants', ['storage_key'], unique=False)
+    op.create_index('ix_objects_project_id', 'objects', ['project_id'], unique=False)
+    op.create_index('ix_project_users_project_id', 'project_users', ['project_id'], unique=False)
+    # Регистрация проверяла ник без блокировки - дубликаты надо разобрать вручную до миграции
+    if not context.is_offline_mode():
+        duplicates = op.get_bind().execute(sa.text(
+            "SELECT nickname FROM users GROUP BY nickname HAVING count(*) > 1"
+        )).scalars().all()
+        if duplicates:
+            raise RuntimeError(f"Повторяющиеся ники пользователей: {', '.join(duplicates)}")
+    op.create_index(op.f('ix_users_nickname'), 'users', ['nickname'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_nickname'), table_name='users')
+    op.drop_index('ix_project_users_project_id', table_name='project_users')
+    op.drop_index('ix_objects_project_id', table_name='objects')
+    op.drop_index('ix_image_variants_storage_key', table_name='image_variants')
+    op.drop_index('ix_defects_updated_at', table_name='defects')
+    op.drop_index('ix_defects_status_created_at', table_name='defects')
+    op.drop_index('ix_defects_photo_key', table_name='defects', postgresql_where=sa.text('photo_key IS NOT NULL'))
+    op.drop_index('ix_defects_object_id_created_at', table_name='defects')
+    op.drop_index('ix_defects_due_date', table_name='defects', postgresql_where=sa.text('due_date IS NOT NULL'))
+    op.drop_index('ix_defects_created_at', table_name='defects')
+    op.drop_index('ix_defects_closed_updated_at', table_name='defects', postgresql_where=sa.text("status = 'CLOSED'"))
+    op.drop_index('ix_defect_users_defect_id', table_name='defect_users')
+    op.drop_index('ix_defect_images_storage_key', table_name='defect_images')
+    op.drop_index('ix_defect_images_defect_id', table_name='defect_images')
+    op.drop_index('ix_defect_history_defect_id', table_name='defect_history')
+    op.drop_index('ix_defect_comments_defect_id', table_name='defect_comments')
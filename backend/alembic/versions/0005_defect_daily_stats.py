@@ -0,0 +1,48 @@
+"""defect daily stats
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 23:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('defect_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='defectstatus', create_type=False), nullable=False),
+    sa.Column('priority', postgresql.ENUM(name='defectpriority', create_type=False), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False),
+    sa.Column('entered', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['object_id'], ['objects.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'project_id', 'object_id', 'status', 'priority', name='uq_defect_daily_stat')
+    )
+    op.create_index(op.f('ix_defect_daily_stats_id'), 'defect_daily_stats', ['id'], unique=False)
+    op.create_index('ix_defect_daily_stats_project_id_day', 'defect_daily_stats', ['project_id', 'day'], unique=False)
+
+    # Таблица заполняется по накопленным дефектам и истории в 0012: текущий backfill пишет и её столбцы
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_defect_daily_stats_project_id_day', table_name='defect_daily_stats')
+    op.drop_index(op.f('ix_defect_daily_stats_id'), table_name='defect_daily_stats')
+    op.drop_table('defect_daily_stats')
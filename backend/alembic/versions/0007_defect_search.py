@@ -0,0 +1,113 @@
+"""defect search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Поисковый документ дефекта: название (A), описание (B), комментарии (C), название и адрес объекта (D)
+SEARCH_DOCUMENT_FUNCTION = """
+CREATE FUNCTION defect_search_document(d_id integer, d_title text, d_description text, d_object_id integer)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(d_title, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(d_description, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(
+            (SELECT string_agg(content, ' ' ORDER BY id) FROM defect_comments WHERE defect_id = d_id), '')), 'C')
+        || setweight(to_tsvector('russian', coalesce(
+            (SELECT concat_ws(' ', name, address) FROM objects WHERE id = d_object_id), '')), 'D')
+$$
+"""
+
+DEFECTS_TRIGGER = """
+CREATE FUNCTION defects_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := defect_search_document(NEW.id, NEW.title, NEW.description, NEW.object_id);
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER defects_search_vector BEFORE INSERT OR UPDATE OF title, description, object_id ON defects
+    FOR EACH ROW EXECUTE FUNCTION defects_search_vector_update();
+"""
+
+# Триггеры на уровне оператора: пакетная вставка комментариев пересчитывает каждый дефект один раз
+COMMENTS_TRIGGERS = """
+CREATE FUNCTION defect_comments_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE defects SET search_vector = defect_search_document(id, title, description, object_id)
+    WHERE id IN (SELECT DISTINCT defect_id FROM changed_rows);
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER defect_comments_search_vector_insert AFTER INSERT ON defect_comments
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_comments_search_vector_update();
+CREATE TRIGGER defect_comments_search_vector_update AFTER UPDATE ON defect_comments
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_comments_search_vector_update();
+CREATE TRIGGER defect_comments_search_vector_delete AFTER DELETE ON defect_comments
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_comments_search_vector_update();
+"""
+
+OBJECTS_TRIGGER = """
+CREATE FUNCTION objects_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE defects SET search_vector = defect_search_document(id, title, description, object_id)
+    WHERE object_id = NEW.id;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER objects_search_vector AFTER UPDATE OF name, address ON objects
+    FOR EACH ROW WHEN ((OLD.name, OLD.address) IS DISTINCT FROM (NEW.name, NEW.address))
+    EXECUTE FUNCTION objects_search_vector_update();
+"""
+
+
+def _has_pg_trgm() -> bool:
+    if context.is_offline_mode():
+        return True
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')"
+    )).scalar()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('defects', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(SEARCH_DOCUMENT_FUNCTION)
+    op.execute(DEFECTS_TRIGGER)
+    op.execute(COMMENTS_TRIGGERS)
+    op.execute(OBJECTS_TRIGGER)
+    op.execute("UPDATE defects SET search_vector = defect_search_document(id, title, description, object_id)")
+    op.create_index('ix_defects_search_vector', 'defects', ['search_vector'], unique=False, postgresql_using='gin')
+    # Поиск по части слова работает и без pg_trgm, но тогда ILIKE читает таблицу целиком
+    if _has_pg_trgm():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index('ix_defects_title_trgm', 'defects', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_defects_title_trgm")
+    op.drop_index('ix_defects_search_vector', table_name='defects', postgresql_using='gin')
+    op.execute("DROP TRIGGER objects_search_vector ON objects")
+    op.execute("DROP TRIGGER defect_comments_search_vector_insert ON defect_comments")
+    op.execute("DROP TRIGGER defect_comments_search_vector_update ON defect_comments")
+    op.execute("DROP TRIGGER defect_comments_search_vector_delete ON defect_comments")
+    op.execute("DROP TRIGGER defects_search_vector ON defects")
+    op.execute("DROP FUNCTION objects_search_vector_update()")
+    op.execute("DROP FUNCTION defect_comments_search_vector_update()")
+    op.execute("DROP FUNCTION defects_search_vector_update()")
+    op.execute("DROP FUNCTION defect_search_document(integer, text, text, integer)")
+    op.drop_column('defects', 'search_vector')
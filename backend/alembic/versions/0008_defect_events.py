@@ -0,0 +1,75 @@
+"""defect events
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 02:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# NOTIFY уходит при коммите транзакции, вставившей событие. Полезная нагрузка NOTIFY ограничена 8000 байт -
+# слишком большое событие рассылается без data, клиент при необходимости перечитает дефект сам
+NOTIFY_TRIGGER = """
+CREATE FUNCTION defect_events_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    event record;
+    payload text;
+BEGIN
+    FOR event IN SELECT * FROM new_rows ORDER BY id LOOP
+        payload := json_build_object(
+            'id', event.id, 'kind', event.kind, 'project_id', event.project_id, 'defect_id', event.defect_id,
+            'user_id', event.user_id, 'data', event.data, 'created_at', event.created_at
+        )::text;
+        IF octet_length(payload) > 7900 THEN
+            payload := json_build_object(
+                'id', event.id, 'kind', event.kind, 'project_id', event.project_id, 'defect_id', event.defect_id,
+                'user_id', event.user_id, 'data', NULL, 'created_at', event.created_at
+            )::text;
+        END IF;
+        PERFORM pg_notify('defect_events', payload);
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER defect_events_notify AFTER INSERT ON defect_events
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_events_notify();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('defect_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('defect_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_defect_events_created_at', 'defect_events', ['created_at'], unique=False)
+    op.create_index('ix_defect_events_defect_id_id', 'defect_events', ['defect_id', 'id'], unique=False)
+    op.create_index('ix_defect_events_project_id_id', 'defect_events', ['project_id', 'id'], unique=False)
+    op.execute(NOTIFY_TRIGGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER defect_events_notify ON defect_events")
+    op.execute("DROP FUNCTION defect_events_notify()")
+    op.drop_index('ix_defect_events_project_id_id', table_name='defect_events')
+    op.drop_index('ix_defect_events_defect_id_id', table_name='defect_events')
+    op.drop_index('ix_defect_events_created_at', table_name='defect_events')
+    op.drop_table('defect_events')
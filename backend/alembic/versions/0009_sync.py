@@ -0,0 +1,136 @@
+"""incremental sync
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 03:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SYNC_TABLES = ('objects', 'defects', 'defect_comments', 'defect_history', 'defect_images')
+
+# change_seq - 64-битный номер транзакции, которая последней записала строку. В отличие от обычной
+# последовательности он позволяет выдать клиенту токен, который не пропустит транзакции, закоммиченные
+# не по порядку (см. app.services.sync)
+CHANGE_SEQ_FUNCTION = """
+CREATE FUNCTION sync_change_seq() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_seq := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$;
+"""
+
+# Назначения хранятся отдельно - их изменение отмечается в самом дефекте
+DEFECT_USERS_TRIGGERS = """
+CREATE FUNCTION defect_users_sync_touch() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE defects SET change_seq = pg_current_xact_id()::text::bigint
+    WHERE id IN (SELECT DISTINCT defect_id FROM changed_rows)
+        AND change_seq <> pg_current_xact_id()::text::bigint;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER defect_users_sync_insert AFTER INSERT ON defect_users
+    REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_users_sync_touch();
+CREATE TRIGGER defect_users_sync_delete AFTER DELETE ON defect_users
+    REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_users_sync_touch();
+"""
+
+# Записи об удалении. Комментарии и история удаляются только вместе с дефектом, для них записи не нужны
+TOMBSTONE_TRIGGERS = """
+CREATE FUNCTION objects_sync_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entity, entity_id, project_id)
+    SELECT 'objects', id, project_id FROM old_rows;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER objects_sync_tombstone AFTER DELETE ON objects
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION objects_sync_tombstone();
+
+CREATE FUNCTION defects_sync_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entity, entity_id, project_id)
+    SELECT 'defects', old_rows.id, objects.project_id
+    FROM old_rows LEFT JOIN objects ON objects.id = old_rows.object_id;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER defects_sync_tombstone AFTER DELETE ON defects
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION defects_sync_tombstone();
+
+CREATE FUNCTION defect_images_sync_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO sync_tombstones (entity, entity_id, project_id)
+    SELECT 'images', old_rows.id, objects.project_id
+    FROM old_rows
+    LEFT JOIN defects ON defects.id = old_rows.defect_id
+    LEFT JOIN objects ON objects.id = defects.object_id;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER defect_images_sync_tombstone AFTER DELETE ON defect_images
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION defect_images_sync_tombstone();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CHANGE_SEQ_FUNCTION)
+    for table in SYNC_TABLES:
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), nullable=True))
+        op.execute(f"UPDATE {table} SET change_seq = pg_current_xact_id()::text::bigint")
+        op.alter_column(table, 'change_seq', nullable=False)
+        op.execute(
+            f"CREATE TRIGGER {table}_change_seq BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION sync_change_seq()"
+        )
+        op.create_index(f'ix_{table}_change_seq', table, ['change_seq', 'id'], unique=False)
+    op.execute(DEFECT_USERS_TRIGGERS)
+
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('change_seq', sa.BigInteger(), server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_tombstones_change_seq', 'sync_tombstones', ['change_seq', 'id'], unique=False)
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'], unique=False)
+    op.execute(TOMBSTONE_TRIGGERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER defect_images_sync_tombstone ON defect_images")
+    op.execute("DROP TRIGGER defects_sync_tombstone ON defects")
+    op.execute("DROP TRIGGER objects_sync_tombstone ON objects")
+    op.execute("DROP FUNCTION defect_images_sync_tombstone()")
+    op.execute("DROP FUNCTION defects_sync_tombstone()")
+    op.execute("DROP FUNCTION objects_sync_tombstone()")
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_change_seq', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+
+    op.execute("DROP TRIGGER defect_users_sync_delete ON defect_users")
+    op.execute("DROP TRIGGER defect_users_sync_insert ON defect_users")
+    op.execute("DROP FUNCTION defect_users_sync_touch()")
+    for table in SYNC_TABLES:
+        op.drop_index(f'ix_{table}_change_seq', table_name=table)
+        op.execute(f"DROP TRIGGER {table}_change_seq ON {table}")
+        op.drop_column(table, 'change_seq')
+    op.execute("DROP FUNCTION sync_change_seq()")
@@ -0,0 +1,42 @@
+"""defect events xact id
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Уже записанные события получают номер транзакции миграции - переподключившиеся клиенты
+    # один раз дочитают их повторно
+    op.add_column('defect_events', sa.Column(
+        'xact_id', sa.BigInteger(), server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=False
+    ))
+    op.drop_index('ix_defect_events_project_id_id', table_name='defect_events')
+    op.drop_index('ix_defect_events_defect_id_id', table_name='defect_events')
+    op.create_index('ix_defect_events_xact_id', 'defect_events', ['xact_id'], unique=False)
+    op.create_index('ix_defect_events_project_id_xact_id', 'defect_events', ['project_id', 'xact_id'], unique=False)
+    op.create_index('ix_defect_events_defect_id_xact_id', 'defect_events', ['defect_id', 'xact_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_defect_events_defect_id_xact_id', table_name='defect_events')
+    op.drop_index('ix_defect_events_project_id_xact_id', table_name='defect_events')
+    op.drop_index('ix_defect_events_xact_id', table_name='defect_events')
+    op.create_index('ix_defect_events_defect_id_id', 'defect_events', ['defect_id', 'id'], unique=False)
+    op.create_index('ix_defect_events_project_id_id', 'defect_events', ['project_id', 'id'], unique=False)
+    op.drop_column('defect_events', 'xact_id')
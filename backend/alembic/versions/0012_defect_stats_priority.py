@@ -0,0 +1,36 @@
+"""defect stats priority changes
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.services.defect_stats import backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('defect_daily_stats', sa.Column('reprioritized', sa.Integer(), server_default='0', nullable=False))
+
+    # Пересчёт по накопленным дефектам и истории: смены приоритета и приоритет на момент каждого события
+    if context.is_offline_mode():
+        op.execute(sa.text("-- после миграции выполните: python -m app.services.defect_stats backfill"))
+    else:
+        backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('defect_daily_stats', 'reprioritized')
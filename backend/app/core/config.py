@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import List, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -10,6 +11,111 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str = "your-secret-key-here-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 30
+    # Кэш пользователей (id, роль, проекты) по subject токена
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL: int = 60
+    # Кэш ответов справочных эндпоинтов: "memory" (в процессе), "redis" (общий, нужен redis) или "none"
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_SIZE: int = 512
+    RESPONSE_CACHE_TTL: int = 300
+    RESPONSE_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Хеширование паролей: "bcrypt" или "argon2id" (нужен argon2-cffi).
+    # При смене алгоритма или стоимости хеш пересчитывается при следующем входе
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    # Процессы для хеширования (0 - по числу CPU) и сколько запросов может ждать в очереди
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+
+    # Пул соединений с БД
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Ограничение времени одного SQL-запроса из API, мс (0 - без ограничения)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Подключение через PgBouncer (transaction pooling): без prepared statements и своего пула
+    DB_PGBOUNCER: bool = False
+
+    # Журнал приложения: "json" (одна строка JSON на запись, с id запроса) или "text"
+    LOG_FORMAT: str = "json"
+    LOG_LEVEL: str = "INFO"
+    # Запросы к БД дольше этого попадают в журнал app.slow_query, мс (0 - не писать)
+    SLOW_QUERY_MS: int = 500
+    # Режим разработки: заголовок X-DB-Queries и журнал app.n_plus_one для запросов к БД,
+    # повторённых за один HTTP-запрос не меньше QUERY_DEBUG_REPEAT_THRESHOLD раз
+    QUERY_DEBUG: bool = False
+    QUERY_DEBUG_REPEAT_THRESHOLD: int = 5
+
+    # Хранилище фотографий и изображений дефектов: "local" или "s3"
+    BLOB_BACKEND: str = "local"
+    BLOB_LOCAL_PATH: str = str(Path(__file__).parent.parent.parent / "storage")
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_BUCKET: str = "construction-control"
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+    S3_REGION: Optional[str] = None
+
+    # Загрузка изображений: размер одного файла, допустимые типы (по сигнатуре файла, а не по заголовку
+    # клиента) и число файлов в одном запросе
+    UPLOAD_MAX_SIZE: int = 25 * 1024 * 1024
+    UPLOAD_ALLOWED_TYPES: List[str] = [
+        "image/jpeg", "image/png", "image/gif", "image/webp", "image/heic", "image/avif", "image/bmp", "image/tiff",
+    ]
+    UPLOAD_MAX_FILES: int = 10
+    # Предел всего multipart-запроса (и импорта); больший Content-Length отклоняется до чтения тела
+    UPLOAD_MAX_REQUEST_SIZE: int = 256 * 1024 * 1024
+    # Возобновляемые загрузки (tus): недокачанные файлы лежат на локальном диске - все процессы API
+    # должны видеть этот каталог, а с несколькими серверами балансировщик должен держать клиента на одном
+    UPLOAD_TMP_PATH: str = str(Path(__file__).parent.parent.parent / "storage" / ".uploads")
+    UPLOAD_EXPIRE_HOURS: int = 24
+    IMAGE_CACHE_MAX_AGE: int = 86400
+    # Размер большей стороны миниатюры и превью, пикселей
+    IMAGE_THUMB_SIZE: int = 256
+    IMAGE_PREVIEW_SIZE: int = 1280
+
+    # Фоновые задачи. Воркер работает в процессе API, если не выключен JOB_RUNNER_IN_PROCESS
+    # (тогда нужны отдельные процессы: python -m app.services.jobs)
+    JOB_RUNNER_IN_PROCESS: bool = True
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
+    # Пауза перед первым повтором, секунд; дальше удваивается
+    JOB_RETRY_DELAY: float = 10
+    # Пока обработчик работает, воркер раз в JOB_HEARTBEAT_INTERVAL секунд обновляет locked_at задачи;
+    # задача, у которой он не обновлялся JOB_LOCK_TIMEOUT секунд, считается брошенной упавшим воркером
+    JOB_HEARTBEAT_INTERVAL: float = 30
+    JOB_LOCK_TIMEOUT: int = 120
+    JOB_MAINTENANCE_INTERVAL: int = 60
+    # Сколько хранить завершённые задачи и их файлы (готовые выгрузки)
+    JOB_RETENTION_HOURS: int = 24
+    JOB_SHUTDOWN_TIMEOUT: float = 10
+
+    # Лента изменений (SSE). LISTEN не работает через PgBouncer в режиме transaction -
+    # тогда в EVENTS_DATABASE_URL нужен прямой адрес PostgreSQL
+    EVENTS_DATABASE_URL: Optional[str] = None
+    # Интервал комментариев-пингов в потоке, секунд: держит соединение через прокси
+    EVENTS_HEARTBEAT_INTERVAL: float = 15
+    # Сколько событий клиент может не успеть прочитать, прежде чем поток перечитает их из БД
+    EVENTS_QUEUE_SIZE: int = 1000
+    # Сколько пропущенных событий дочитывать при переподключении; если больше - клиент получает reset
+    EVENTS_REPLAY_LIMIT: int = 1000
+    EVENTS_RETENTION_HOURS: int = 24
+
+    # Сколько хранить записи об удалениях для /api/v1/sync; клиент, не синхронизировавшийся дольше,
+    # получает reset и загружает данные заново
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        # Тот же DATABASE_URL, но с драйвером asyncpg
+        scheme, _, rest = self.DATABASE_URL.partition("://")
+        return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgresql") else self.DATABASE_URL
     
     class Config:
         env_file = Path(__file__).parent.parent.parent / ".env"
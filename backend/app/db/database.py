@@ -1,16 +1,61 @@
-from sqlalchemy import create_engine
+from uuid import uuid4
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.core.config import settings
+from app.db.pool_metrics import PoolMetrics, metered_pool
 
-engine = create_engine(settings.DATABASE_URL)
+# Синхронный движок - для миграций и консольных утилит (без ограничения времени запросов)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок (asyncpg) - для обработчиков запросов
+pool_metrics = PoolMetrics()
+
+if settings.DB_PGBOUNCER:
+    # Соединения держит PgBouncer, а prepared statements в режиме transaction не переживают
+    # смену серверного соединения - отключаем их кэш и делаем имена уникальными
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        poolclass=metered_pool(NullPool, pool_metrics),
+        connect_args={
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        },
+    )
+
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        # Параметры подключения PgBouncer не пропускает, а SET на сессию уйдёт другому клиенту
+        @event.listens_for(async_engine.sync_engine, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+else:
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(int(settings.DB_STATEMENT_TIMEOUT_MS))
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        poolclass=metered_pool(AsyncAdaptedQueuePool, pool_metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"server_settings": server_settings},
+    )
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
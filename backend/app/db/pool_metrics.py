@@ -0,0 +1,70 @@
+import threading
+import time
+
+from sqlalchemy import exc
+
+# Границы гистограммы ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class PoolMetrics:
+    """Время ожидания соединения из пула и число таймаутов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_sum": round(self.wait_sum, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                # Накопительные счётчики, как в гистограммах Prometheus
+                "wait_seconds_buckets": {str(bound): count for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)},
+            }
+        # NullPool (режим PgBouncer) не держит соединения - размеров у него нет
+        if hasattr(pool, "checkedout"):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            data.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity > 0 else None,
+            })
+        return data
+
+
+def metered_pool(pool_class, metrics: PoolMetrics):
+    """Подкласс пула, замеряющий время получения соединения."""
+
+    class MeteredPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.observe(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.observe(time.perf_counter() - started)
+            return connection
+
+    MeteredPool.__name__ = f"Metered{pool_class.__name__}"
+    return MeteredPool
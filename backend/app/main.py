@@ -1,31 +1,94 @@
-import bcrypt
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, date
-from fastapi import HTTPException, Depends, status, File, UploadFile, Form
-from fastapi import FastAPI
+from fastapi import HTTPException, Depends, status, File, UploadFile, Form, Query
+from fastapi import FastAPI, Request
+from starlette.requests import ClientDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse, Response
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from sqlalchemy import func, Date, cast
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select, insert, delete, exists
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 import json
-import csv
-import io
+import logging
 
 from app.core.config import settings
-from app.db.database import get_db, SessionLocal
+from app.db.database import get_db, AsyncSessionLocal, async_engine, pool_metrics
 from app.models.user import User, RoleEnum
 from app.models.project import Project
-from app.models import Defect, Object, DefectComment, DefectHistory, DefectImage, Project
+from app.models import Defect, Object, DefectComment, DefectHistory, DefectImage, DefectDailyStat, Job, JobStatus, Project, Upload, project_users, defect_users
 from app.models.defect import DefectStatus, DefectPriority
 from app.schemas.base import UserCreate, ProjectCreate
-from app.schemas.defect import DefectUpdate, DefectResponse, DefectCommentCreate, DefectCommentResponse
+from app.schemas.defect import DefectUpdate, DefectBulkUpdate, DefectBulkResult, DefectResponse, DefectCommentCreate, DefectCommentResponse, DefectHistoryResponse, DefectPage, DefectCommentPage, DefectHistoryPage, DefectSearchPage
 from app.schemas.object import ObjectCreate, ObjectUpdate, ObjectResponse
-from app.db.database import get_db
+from app.schemas.job import JobResponse
+from app.schemas.project import ProjectDashboard, ImportResult
+from app.schemas.sync import SyncPage
+from app.services.defect_listing import list_defect_summaries, list_defect_comments, list_defect_history, InvalidCursor
+from app.services.defect_search import search_defects
+from app.services.defect_serialization import defect_list, model_response, translate_value
+from app.services.defect_events import publish, changes_data, event_stream, event_broker
+from app.services.defect_bulk import bulk_update_defects, BulkUpdateForbidden
+from app.services.defect_stats import record_defect_event, stats_series, GRANULARITIES
+from app.services.project_dashboard import build_project_dashboard
+from app.services.project_import import import_file, ImportFileError
+from app.services.sync import sync_page, sync_response
+from app.services.uploads import (
+    store_upload, store_completed_upload, create_upload, get_upload, append_upload, upload_offset, upload_path, remove_upload_file,
+    parse_upload_metadata, tus_headers, MultipartSizeLimit, UploadTooLarge, UnsupportedUploadType, UploadOffsetMismatch,
+    UploadBusy, InvalidUploadMetadata, TUS_VERSION, TUS_EXTENSIONS, TUS_CONTENT_TYPE,
+)
+from app.services.defect_export import export_query, export_job_payload, stream_csv, stream_xlsx, XLSX_MIME_TYPE
+from app.services.storage import claim_blob, release_blob, defect_blob_keys
+from app.services.blob_delivery import blob_response
+from app.services.image_variants import enqueue_variants, ensure_variant, pick_format
+from app.services.jobs import enqueue, job_runner
+from app.services.principals import Principal, get_principal, principal_cache
+from app.services.response_cache import cached_json, response_cache
+from app.services.observability import ObservabilityMiddleware, PoolCollector, configure_logging, instrument_engine, metrics_payload
+from app.services.passwords import hash_password, verify_password, needs_rehash, shutdown_password_pool, PasswordHasherBusy
+
+configure_logging()
+instrument_engine(async_engine.sync_engine)
+logger = logging.getLogger(__name__)
+
+async def create_admin_if_empty():
+    """Создает менеджера если база данных пользователей пуста"""
+    async with AsyncSessionLocal() as db:
+        try:
+            user_count = await db.scalar(select(func.count(User.id)))
+            if user_count == 0:
+                hashed_password = await hash_password("12345678")
+                admin_user = User(nickname="admin", password=hashed_password, role=RoleEnum.MANAGER)
+                db.add(admin_user)
+                await db.commit()
+                logger.info("Создан менеджер: admin/admin")
+        except Exception:
+            logger.exception("Ошибка при создании менеджера")
+            await db.rollback()
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_admin_if_empty()
+    if settings.JOB_RUNNER_IN_PROCESS:
+        job_runner.start()
+    yield
+    await event_broker.stop()
+    await job_runner.stop()
+    shutdown_password_pool()
+    await async_engine.dispose()
 
+pool_collector = PoolCollector(pool_metrics, async_engine)
+
+# JSON-ответы сериализует orjson - быстрее стандартного json на больших списках
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Внутри CORS, чтобы ответ 413 дошёл до браузера с заголовками CORS
+app.add_middleware(MultipartSizeLimit, max_size=settings.UPLOAD_MAX_REQUEST_SIZE)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -33,54 +96,118 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Снаружи всех остальных: замеряет и ответы, которые middleware отдают сами (413, CORS preflight)
+app.add_middleware(ObservabilityMiddleware)
 security = HTTPBearer()
 
-def create_admin_if_empty():
-    """Создает менеджера если база данных пользователей пуста"""
-    db = None
-    try:
-        db = SessionLocal()
-        user_count = db.query(User).count()
-        if user_count == 0:
-            hashed_password = bcrypt.hashpw("12345678".encode('utf-8'), bcrypt.gensalt(rounds=12)).decode('utf-8')
-            admin_user = User(nickname="admin", password=hashed_password, role=RoleEnum.MANAGER)
-            db.add(admin_user)
-            db.commit()
-            print("Создан менеджер: admin/admin")
-    except Exception as e:
-        print(f"Ошибка при создании менеджера: {e}")
-        if db:
-            db.rollback()
-    finally:
-        if db:
-            db.close()
-
-def create_access_token(data: dict):
-    to_encode = data.copy()
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(status_code=429, content={"detail": "Слишком много запросов, повторите позже"}, headers={"Retry-After": "1"})
+
+def create_access_token(user):
+    # id и роль в токене: по id пользователь ищется по первичному ключу
+    to_encode = {"sub": user.nickname, "uid": user.id, "role": user.role.value}
     expire = datetime.utcnow() + timedelta(minutes=settings.JWT_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_access_token(token: str) -> dict:
     try:
-        payload = jwt.decode(credentials.credentials, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        nickname: str = payload.get("sub")
-        if nickname is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return nickname
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_access_token(credentials.credentials)["sub"]
+
+# User management functions
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)) -> Principal:
+    payload = decode_access_token(credentials.credentials)
+    user = await get_principal(db, payload["sub"], payload.get("uid"))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def require_role(allowed_roles: List[str]):
+    async def role_checker(user: Principal = Depends(get_current_user)):
+        if user.role.value not in allowed_roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return user
+    return role_checker
+
+async def get_user_by_nickname(db: AsyncSession, nickname: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.nickname == nickname))).scalars().first()
+
+async def get_user_project_ids(db: AsyncSession, user_id: int) -> List[int]:
+    result = await db.execute(select(project_users.c.project_id).where(project_users.c.user_id == user_id))
+    return list(result.scalars().all())
+
+async def get_project_engineer_ids(db: AsyncSession, project_id: int) -> List[int]:
+    result = await db.execute(
+        select(User.id)
+        .join(project_users, project_users.c.user_id == User.id)
+        .where(project_users.c.project_id == project_id, User.role == RoleEnum.ENGINEER)
+    )
+    return list(result.scalars().all())
+
+async def delete_defects(db: AsyncSession, defect_ids):
+    """Удаляет дефекты (подзапрос с id) вместе с назначениями, комментариями, историей и изображениями."""
+    for table in (defect_users, DefectComment.__table__, DefectHistory.__table__, DefectImage.__table__):
+        await db.execute(delete(table).where(table.c.defect_id.in_(defect_ids)))
+    await db.execute(delete(Defect).where(Defect.id.in_(defect_ids)))
+
+async def release_blobs(db: AsyncSession, keys):
+    for key in keys:
+        await release_blob(db, key)
+
+def event_stream_response(request: Request, last_event_id: Optional[int], **scope) -> StreamingResponse:
+    # EventSource при переподключении присылает заголовок Last-Event-ID, fetch-клиенты - параметр
+    header = request.headers.get("last-event-id", "")
+    horizon = int(header) if header.isdigit() else last_event_id
+    return StreamingResponse(
+        event_stream(horizon, **scope),
+        media_type="text/event-stream",
+        # Без буферизации в nginx события уходят клиенту сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def build_job_response(job: Job) -> JobResponse:
+    response = JobResponse.model_validate(job)
+    if job.status == JobStatus.SUCCEEDED and job.result_key:
+        response.download_url = f"/api/v1/jobs/{job.id}/download"
+    return response
+
+async def get_user_job(db: AsyncSession, job_id: int, user: Principal) -> Job:
+    job = await db.get(Job, job_id)
+    # Чужие задачи видит только менеджер
+    if not job or (job.user_id != user.id and user.role != RoleEnum.MANAGER):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to FastAPI"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики в формате Prometheus: запросы по маршрутам, БД, пул соединений, хеширование паролей."""
+    body, content_type = metrics_payload(pool_collector)
+    return Response(content=body, media_type=content_type)
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Состояние пула соединений: занятость и время ожидания соединения."""
+    return pool_metrics.snapshot(async_engine.pool)
+
 @app.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.nickname == user.nickname).first() is not None:
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    if await get_user_by_nickname(db, user.nickname) is not None:
         raise HTTPException(status_code=400, detail="Пользователь уже существует")
 
-    hashedPassword = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt(rounds=12)).decode('utf-8')
+    hashedPassword = await hash_password(user.password)
 
     newUser = User(
         nickname = user.nickname,
@@ -88,206 +215,255 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(newUser)
-    db.commit()
-    db.refresh(newUser)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Тот же ник успели зарегистрировать параллельно - уникальный индекс не пропустил дубль
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Пользователь уже существует")
+    await response_cache.invalidate("users")
     return {"message": "Пользователь зарегистрирован"}
 
 @app.post("/auth")
-def auth(user: UserCreate, db: Session = Depends(get_db)):
-    foundUser = db.query(User).filter(User.nickname == user.nickname).first()
+async def auth(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    foundUser = await get_user_by_nickname(db, user.nickname)
 
     if foundUser is None:
         raise HTTPException(status_code=400, detail="Пользователь не существует")
 
-    if bcrypt.checkpw(user.password.encode('utf-8'), foundUser.password.encode('utf-8')):
-        access_token = create_access_token(data={"sub": foundUser.nickname})
+    if await verify_password(user.password, foundUser.password):
+        # Настройки хеширования поменялись - пересчитываем хеш, пока пароль известен
+        if needs_rehash(foundUser.password):
+            foundUser.password = await hash_password(user.password)
+            await db.commit()
+        access_token = create_access_token(foundUser)
         return {"access_token": access_token, "token_type": "bearer"}
     else:
         raise HTTPException(status_code=401, detail="Неверный пароль")
 
 @app.post("/refresh")
-def refresh_token(current_user: str = Depends(verify_token)):
-    access_token = create_access_token(data={"sub": current_user})
+async def refresh_token(current_user: Principal = Depends(get_current_user)):
+    access_token = create_access_token(current_user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/logout")
-def logout():
+async def logout():
     return {"message": "Logged out successfully"}
 
 @app.get("/userinfo")
-def protected_route(current_user: str = Depends(verify_token)):
+async def protected_route(current_user: str = Depends(verify_token)):
     return {"nickname": current_user}
 
 @app.get("/projects")
-def projects(current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def projects(request: Request, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
     if user.role == RoleEnum.OBSERVER:
         # Наблюдатели видят все проекты
-        all_projects = db.query(Project).all()
-        return {"projects": [{"id": p.id, "title": p.title} for p in all_projects]}
+        query = select(Project)
+        key = "projects:all"
     else:
-        user_projects = user.projects.all()
-        return {"projects": [{"id": p.id, "title": p.title} for p in user_projects]}
+        # Список зависит только от набора проектов - пользователи с одинаковым набором делят запись кэша
+        project_ids = sorted(user.project_ids)
+        query = select(Project).where(Project.id.in_(project_ids))
+        key = "projects:" + ",".join(map(str, project_ids))
+    
+    async def build():
+        projects = (await db.execute(query)).scalars().all()
+        return {"projects": [{"id": p.id, "title": p.title} for p in projects]}
+    
+    return await cached_json(request, key, ("projects",), build)
 
 @app.get("/projects/{project_id}")
-def get_project(project_id: int, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def get_project(project_id: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Проект не найден")
     
-    if user.role != RoleEnum.OBSERVER and user not in project.users:
+    if user.role != RoleEnum.OBSERVER and project_id not in user.project_ids:
         raise HTTPException(status_code=403, detail="Нет доступа к проекту")
     
     return {"id": project.id, "title": project.title}
 
-# User management functions
-def get_current_user(current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+@app.get("/api/v1/projects/{project_id}/dashboard", response_model=ProjectDashboard)
+async def get_project_dashboard(
+    project_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Данные страницы проекта одним запросом вместо шести."""
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    
+    if user.role != RoleEnum.OBSERVER and project_id not in user.project_ids:
+        raise HTTPException(status_code=403, detail="Нет доступа к проекту")
+    
+    return await build_project_dashboard(db, project, user, limit)
 
-def require_role(allowed_roles: List[str]):
-    def role_checker(user: User = Depends(get_current_user)):
-        if user.role.value not in allowed_roles:
-            raise HTTPException(status_code=403, detail="Insufficient permissions")
-        return user
-    return role_checker
+@app.get("/api/v1/projects/{project_id}/events")
+async def project_events(
+    project_id: int,
+    request: Request,
+    last_event_id: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Лента изменений дефектов проекта (SSE) вместо периодического перечитывания страницы."""
+    if not await db.get(Project, project_id):
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    
+    if user.role != RoleEnum.OBSERVER and project_id not in user.project_ids:
+        raise HTTPException(status_code=403, detail="Нет доступа к проекту")
+    
+    return event_stream_response(request, last_event_id, project_id=project_id)
+
+@app.post("/api/v1/projects/{project_id}/import", response_model=ImportResult)
+async def import_project_data(
+    project_id: int,
+    kind: str = Query(..., pattern="^(objects|defects)$"),
+    dry_run: bool = False,
+    file: UploadFile = File(...),
+    user: Principal = Depends(require_role(["MANAGER"])),
+    db: AsyncSession = Depends(get_db)
+):
+    """Объекты или дефекты из CSV/XLSX; строки с ошибками пропускаются и возвращаются в отчёте."""
+    if not await db.get(Project, project_id):
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    
+    if project_id not in user.project_ids:
+        raise HTTPException(status_code=403, detail="Нет доступа к проекту")
+    
+    try:
+        result = await import_file(db, project_id, user.id, kind, file.file, file.filename, dry_run)
+    except ImportFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await db.commit()
+    if result.imported and not dry_run:
+        await response_cache.invalidate("objects" if kind == "objects" else "defect_stats")
+    return result
 
 @app.post("/projects/create")
-def create_project(project: ProjectCreate, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def create_project(project: ProjectCreate, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
     new_project = Project(title=project.title)
     db.add(new_project)
-    db.flush()
+    await db.flush()
     
-    new_project.users.append(user)
-    db.commit()
+    await db.execute(insert(project_users).values(user_id=user.id, project_id=new_project.id))
+    await db.commit()
+    principal_cache.invalidate_user(user.id)
+    await response_cache.invalidate("projects", "project_users")
     
     return {"message": "Проект создан", "project_id": new_project.id}
 
 @app.put("/projects/{project_id}")
-def update_project(project_id: int, project: ProjectCreate, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def update_project(project_id: int, project: ProjectCreate, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
     if user.role != RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
     
-    existing_project = db.query(Project).filter(Project.id == project_id).first()
+    existing_project = await db.get(Project, project_id)
     if not existing_project:
         raise HTTPException(status_code=404, detail="Проект не найден")
     
     existing_project.title = project.title
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate("projects")
     
     return {"message": "Проект обновлен"}
 
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: int, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def delete_project(project_id: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
     if user.role != RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
     
-    existing_project = db.query(Project).filter(Project.id == project_id).first()
+    existing_project = await db.get(Project, project_id)
     if not existing_project:
         raise HTTPException(status_code=404, detail="Проект не найден")
     
-    db.delete(existing_project)
-    db.commit()
+    blob_keys = await defect_blob_keys(db, Object.project_id == project_id)
+    await delete_defects(
+        db, select(Defect.id).join(Object, Object.id == Defect.object_id).where(Object.project_id == project_id)
+    )
+    await db.execute(delete(DefectDailyStat).where(DefectDailyStat.project_id == project_id))
+    await db.execute(delete(Object).where(Object.project_id == project_id))
+    await db.execute(delete(project_users).where(project_users.c.project_id == project_id))
+    await db.execute(delete(Project).where(Project.id == project_id))
+    await db.commit()
+    # Проект пропал из списков всех его участников
+    principal_cache.clear()
+    await response_cache.invalidate("projects", "project_users", "objects", "defect_stats")
+    await release_blobs(db, blob_keys)
     
     return {"message": "Проект удален"}
 
 # Objects routes
 @app.post("/api/v1/objects/", response_model=ObjectResponse)
-def create_object(object_data: ObjectCreate, user: User = Depends(require_role(["MANAGER", "ENGINEER"])), db: Session = Depends(get_db)):
-    if not db.query(Project).filter(Project.id == object_data.project_id).first():
+async def create_object(object_data: ObjectCreate, user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])), db: AsyncSession = Depends(get_db)):
+    if not await db.get(Project, object_data.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
     db_object = Object(**object_data.dict())
     db.add(db_object)
-    db.commit()
-    db.refresh(db_object)
+    await db.commit()
+    await response_cache.invalidate("objects")
+    await db.refresh(db_object)
     return db_object
 
 @app.get("/api/v1/objects/", response_model=List[ObjectResponse])
-def get_objects(project_id: int = None, db: Session = Depends(get_db)):
-    query = db.query(Object)
+async def get_objects(request: Request, project_id: int = None, db: AsyncSession = Depends(get_db)):
+    query = select(Object)
     if project_id:
-        query = query.filter(Object.project_id == project_id)
-    return query.all()
+        query = query.where(Object.project_id == project_id)
+    
+    async def build():
+        return [ObjectResponse.model_validate(obj) for obj in (await db.execute(query)).scalars().all()]
+    
+    return await cached_json(request, f"objects:{project_id or 'all'}", ("objects",), build)
 
 @app.get("/api/v1/objects/{object_id}", response_model=ObjectResponse)
-def get_object(object_id: int, db: Session = Depends(get_db)):
-    db_object = db.query(Object).filter(Object.id == object_id).first()
+async def get_object(object_id: int, db: AsyncSession = Depends(get_db)):
+    db_object = await db.get(Object, object_id)
     if not db_object:
         raise HTTPException(status_code=404, detail="Object not found")
     return db_object
 
 @app.put("/api/v1/objects/{object_id}", response_model=ObjectResponse)
-def update_object(object_id: int, object_data: ObjectUpdate, user: User = Depends(require_role(["MANAGER", "ENGINEER"])), db: Session = Depends(get_db)):
-    db_object = db.query(Object).filter(Object.id == object_id).first()
+async def update_object(object_id: int, object_data: ObjectUpdate, user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])), db: AsyncSession = Depends(get_db)):
+    db_object = await db.get(Object, object_id)
     if not db_object:
         raise HTTPException(status_code=404, detail="Object not found")
     
     for field, value in object_data.dict(exclude_unset=True).items():
         setattr(db_object, field, value)
     
-    db.commit()
-    db.refresh(db_object)
+    await db.commit()
+    await response_cache.invalidate("objects")
+    await db.refresh(db_object)
     return db_object
 
 @app.delete("/api/v1/objects/{object_id}")
-def delete_object(object_id: int, user: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    db_object = db.query(Object).filter(Object.id == object_id).first()
+async def delete_object(object_id: int, user: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    db_object = await db.get(Object, object_id)
     if not db_object:
         raise HTTPException(status_code=404, detail="Object not found")
     
-    db.delete(db_object)
-    db.commit()
+    blob_keys = await defect_blob_keys(db, Defect.object_id == object_id)
+    await delete_defects(db, select(Defect.id).where(Defect.object_id == object_id))
+    await db.execute(delete(DefectDailyStat).where(DefectDailyStat.object_id == object_id))
+    await db.execute(delete(Object).where(Object.id == object_id))
+    await publish(db, "object.deleted", db_object.project_id, data={"object_id": object_id}, user_id=user.id)
+    await db.commit()
+    await response_cache.invalidate("objects", "defect_stats")
+    await release_blobs(db, blob_keys)
     return {"message": "Object deleted"}
 
-def translate_value(field_name: str, value: str) -> str:
-    if not value:
-        return value
-    
-    translations = {
-        'status': {
-            'NEW': 'Новый',
-            'OPEN': 'Открыт',
-            'IN_PROGRESS': 'В работе', 
-            'UNDER_REVIEW': 'На проверке',
-            'CLOSED': 'Закрыт'
-        },
-        'priority': {
-            'LOW': 'Низкий',
-            'MEDIUM': 'Средний',
-            'HIGH': 'Высокий', 
-            'CRITICAL': 'Критический'
-        }
-    }
-    
-    if field_name in translations and value in translations[field_name]:
-        return translations[field_name][value]
-    
-    return value
-
-def build_defect_response(defect):
-    response_data = {
+def defect_fields(defect, image_count: int) -> dict:
+    return {
         "id": defect.id,
         "title": defect.title,
         "description": defect.description,
@@ -298,30 +474,95 @@ def build_defect_response(defect):
         "created_at": defect.created_at,
         "updated_at": defect.updated_at,
         "assigned_user_ids": [user.id for user in defect.assigned_users],
-        "has_photo": defect.photo is not None,
-        "image_count": len(defect.images),
-        "comments": [
-            {
-                "id": c.id,
-                "content": c.content,
-                "user_id": c.user_id,
-                "user_nickname": c.user.nickname,
-                "created_at": c.created_at
-            } for c in defect.comments
-        ],
-        "history": [
-            {
-                "id": h.id,
-                "field_name": h.field_name,
-                "old_value": translate_value(h.field_name, h.old_value) if h.old_value else h.old_value,
-                "new_value": translate_value(h.field_name, h.new_value) if h.new_value else h.new_value,
-                "user_id": h.user_id,
-                "user_nickname": h.user.nickname,
-                "created_at": h.created_at
-            } for h in defect.history
-        ]
+        "has_photo": defect.photo_key is not None,
+        "image_count": image_count,
     }
-    return DefectResponse(**response_data)
+
+def comment_response(c) -> DefectCommentResponse:
+    return DefectCommentResponse(
+        id=c.id,
+        content=c.content,
+        user_id=c.user_id,
+        user_nickname=c.user_nickname,
+        created_at=c.created_at
+    )
+
+def history_response(h) -> DefectHistoryResponse:
+    return DefectHistoryResponse(
+        id=h.id,
+        field_name=h.field_name,
+        old_value=translate_value(h.field_name, h.old_value) if h.old_value else h.old_value,
+        new_value=translate_value(h.field_name, h.new_value) if h.new_value else h.new_value,
+        user_id=h.user_id,
+        user_nickname=h.user_nickname,
+        created_at=h.created_at
+    )
+
+async def defect_detail(db: AsyncSession, defect_id: int, include=(), limit: int = 50) -> Optional[DefectResponse]:
+    """Дефект без комментариев и истории; их первые страницы - только если перечислены в include.
+
+    Число запросов не зависит от того, сколько у дефекта комментариев и записей истории.
+    """
+    defect = (await db.execute(
+        select(Defect)
+        .options(selectinload(Defect.assigned_users))
+        .where(Defect.id == defect_id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+    if not defect:
+        return None
+    
+    image_count = await db.scalar(select(func.count(DefectImage.id)).where(DefectImage.defect_id == defect_id))
+    response = DefectResponse(**defect_fields(defect, image_count))
+    if "comments" in include:
+        rows, response.comments_next_cursor = await list_defect_comments(db, defect_id, limit=limit)
+        response.comments = [comment_response(row) for row in rows]
+    if "history" in include:
+        rows, response.history_next_cursor = await list_defect_history(db, defect_id, limit=limit)
+        response.history = [history_response(row) for row in rows]
+    return response
+
+async def store_image_upload(upload: UploadFile):
+    # Тип определяется по сигнатуре файла, заголовок клиента не учитывается
+    try:
+        return await store_upload(upload)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="Файл слишком большой")
+    except UnsupportedUploadType:
+        raise HTTPException(status_code=415, detail="Недопустимый тип файла")
+
+async def attach_images(db: AsyncSession, defect_id: int, files) -> List[DefectImage]:
+    """Добавляет к дефекту сохранённые файлы одной вставкой: тройки имя, StoredBlob и источник для claim_blob."""
+    # Блокировки ключей берутся в одном порядке, чтобы параллельные загрузки не ждали друг друга по кругу
+    for _, stored, source in sorted(files, key=lambda file: file[1].key):
+        await claim_blob(db, stored, source)
+    images = [
+        DefectImage(
+            filename=filename,
+            storage_key=stored.key,
+            size=stored.size,
+            mime_type=stored.mime_type,
+            sha256=stored.sha256,
+            defect_id=defect_id
+        )
+        for filename, stored, _ in files
+    ]
+    db.add_all(images)
+    for key in dict.fromkeys(stored.key for _, stored, _ in files):
+        enqueue_variants(db, key)
+    await db.flush()
+    for image in images:
+        await publish(db, "image.added", defect_id=defect_id, data={"image_id": image.id})
+    return images
+
+async def get_upload_target(db: AsyncSession, defect_id: int, user: Principal) -> None:
+    project_id = await db.scalar(
+        select(Object.project_id).join(Defect, Defect.object_id == Object.id).where(Defect.id == defect_id)
+    )
+    if project_id is None:
+        raise HTTPException(status_code=404, detail="Defect not found")
+    if project_id not in user.project_ids:
+        raise HTTPException(status_code=403, detail="Нет доступа к проекту")
 
 @app.post("/api/v1/defects/", response_model=DefectResponse)
 async def create_defect(
@@ -332,50 +573,49 @@ async def create_defect(
     due_date: Optional[str] = Form(None),
     assigned_user_ids: str = Form("[]"),
     photo: Optional[UploadFile] = File(None),
-    user: User = Depends(require_role(["MANAGER", "ENGINEER"])),
-    db: Session = Depends(get_db)
+    user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])),
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(Object).filter(Object.id == object_id).first()
+    obj = await db.get(Object, object_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Object not found")
     
-    photo_data = None
+    stored_photo = None
     if photo:
-        print(f"Photo received: {photo.filename}, size: {photo.size}")
-        photo_data = await photo.read()
-        print(f"Photo data length: {len(photo_data) if photo_data else 0}")
-    else:
-        print("No photo received")
+        stored_photo = await store_image_upload(photo)
     
     user_ids = json.loads(assigned_user_ids)
     priority_enum = DefectPriority(priority.upper())
     
     parsed_due_date = None
     if due_date and user.role.value == "MANAGER":
-        from datetime import datetime
         parsed_due_date = datetime.strptime(due_date, "%Y-%m-%d").date()
     
+    assigned_users = []
+    if user_ids and user.role.value == "MANAGER":
+        # Проверяем, что назначаемые пользователи - инженеры из проекта
+        project_engineers = await get_project_engineer_ids(db, obj.project_id)
+        valid_user_ids = [uid for uid in user_ids if uid in project_engineers]
+    
+        if valid_user_ids:
+            assigned_users = (await db.execute(select(User).where(User.id.in_(valid_user_ids)))).scalars().all()
+    
     db_defect = Defect(
         title=title,
         description=description,
         priority=priority_enum,
         due_date=parsed_due_date,
         object_id=object_id,
-        photo=photo_data
+        assigned_users=list(assigned_users)
     )
-    print(f"Creating defect with photo: {photo_data is not None}")
+    if stored_photo:
+        await claim_blob(db, stored_photo, photo.file)
+        db_defect.photo_key = stored_photo.key
+        db_defect.photo_size = stored_photo.size
+        db_defect.photo_mime_type = stored_photo.mime_type
+        db_defect.photo_sha256 = stored_photo.sha256
     db.add(db_defect)
-    db.flush()
-    
-    if user_ids and user.role.value == "MANAGER":
-        # Проверяем, что назначаемые пользователи - инженеры из проекта
-        project = obj.project
-        project_engineers = [u.id for u in project.users if u.role == RoleEnum.ENGINEER]
-        valid_user_ids = [uid for uid in user_ids if uid in project_engineers]
-        
-        if valid_user_ids:
-            users = db.query(User).filter(User.id.in_(valid_user_ids)).all()
-            db_defect.assigned_users = users
+    await db.flush()
     
     history = DefectHistory(
         field_name="created",
@@ -384,127 +624,252 @@ async def create_defect(
         user_id=user.id
     )
     db.add(history)
+    await record_defect_event(
+        db, obj.project_id, object_id, db_defect.status or DefectStatus.NEW, priority_enum, created=1, entered=1
+    )
+    await publish(db, "defect.created", obj.project_id, db_defect.id, {"object_id": object_id}, user.id)
+    if stored_photo:
+        enqueue_variants(db, stored_photo.key)
     
-    db.commit()
-    db.refresh(db_defect)
+    await db.commit()
+    await response_cache.invalidate("defect_stats")
     
-    return build_defect_response(db_defect)
+    return await defect_detail(db, db_defect.id)
 
 @app.get("/api/v1/defects/export")
-def export_defects_csv(db: Session = Depends(get_db)):
-    from sqlalchemy.orm import joinedload
-    defects = db.query(Defect).options(
-        joinedload(Defect.object).joinedload(Object.project)
-    ).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Название', 'Описание', 'Статус', 'Приоритет', 'Создан', 'Обновлен', 'Объект', 'Проект'])
-    
-    for defect in defects:
-        writer.writerow([
-            defect.id,
-            defect.title,
-            defect.description or '',
-            defect.status.value,
-            defect.priority.value,
-            defect.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            defect.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-            defect.object.name,
-            defect.object.project.title
-        ])
-    
-    output.seek(0)
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=defects_export_{date.today()}.csv"}
+async def export_defects(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    status: Optional[List[DefectStatus]] = Query(None),
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    user: Principal = Depends(get_current_user)
+):
+    # Наблюдатели выгружают все дефекты, остальные - только из своих проектов
+    query = export_query(
+        project_ids=None if user.role == RoleEnum.OBSERVER else list(user.project_ids),
+        project_id=project_id,
+        object_id=object_id,
+        statuses=status,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    headers = {"Content-Disposition": f"attachment; filename=defects_export_{date.today()}.{format}"}
+    if format == "xlsx":
+        return StreamingResponse(stream_xlsx(query), media_type=XLSX_MIME_TYPE, headers=headers)
+    return StreamingResponse(stream_csv(query), media_type="text/csv", headers=headers)
+
+@app.post("/api/v1/defects/export", response_model=JobResponse, status_code=202)
+async def create_export_job(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    status: Optional[List[DefectStatus]] = Query(None),
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Выгрузка в фоне: клиент опрашивает задачу и скачивает файл по download_url."""
+    payload = export_job_payload(
+        format,
+        project_ids=None if user.role == RoleEnum.OBSERVER else sorted(user.project_ids),
+        project_id=project_id,
+        object_id=object_id,
+        statuses=status,
+        created_from=created_from,
+        created_to=created_to,
     )
+    job = enqueue(db, "export_defects", payload, priority=10, user_id=user.id)
+    await db.commit()
+    await db.refresh(job)
+    return build_job_response(job)
 
 @app.get("/api/v1/defects/stats/weekly")
-def get_weekly_stats(db: Session = Depends(get_db)):
+async def get_weekly_stats(request: Request, db: AsyncSession = Depends(get_db)):
     end_date = date.today()
     start_date = end_date - timedelta(days=6)
-    
-    # Created defects by day
-    created_stats = db.query(
-        cast(Defect.created_at, Date).label('date'),
-        func.count(Defect.id).label('count')
-    ).filter(
-        cast(Defect.created_at, Date) >= start_date,
-        cast(Defect.created_at, Date) <= end_date
-    ).group_by(cast(Defect.created_at, Date)).all()
-    
-    # Resolved defects by day (status CLOSED)
-    resolved_stats = db.query(
-        cast(Defect.updated_at, Date).label('date'),
-        func.count(Defect.id).label('count')
-    ).filter(
-        cast(Defect.updated_at, Date) >= start_date,
-        cast(Defect.updated_at, Date) <= end_date,
-        Defect.status == DefectStatus.CLOSED
-    ).group_by(cast(Defect.updated_at, Date)).all()
-    
-    # Fill missing dates with 0
-    result = []
-    for i in range(7):
-        current_date = start_date + timedelta(days=i)
-        created_count = next((s.count for s in created_stats if s.date == current_date), 0)
-        resolved_count = next((s.count for s in resolved_stats if s.date == current_date), 0)
-        result.append({
-            'date': current_date.isoformat(),
-            'created': created_count,
-            'resolved': resolved_count
-        })
-    
-    return result
+    return await cached_json(
+        request, f"stats:weekly:{end_date}", ("defect_stats",), lambda: stats_series(db, start_date, end_date)
+    )
 
-@app.get("/api/v1/defects/", response_model=List[DefectResponse])
-def get_defects(object_id: int = None, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    from sqlalchemy.orm import joinedload
-    
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-    
-    query = db.query(Defect).options(
-        joinedload(Defect.assigned_users),
-        joinedload(Defect.comments).joinedload(DefectComment.user),
-        joinedload(Defect.history).joinedload(DefectHistory.user),
-        joinedload(Defect.images)
+@app.get("/api/v1/defects/stats")
+async def get_defect_stats(
+    date_from: date,
+    date_to: date,
+    granularity: str = Query("day", pattern=f"^({'|'.join(GRANULARITIES)})$"),
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if granularity == "day" and (date_to - date_from).days > 3660:
+        raise HTTPException(status_code=400, detail="Date range is too long for daily granularity")
+    
+    # Наблюдатели видят статистику по всем проектам, остальные - только по своим
+    return await stats_series(
+        db,
+        date_from,
+        date_to,
+        granularity,
+        project_ids=None if user.role == RoleEnum.OBSERVER else list(user.project_ids),
+        project_id=project_id,
+        object_id=object_id,
     )
-    
-    if object_id:
-        query = query.filter(Defect.object_id == object_id)
-    
-    # Наблюдатели видят все дефекты
+
+@app.get("/api/v1/defects/page", response_model=DefectPage)
+async def get_defects_page(
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    status: Optional[List[DefectStatus]] = Query(None),
+    priority: Optional[List[DefectPriority]] = Query(None),
+    assignee_id: Optional[int] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    sort: str = Query("created_at", pattern="^(created_at|updated_at)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Наблюдатели видят все дефекты, остальные - только из своих проектов
+    project_ids = None
     if user.role != RoleEnum.OBSERVER:
-        # Для других ролей показываем только дефекты из проектов, где они участвуют
-        user_project_ids = [p.id for p in user.projects.all()]
-        query = query.join(Object).filter(Object.project_id.in_(user_project_ids))
+        project_ids = list(user.project_ids)
+
+    try:
+        return model_response(await list_defect_summaries(
+            db,
+            project_ids=project_ids,
+            project_id=project_id,
+            object_id=object_id,
+            statuses=status,
+            priorities=priority,
+            assignee_id=assignee_id,
+            due_from=due_from,
+            due_to=due_to,
+            q=q,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+        ))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/v1/defects/search", response_model=DefectSearchPage)
+async def search_defects_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    status: Optional[List[DefectStatus]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Поиск по названию, описанию, комментариям и объекту, самые релевантные - первыми."""
+    try:
+        return model_response(await search_defects(
+            db,
+            q,
+            project_ids=None if user.role == RoleEnum.OBSERVER else list(user.project_ids),
+            project_id=project_id,
+            object_id=object_id,
+            statuses=status,
+            cursor=cursor,
+            limit=limit,
+        ))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/v1/defects/", response_model=List[DefectResponse])
+async def get_defects(object_id: int = None, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
-    defects = query.all()
-    return [build_defect_response(defect) for defect in defects]
+    # Наблюдатели видят все дефекты, остальные - только из проектов, где они участвуют
+    project_ids = None if user.role == RoleEnum.OBSERVER else user.project_ids
+    # Словари собраны из строк БД в формате DefectResponse - отдаём их без повторной проверки
+    return ORJSONResponse(await defect_list(db, project_ids, object_id))
 
 @app.get("/api/v1/defects/{defect_id}", response_model=DefectResponse)
-def get_defect(defect_id: int, db: Session = Depends(get_db)):
-    from sqlalchemy.orm import joinedload
+async def get_defect(
+    defect_id: int,
+    include: Optional[str] = Query(None, pattern="^(comments|history)(,(comments|history))*$"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    """Дефект; include=comments,history добавляет первые limit комментариев и записей истории."""
+    response = await defect_detail(db, defect_id, include.split(",") if include else (), limit)
     
-    db_defect = db.query(Defect).options(
-        joinedload(Defect.assigned_users),
-        joinedload(Defect.comments).joinedload(DefectComment.user),
-        joinedload(Defect.history).joinedload(DefectHistory.user),
-        joinedload(Defect.images)
-    ).filter(Defect.id == defect_id).first()
+    if not response:
+        raise HTTPException(status_code=404, detail="Defect not found")
     
-    if not db_defect:
+    return model_response(response)
+
+@app.get("/api/v1/defects/{defect_id}/comments", response_model=DefectCommentPage)
+async def get_defect_comments(
+    defect_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    if not await db.scalar(select(exists().where(Defect.id == defect_id))):
         raise HTTPException(status_code=404, detail="Defect not found")
     
-    return build_defect_response(db_defect)
+    try:
+        rows, next_cursor = await list_defect_comments(db, defect_id, cursor, limit, order)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model_response(DefectCommentPage(items=[comment_response(row) for row in rows], next_cursor=next_cursor))
+
+@app.get("/api/v1/defects/{defect_id}/history", response_model=DefectHistoryPage)
+async def get_defect_history(
+    defect_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    if not await db.scalar(select(exists().where(Defect.id == defect_id))):
+        raise HTTPException(status_code=404, detail="Defect not found")
+    
+    try:
+        rows, next_cursor = await list_defect_history(db, defect_id, cursor, limit, order)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model_response(DefectHistoryPage(items=[history_response(row) for row in rows], next_cursor=next_cursor))
+
+@app.get("/api/v1/defects/{defect_id}/events")
+async def defect_events(
+    defect_id: int,
+    request: Request,
+    last_event_id: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Изменения одного дефекта: правки, комментарии, изображения, удаление."""
+    project_id = await db.scalar(
+        select(Object.project_id).join(Defect, Defect.object_id == Object.id).where(Defect.id == defect_id)
+    )
+    if project_id is None:
+        raise HTTPException(status_code=404, detail="Defect not found")
+    
+    if user.role != RoleEnum.OBSERVER and project_id not in user.project_ids:
+        raise HTTPException(status_code=403, detail="Нет доступа к проекту")
+    
+    return event_stream_response(request, last_event_id, defect_id=defect_id)
 
 @app.put("/api/v1/defects/{defect_id}", response_model=DefectResponse)
-def update_defect(defect_id: int, defect_data: DefectUpdate, user: User = Depends(require_role(["MANAGER", "ENGINEER"])), db: Session = Depends(get_db)):
-    db_defect = db.query(Defect).filter(Defect.id == defect_id).first()
+async def update_defect(defect_id: int, defect_data: DefectUpdate, user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])), db: AsyncSession = Depends(get_db)):
+    db_defect = (await db.execute(
+        select(Defect).options(selectinload(Defect.assigned_users)).where(Defect.id == defect_id)
+    )).scalars().first()
     if not db_defect:
         raise HTTPException(status_code=404, detail="Defect not found")
     
@@ -525,9 +890,13 @@ def update_defect(defect_id: int, defect_data: DefectUpdate, user: User = Depend
         update_data = {k: v for k, v in update_data.items() if k in allowed_fields}
     
     # Создаем записи в истории для изменений
+    status_changed = False
+    changes = {}
     for field, new_value in update_data.items():
         old_value = getattr(db_defect, field)
         if old_value != new_value:
+            status_changed = status_changed or field == "status"
+            changes[field] = new_value
             history = DefectHistory(
                 field_name=field,
                 old_value=str(old_value) if old_value else None,
@@ -538,14 +907,17 @@ def update_defect(defect_id: int, defect_data: DefectUpdate, user: User = Depend
             db.add(history)
             setattr(db_defect, field, new_value)
     
+    project_id = await db.scalar(select(Object.project_id).where(Object.id == db_defect.object_id))
+    if status_changed or "priority" in changes:
+        await record_defect_event(db, project_id, db_defect.object_id, db_defect.status, db_defect.priority,
+                                  entered=int(status_changed), reprioritized=int("priority" in changes))
+    
     if defect_data.assigned_user_ids is not None and user.role.value == "MANAGER":
         old_users = [u.id for u in db_defect.assigned_users]
         new_users = defect_data.assigned_user_ids
         if old_users != new_users:
             # Проверяем, что назначаемые пользователи - инженеры из проекта
-            obj = db_defect.object
-            project = obj.project
-            project_engineers = [u.id for u in project.users if u.role == RoleEnum.ENGINEER]
+            project_engineers = await get_project_engineer_ids(db, project_id)
             valid_user_ids = [uid for uid in new_users if uid in project_engineers]
             
             history = DefectHistory(
@@ -556,30 +928,47 @@ def update_defect(defect_id: int, defect_data: DefectUpdate, user: User = Depend
                 user_id=user.id
             )
             db.add(history)
-            users = db.query(User).filter(User.id.in_(valid_user_ids)).all()
-            db_defect.assigned_users = users
-    
-    db.commit()
-    db.refresh(db_defect)
+            users = (await db.execute(select(User).where(User.id.in_(valid_user_ids)))).scalars().all()
+            db_defect.assigned_users = list(users)
+            changes["assigned_user_ids"] = valid_user_ids
+    
+    if changes:
+        await publish(db, "defect.updated", project_id, defect_id, changes_data(changes), user.id)
+    await db.commit()
+    if status_changed:
+        await response_cache.invalidate("defect_stats")
+    
+    # Только сам дефект: комментарии и история не перечитываются при каждом изменении
+    return await defect_detail(db, defect_id)
+
+@app.post("/api/v1/defects/bulk", response_model=DefectBulkResult)
+async def bulk_update(data: DefectBulkUpdate, user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])), db: AsyncSession = Depends(get_db)):
+    """Одни и те же изменения для многих дефектов в одной транзакции; результат - по каждому дефекту."""
+    try:
+        result = await bulk_update_defects(db, user, data.defect_ids, data.changes.model_dump(exclude_unset=True))
+    except BulkUpdateForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
     
-    return build_defect_response(db_defect)
+    await db.commit()
+    if any("status" in item.changed_fields for item in result.items):
+        await response_cache.invalidate("defect_stats")
+    return result
 
 @app.post("/api/v1/defects/{defect_id}/comments", response_model=DefectCommentResponse)
-def add_comment(defect_id: int, comment_data: DefectCommentCreate, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    defect = db.query(Defect).filter(Defect.id == defect_id).first()
-    if not defect:
+async def add_comment(defect_id: int, comment_data: DefectCommentCreate, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not await db.scalar(select(exists().where(Defect.id == defect_id))):
         raise HTTPException(status_code=404, detail="Defect not found")
     
-    user = db.query(User).filter(User.nickname == current_user).first()
-    
     comment = DefectComment(
         content=comment_data.content,
         defect_id=defect_id,
         user_id=user.id
     )
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    await db.flush()
+    await publish(db, "comment.created", defect_id=defect_id, data={"comment_id": comment.id}, user_id=user.id)
+    await db.commit()
+    await db.refresh(comment)
     
     return DefectCommentResponse(
         id=comment.id,
@@ -590,86 +979,315 @@ def add_comment(defect_id: int, comment_data: DefectCommentCreate, current_user:
     )
 
 @app.post("/api/v1/defects/{defect_id}/images")
-async def add_image(defect_id: int, image: UploadFile = File(...), db: Session = Depends(get_db)):
-    defect = db.query(Defect).filter(Defect.id == defect_id).first()
-    if not defect:
+async def add_image(defect_id: int, image: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    if not await db.scalar(select(exists().where(Defect.id == defect_id))):
         raise HTTPException(status_code=404, detail="Defect not found")
     
-    image_data = await image.read()
-    
-    defect_image = DefectImage(
-        filename=image.filename,
-        image_data=image_data,
-        defect_id=defect_id
-    )
-    db.add(defect_image)
-    db.commit()
+    stored = await store_image_upload(image)
+    await attach_images(db, defect_id, [(image.filename, stored, image.file)])
+    await db.commit()
     
     return {"message": "Image added successfully"}
 
+@app.post("/api/v1/defects/{defect_id}/images/batch")
+async def add_images(
+    defect_id: int,
+    images: List[UploadFile] = File(...),
+    user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])),
+    db: AsyncSession = Depends(get_db)
+):
+    """Несколько изображений одним запросом: добавляются все или, при ошибке в любом файле, ни одного."""
+    await get_upload_target(db, defect_id, user)
+    if len(images) > settings.UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Не больше {settings.UPLOAD_MAX_FILES} файлов за запрос")
+    
+    stored = []
+    try:
+        for image in images:
+            stored.append((image.filename, await store_image_upload(image), image.file))
+    except HTTPException:
+        # Уже сохранённые файлы удаляются, если на них не ссылаются другие записи
+        await release_blobs(db, {blob.key for _, blob, _ in stored})
+        raise
+    
+    created = await attach_images(db, defect_id, stored)
+    await db.commit()
+    
+    return {"message": "Images added successfully", "image_ids": [image.id for image in created]}
+
 @app.delete("/api/v1/defects/{defect_id}/photo")
-def delete_defect_photo(defect_id: int, db: Session = Depends(get_db)):
-    defect = db.query(Defect).filter(Defect.id == defect_id).first()
+async def delete_defect_photo(defect_id: int, db: AsyncSession = Depends(get_db)):
+    defect = await db.get(Defect, defect_id)
     if not defect:
         raise HTTPException(status_code=404, detail="Defect not found")
     
-    defect.photo = None
-    db.commit()
+    photo_key = defect.photo_key
+    defect.photo_key = None
+    defect.photo_size = None
+    defect.photo_mime_type = None
+    defect.photo_sha256 = None
+    await publish(db, "photo.deleted", defect_id=defect_id)
+    await db.commit()
+    await release_blob(db, photo_key)
     return {"message": "Photo deleted"}
 
 @app.delete("/api/v1/defects/{defect_id}/images/{image_id}")
-def delete_defect_image(defect_id: int, image_id: int, db: Session = Depends(get_db)):
-    image = db.query(DefectImage).filter(DefectImage.id == image_id, DefectImage.defect_id == defect_id).first()
+async def delete_defect_image(defect_id: int, image_id: int, db: AsyncSession = Depends(get_db)):
+    image = (await db.execute(
+        select(DefectImage).where(DefectImage.id == image_id, DefectImage.defect_id == defect_id)
+    )).scalars().first()
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    db.delete(image)
-    db.commit()
+    storage_key = image.storage_key
+    await db.delete(image)
+    await publish(db, "image.deleted", defect_id=defect_id, data={"image_id": image_id})
+    await db.commit()
+    await release_blob(db, storage_key)
     return {"message": "Image deleted"}
 
 @app.get("/api/v1/defects/{defect_id}/images")
-def get_defect_images(defect_id: int, db: Session = Depends(get_db)):
-    images = db.query(DefectImage).filter(DefectImage.defect_id == defect_id).all()
+async def get_defect_images(defect_id: int, db: AsyncSession = Depends(get_db)):
+    images = (await db.execute(
+        select(DefectImage.id, DefectImage.filename).where(DefectImage.defect_id == defect_id)
+    )).all()
     return [{"id": img.id, "filename": img.filename} for img in images]
 
+async def image_variant_response(request: Request, db: AsyncSession, source_key: str, size: str):
+    # Вариант, который ещё не успела подготовить фоновая задача, создаётся здесь же
+    fmt = pick_format(request.headers.get("accept"))
+    variant = await ensure_variant(db, source_key, size, fmt)
+    if not variant:
+        return None
+    return blob_response(request, variant.storage_key, variant.sha256, variant.size, variant.mime_type,
+                         extra_headers={"Vary": "Accept"})
+
 @app.get("/api/v1/defects/{defect_id}/photo")
-def get_defect_photo(defect_id: int, db: Session = Depends(get_db)):
-    defect = db.query(Defect).filter(Defect.id == defect_id).first()
-    if not defect or not defect.photo:
+async def get_defect_photo(
+    defect_id: int,
+    request: Request,
+    size: str = Query("original", pattern="^(thumb|preview|original)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    photo = (await db.execute(
+        select(Defect.photo_key, Defect.photo_sha256, Defect.photo_size, Defect.photo_mime_type)
+        .where(Defect.id == defect_id)
+    )).first()
+    if not photo or not photo.photo_key:
         raise HTTPException(status_code=404, detail="Photo not found")
     
-    return Response(content=defect.photo, media_type="image/jpeg")
+    if size != "original":
+        variant_response = await image_variant_response(request, db, photo.photo_key, size)
+        if variant_response:
+            return variant_response
+    
+    return blob_response(request, photo.photo_key, photo.photo_sha256, photo.photo_size, photo.photo_mime_type)
 
 @app.get("/api/v1/defects/{defect_id}/images/{image_id}")
-def get_image(defect_id: int, image_id: int, db: Session = Depends(get_db)):
-    image = db.query(DefectImage).filter(DefectImage.id == image_id, DefectImage.defect_id == defect_id).first()
+async def get_image(
+    defect_id: int,
+    image_id: int,
+    request: Request,
+    size: str = Query("original", pattern="^(thumb|preview|original)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    image = (await db.execute(
+        select(DefectImage).where(DefectImage.id == image_id, DefectImage.defect_id == defect_id)
+    )).scalars().first()
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    return Response(content=image.image_data, media_type="image/jpeg")
+    if size != "original":
+        variant_response = await image_variant_response(request, db, image.storage_key, size)
+        if variant_response:
+            return variant_response
+    
+    return blob_response(request, image.storage_key, image.sha256, image.size, image.mime_type)
 
 @app.delete("/api/v1/defects/{defect_id}")
-def delete_defect(defect_id: int, db: Session = Depends(get_db)):
-    db_defect = db.query(Defect).filter(Defect.id == defect_id).first()
-    if not db_defect:
+async def delete_defect(defect_id: int, db: AsyncSession = Depends(get_db)):
+    if not await db.scalar(select(exists().where(Defect.id == defect_id))):
         raise HTTPException(status_code=404, detail="Defect not found")
     
-    db.delete(db_defect)
-    db.commit()
+    blob_keys = await defect_blob_keys(db, Defect.id == defect_id)
+    # Проект события берётся по дефекту - до удаления
+    await publish(db, "defect.deleted", defect_id=defect_id)
+    await delete_defects(db, select(Defect.id).where(Defect.id == defect_id))
+    await db.commit()
+    await release_blobs(db, blob_keys)
     return {"message": "Defect deleted"}
 
+# Resumable uploads (tus 1.0)
+def upload_error(status_code: int, detail: str) -> HTTPException:
+    # Протокол требует Tus-Resumable во всех ответах, в том числе в ошибках
+    return HTTPException(status_code=status_code, detail=detail, headers=tus_headers())
+
+@app.options("/api/v1/uploads")
+async def resumable_upload_options():
+    return Response(status_code=204, headers=tus_headers(
+        Tus_Version=TUS_VERSION, Tus_Extension=TUS_EXTENSIONS, Tus_Max_Size=settings.UPLOAD_MAX_SIZE
+    ))
+
+@app.post("/api/v1/uploads", status_code=201)
+async def create_resumable_upload(
+    request: Request,
+    user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])),
+    db: AsyncSession = Depends(get_db)
+):
+    """Начинает возобновляемую загрузку изображения: Upload-Length и Upload-Metadata (defect_id, filename).
+    
+    Файл передаётся запросами PATCH на адрес из Location; после последней части изображение добавляется к дефекту.
+    """
+    length = request.headers.get("upload-length", "")
+    if not length.isdigit():
+        raise upload_error(400, "Нужен заголовок Upload-Length")
+    try:
+        metadata = parse_upload_metadata(request.headers.get("upload-metadata", ""))
+    except InvalidUploadMetadata as e:
+        raise upload_error(400, f"Значение {e} в Upload-Metadata не в base64")
+    try:
+        defect_id = int(metadata.get("defect_id", ""))
+    except ValueError:
+        raise upload_error(400, "В Upload-Metadata нужен defect_id")
+    
+    await get_upload_target(db, defect_id, user)
+    try:
+        upload = await create_upload(db, user.id, defect_id, metadata.get("filename") or "image", int(length))
+    except UploadTooLarge:
+        raise upload_error(413, "Файл слишком большой")
+    await db.commit()
+    
+    return Response(status_code=201, headers=tus_headers(Location=f"/api/v1/uploads/{upload.id}", Upload_Offset=0))
+
+@app.head("/api/v1/uploads/{upload_id}")
+async def resumable_upload_offset(upload_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    upload = await get_upload(db, upload_id, user.id)
+    if not upload:
+        raise upload_error(404, "Upload not found")
+    
+    return Response(status_code=200, headers=tus_headers(Upload_Offset=upload_offset(upload), Upload_Length=upload.length))
+
+@app.patch("/api/v1/uploads/{upload_id}")
+async def resumable_upload_chunk(
+    upload_id: str,
+    request: Request,
+    user: Principal = Depends(require_role(["MANAGER", "ENGINEER"])),
+    db: AsyncSession = Depends(get_db)
+):
+    """Часть файла начиная с Upload-Offset. Ответ - новое смещение; после обрыва клиент узнаёт его через HEAD."""
+    if request.headers.get("content-type") != TUS_CONTENT_TYPE:
+        raise upload_error(415, f"Нужен Content-Type: {TUS_CONTENT_TYPE}")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise upload_error(400, "Нужен заголовок Upload-Offset")
+    
+    upload = await get_upload(db, upload_id, user.id)
+    if not upload:
+        raise upload_error(404, "Upload not found")
+    # Медленный клиент не должен держать соединение с БД, пока передаёт часть
+    await db.close()
+    
+    try:
+        offset = await append_upload(upload, int(offset), request.stream())
+    except ClientDisconnect:
+        return Response(status_code=400)
+    except UploadBusy:
+        raise upload_error(409, "Эта загрузка уже передаётся другим запросом")
+    except UploadOffsetMismatch:
+        raise upload_error(409, "Upload-Offset не совпадает с принятым размером")
+    except UploadTooLarge:
+        raise upload_error(413, "Передано больше, чем Upload-Length")
+    except UnsupportedUploadType:
+        raise upload_error(415, "Недопустимый тип файла")
+    
+    headers = tus_headers(Upload_Offset=offset)
+    if offset == upload.length:
+        # Доступ и запись загрузки проверяются до переноса файла: при 403/404 в хранилище ничего не остаётся
+        await get_upload_target(db, upload.defect_id, user)
+        # Повтор последнего PATCH не должен добавить изображение второй раз
+        if not await db.scalar(delete(Upload).where(Upload.id == upload.id).returning(Upload.id)):
+            raise upload_error(404, "Upload not found")
+        stored = await run_in_threadpool(store_completed_upload, upload)
+        try:
+            image, = await attach_images(db, upload.defect_id, [(upload.filename, stored, upload_path(upload.id))])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await release_blob(db, stored.key)
+            raise
+        remove_upload_file(upload.id)
+        headers["X-Image-Id"] = str(image.id)
+    
+    return Response(status_code=204, headers=headers)
+
+@app.delete("/api/v1/uploads/{upload_id}")
+async def cancel_resumable_upload(upload_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    upload = await get_upload(db, upload_id, user.id)
+    if not upload:
+        raise upload_error(404, "Upload not found")
+    
+    await db.execute(delete(Upload).where(Upload.id == upload_id))
+    await db.commit()
+    remove_upload_file(upload_id)
+    return Response(status_code=204, headers=tus_headers())
+
+# Sync routes
+@app.get("/api/v1/sync", response_model=SyncPage)
+async def sync_changes(
+    request: Request,
+    token: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Изменения объектов, дефектов, комментариев, истории и изображений после token, включая удаления.
+    
+    Клиент запрашивает страницы с next_token, пока has_more, и сохраняет последний next_token.
+    """
+    try:
+        page = await sync_page(db, None if user.role == RoleEnum.OBSERVER else set(user.project_ids), token, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    
+    return sync_response(page, request.headers.get("accept-encoding", ""))
+
+# Jobs routes
+@app.get("/api/v1/jobs", response_model=List[JobResponse])
+async def get_jobs(limit: int = Query(50, ge=1, le=200), user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    jobs = (await db.execute(
+        select(Job).where(Job.user_id == user.id).order_by(Job.created_at.desc(), Job.id.desc()).limit(limit)
+    )).scalars().all()
+    return [build_job_response(job) for job in jobs]
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return build_job_response(await get_user_job(db, job_id, user))
+
+@app.get("/api/v1/jobs/{job_id}/download")
+async def download_job_result(job_id: int, request: Request, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = await get_user_job(db, job_id, user)
+    if job.status != JobStatus.SUCCEEDED or not job.result_key:
+        raise HTTPException(status_code=409, detail="Job result is not ready")
+    
+    result = job.result
+    return blob_response(request, job.result_key, result["sha256"], result["size"], result["mime_type"],
+                         extra_headers={"Content-Disposition": f"attachment; filename={result['filename']}"})
+
 # Users routes
 @app.get("/api/v1/users/")
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return [{"id": user.id, "nickname": user.nickname, "role": user.role} for user in users]
+async def get_users(request: Request, db: AsyncSession = Depends(get_db)):
+    async def build():
+        users = (await db.execute(select(User))).scalars().all()
+        return [{"id": user.id, "nickname": user.nickname, "role": user.role} for user in users]
+    
+    return await cached_json(request, "users", ("users",), build)
 
 @app.post("/api/v1/users/register")
-def register_user(user_data: dict, user_manager: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    if db.query(User).filter(User.nickname == user_data["nickname"]).first():
+async def register_user(user_data: dict, user_manager: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    if await get_user_by_nickname(db, user_data["nickname"]):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    hashed_password = bcrypt.hashpw(user_data["password"].encode('utf-8'), bcrypt.gensalt(rounds=12)).decode('utf-8')
+    hashed_password = await hash_password(user_data["password"])
     
     new_user = User(
         nickname=user_data["nickname"],
@@ -678,79 +1296,96 @@ def register_user(user_data: dict, user_manager: User = Depends(require_role(["M
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User already exists")
+    await response_cache.invalidate("users")
     return {"message": "User registered successfully"}
 
 @app.delete("/api/v1/users/{user_id}")
-def delete_user(user_id: int, user_manager: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    user_to_delete = db.query(User).filter(User.id == user_id).first()
+async def delete_user(user_id: int, user_manager: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    user_to_delete = await db.get(User, user_id)
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user_to_delete.id == user_manager.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
-    db.delete(user_to_delete)
-    db.commit()
+    await db.execute(delete(defect_users).where(defect_users.c.user_id == user_id))
+    await db.execute(delete(project_users).where(project_users.c.user_id == user_id))
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    await response_cache.invalidate("users", "project_users")
     return {"message": "User deleted successfully"}
 
 # Project users management
 @app.get("/api/v1/projects/{project_id}/users")
-def get_project_users(project_id: int, user: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+async def get_project_users(project_id: int, user: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    if not await db.get(Project, project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return [{"id": u.id, "nickname": u.nickname, "role": u.role} for u in project.users]
+    users = (await db.execute(
+        select(User)
+        .join(project_users, project_users.c.user_id == User.id)
+        .where(project_users.c.project_id == project_id)
+    )).scalars().all()
+    return [{"id": u.id, "nickname": u.nickname, "role": u.role} for u in users]
 
 @app.post("/api/v1/projects/{project_id}/users/{user_id}")
-def add_user_to_project(project_id: int, user_id: int, user: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+async def add_user_to_project(project_id: int, user_id: int, user: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    if not await db.get(Project, project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    user_to_add = db.query(User).filter(User.id == user_id).first()
+    user_to_add = await db.get(User, user_id)
     if not user_to_add:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user_to_add.role == RoleEnum.OBSERVER:
         raise HTTPException(status_code=400, detail="Cannot add observers to projects")
     
-    if user_to_add not in project.users:
-        project.users.append(user_to_add)
-        db.commit()
+    if project_id not in await get_user_project_ids(db, user_id):
+        await db.execute(insert(project_users).values(user_id=user_id, project_id=project_id))
+        await db.commit()
+        principal_cache.invalidate_user(user_id)
+        await response_cache.invalidate("project_users")
     
     return {"message": "User added to project"}
 
 @app.delete("/api/v1/projects/{project_id}/users/{user_id}")
-def remove_user_from_project(project_id: int, user_id: int, user: User = Depends(require_role(["MANAGER"])), db: Session = Depends(get_db)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+async def remove_user_from_project(project_id: int, user_id: int, user: Principal = Depends(require_role(["MANAGER"])), db: AsyncSession = Depends(get_db)):
+    if not await db.get(Project, project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    user_to_remove = db.query(User).filter(User.id == user_id).first()
-    if not user_to_remove:
+    if not await db.get(User, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
-    if user_to_remove in project.users:
-        project.users.remove(user_to_remove)
-        db.commit()
+    await db.execute(delete(project_users).where(
+        project_users.c.project_id == project_id, project_users.c.user_id == user_id
+    ))
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    await response_cache.invalidate("project_users")
     
     return {"message": "User removed from project"}
 
 @app.get("/api/v1/projects/{project_id}/available-users")
-def get_available_users_for_defects(project_id: int, current_user: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.nickname == current_user).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def get_available_users_for_defects(project_id: int, request: Request, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Возвращаем только инженеров из проекта
-    engineers = [u for u in project.users if u.role == RoleEnum.ENGINEER]
-    return [{"id": u.id, "nickname": u.nickname, "role": u.role} for u in engineers]
-
-create_admin_if_empty()
\ No newline at end of file
+    async def build():
+        if not await db.get(Project, project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        # Возвращаем только инженеров из проекта
+        engineers = (await db.execute(
+            select(User)
+            .join(project_users, project_users.c.user_id == User.id)
+            .where(project_users.c.project_id == project_id, User.role == RoleEnum.ENGINEER)
+        )).scalars().all()
+        return [{"id": u.id, "nickname": u.nickname, "role": u.role} for u in engineers]
+    
+    return await cached_json(
+        request, f"available-users:{project_id}", ("projects", "project_users", "users"), build
+    )
@@ -6,7 +6,13 @@ from .defect import Defect, DefectStatus, DefectPriority
 from .defect_comment import DefectComment
 from .defect_history import DefectHistory
 from .defect_image import DefectImage
+from .image_variant import ImageVariant
+from .defect_daily_stat import DefectDailyStat
+from .job import Job, JobStatus
+from .defect_event import DefectEvent
+from .sync_tombstone import SyncTombstone
+from .upload import Upload
 from .association import project_users, defect_users
 
 __all__ = ["BaseModel", "User", "RoleEnum", "Project", "Object", "Defect", "DefectStatus", "DefectPriority", 
-           "DefectComment", "DefectHistory", "DefectImage", "project_users", "defect_users"]
+           "DefectComment", "DefectHistory", "DefectImage", "ImageVariant", "DefectDailyStat", "Job", "JobStatus", "DefectEvent", "SyncTombstone", "Upload", "project_users", "defect_users"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey, DateTime, String, UniqueConstraint
+from sqlalchemy import Table, Column, Integer, ForeignKey, DateTime, String, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -13,6 +13,8 @@ project_users = Table(
 
     # Уникальный constraint - пользователь может быть в проекте только один раз
     UniqueConstraint('user_id', 'project_id', name='uq_user_project'),
+    # Ограничение выше покрывает поиск по user_id, для участников проекта нужен свой индекс
+    Index('ix_project_users_project_id', 'project_id'),
     extend_existing=True
 )
 
@@ -24,5 +26,6 @@ defect_users = Table(
     Column('defect_id', Integer, ForeignKey('defects.id'), nullable=False),
     Column('assigned_at', DateTime, server_default=func.now()),
     UniqueConstraint('user_id', 'defect_id', name='uq_user_defect'),
+    Index('ix_defect_users_defect_id', 'defect_id'),
     extend_existing=True
 )
\ No newline at end of file
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Enum, LargeBinary, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, BigInteger, Enum, Date, Index, FetchedValue, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.models.base import BaseModel
 from app.models.association import defect_users
@@ -20,17 +21,41 @@ class DefectPriority(enum.Enum):
 
 class Defect(BaseModel):
     __tablename__ = "defects"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Фильтры списка дефектов вместе с сортировкой keyset-пагинации (колонка, id)
+        Index('ix_defects_object_id_created_at', 'object_id', 'created_at', 'id'),
+        Index('ix_defects_status_created_at', 'status', 'created_at', 'id'),
+        Index('ix_defects_created_at', 'created_at', 'id'),
+        Index('ix_defects_updated_at', 'updated_at', 'id'),
+        # Закрытые дефекты по дате закрытия - для статистики
+        Index('ix_defects_closed_updated_at', 'updated_at', postgresql_where=text("status = 'CLOSED'")),
+        Index('ix_defects_due_date', 'due_date', postgresql_where=text('due_date IS NOT NULL')),
+        # Подсчёт ссылок на файл при удалении
+        Index('ix_defects_photo_key', 'photo_key', postgresql_where=text('photo_key IS NOT NULL')),
+        # Полнотекстовый поиск; триграммный индекс миграция создаёт, только если доступно расширение pg_trgm
+        Index('ix_defects_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_defects_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_defects_change_seq', 'change_seq', 'id'),
+        {'extend_existing': True},
+    )
 
     title = Column(String(100), nullable=False)
     description = Column(Text)
-    photo = Column(LargeBinary)
+    # Сама фотография лежит в хранилище файлов (app.services.storage)
+    photo_key = Column(String(255))
+    photo_size = Column(BigInteger)
+    photo_mime_type = Column(String(100))
+    photo_sha256 = Column(String(64))
     status = Column(Enum(DefectStatus), default=DefectStatus.NEW)
     priority = Column(Enum(DefectPriority), default=DefectPriority.MEDIUM)
     due_date = Column(Date)
     object_id = Column(Integer, ForeignKey("objects.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    # Заполняется триггерами БД (миграция 0007): название, описание, комментарии, объект
+    search_vector = deferred(Column(TSVECTOR))
+    # Номер транзакции, последней изменившей строку; ставит триггер (миграция 0009), читает /api/v1/sync
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     object = relationship("Object", back_populates="defects")
     assigned_users = relationship("User", secondary=defect_users, back_populates="assigned_defects")
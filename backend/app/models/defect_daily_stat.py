@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Enum, UniqueConstraint, Index
+from app.models.base import BaseModel
+from app.models.defect import DefectStatus, DefectPriority
+
+class DefectDailyStat(BaseModel):
+    """Счётчики событий по дефектам за день в разрезе проекта, объекта, статуса и приоритета.
+
+    created - сколько дефектов создано, entered - сколько дефектов перешло в статус
+    (в том числе в начальный при создании), reprioritized - сколько дефектов получило приоритет
+    при его смене. Удаление дефекта счётчики не уменьшает.
+    """
+    __tablename__ = "defect_daily_stats"
+    __table_args__ = (
+        UniqueConstraint('day', 'project_id', 'object_id', 'status', 'priority', name='uq_defect_daily_stat'),
+        Index('ix_defect_daily_stats_project_id_day', 'project_id', 'day'),
+        {'extend_existing': True},
+    )
+
+    day = Column(Date, nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    object_id = Column(Integer, ForeignKey("objects.id"), nullable=False)
+    status = Column(Enum(DefectStatus), nullable=False)
+    priority = Column(Enum(DefectPriority), nullable=False)
+    created = Column(Integer, nullable=False, default=0)
+    entered = Column(Integer, nullable=False, default=0)
+    reprioritized = Column(Integer, nullable=False, default=0, server_default='0')
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, JSON, Index, text
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+class DefectEvent(BaseModel):
+    """Событие ленты изменений. Триггер БД рассылает каждую запись через NOTIFY defect_events,
+    а сама таблица нужна, чтобы переподключившийся клиент дочитал пропущенное по Last-Event-ID.
+
+    Дочитывание идёт по xact_id - номеру записавшей транзакции, а не по id: id выдаётся при вставке,
+    а видимым событие становится при коммите, и транзакции коммитятся не в порядке своих id."""
+    __tablename__ = "defect_events"
+    __table_args__ = (
+        Index('ix_defect_events_xact_id', 'xact_id'),
+        Index('ix_defect_events_project_id_xact_id', 'project_id', 'xact_id'),
+        Index('ix_defect_events_defect_id_xact_id', 'defect_id', 'xact_id'),
+        Index('ix_defect_events_created_at', 'created_at'),
+        {'extend_existing': True},
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    # Без внешних ключей: события об удалённых дефектах и объектах должны остаться в ленте
+    project_id = Column(Integer, nullable=False)
+    defect_id = Column(Integer)
+    user_id = Column(Integer)
+    data = Column(JSON)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    xact_id = Column(BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint"))
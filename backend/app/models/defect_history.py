@@ -1,11 +1,15 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, BigInteger, Index, FetchedValue
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import BaseModel
 
 class DefectHistory(BaseModel):
     __tablename__ = "defect_history"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_defect_history_defect_id', 'defect_id', 'created_at'),
+        Index('ix_defect_history_change_seq', 'change_seq', 'id'),
+        {'extend_existing': True},
+    )
 
     field_name = Column(String(50), nullable=False)
     old_value = Column(Text)
@@ -13,6 +17,8 @@ class DefectHistory(BaseModel):
     defect_id = Column(Integer, ForeignKey("defects.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
+    # Номер транзакции, последней изменившей строку; ставит триггер (миграция 0009), читает /api/v1/sync
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     defect = relationship("Defect", back_populates="history")
     user = relationship("User")
@@ -1,15 +1,26 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, LargeBinary
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, BigInteger, Index, FetchedValue
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import BaseModel
 
 class DefectImage(BaseModel):
     __tablename__ = "defect_images"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_defect_images_defect_id', 'defect_id'),
+        Index('ix_defect_images_storage_key', 'storage_key'),
+        Index('ix_defect_images_change_seq', 'change_seq', 'id'),
+        {'extend_existing': True},
+    )
 
     filename = Column(String(255), nullable=False)
-    image_data = Column(LargeBinary, nullable=False)
+    # Содержимое лежит в хранилище файлов (app.services.storage)
+    storage_key = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mime_type = Column(String(100), nullable=False)
+    sha256 = Column(String(64), nullable=False)
     defect_id = Column(Integer, ForeignKey("defects.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
+    # Номер транзакции, последней изменившей строку; ставит триггер (миграция 0009), читает /api/v1/sync
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     defect = relationship("Defect", back_populates="images")
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+class ImageVariant(BaseModel):
+    """Уменьшенная копия фото или изображения дефекта (миниатюра, превью)."""
+    __tablename__ = "image_variants"
+    __table_args__ = (
+        UniqueConstraint('source_key', 'variant', 'format', name='uq_image_variant'),
+        Index('ix_image_variants_storage_key', 'storage_key'),
+        {'extend_existing': True},
+    )
+
+    # Ключ исходного файла в хранилище: варианты общие для всех записей с одинаковым содержимым
+    source_key = Column(String(255), nullable=False)
+    variant = Column(String(20), nullable=False)
+    format = Column(String(10), nullable=False)
+    storage_key = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mime_type = Column(String(100), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
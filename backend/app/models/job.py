@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Enum, JSON, Index, text
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+import enum
+
+class JobStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+class Job(BaseModel):
+    """Фоновая задача (выгрузка, миниатюры). Очередь - эта таблица, воркеры забирают задачи через SKIP LOCKED."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Выбор следующей задачи: только ожидающие, по приоритету и времени запуска
+        Index('ix_jobs_queued', 'priority', 'run_at', 'id', postgresql_where=text("status = 'QUEUED'")),
+        Index('ix_jobs_user_id_created_at', 'user_id', 'created_at'),
+        Index('ix_jobs_result_key', 'result_key'),
+        {'extend_existing': True},
+    )
+
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    # Меньше - раньше
+    priority = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, nullable=False, server_default=func.now())
+    locked_at = Column(DateTime)
+    locked_by = Column(String(100))
+    error = Column(Text)
+    result = Column(JSON)
+    # Файл результата в хранилище (например, готовая выгрузка)
+    result_key = Column(String(255))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
@@ -1,17 +1,23 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, BigInteger, Index, FetchedValue
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import BaseModel
 
 class Object(BaseModel):
     __tablename__ = "objects"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_objects_project_id', 'project_id'),
+        Index('ix_objects_change_seq', 'change_seq', 'id'),
+        {'extend_existing': True},
+    )
 
     name = Column(String(100), nullable=False)
     description = Column(Text)
     address = Column(String(255))
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
+    # Номер транзакции, последней изменившей строку; ставит триггер (миграция 0009), читает /api/v1/sync
+    change_seq = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     # Связь с проектом (многие к одному)
     project = relationship("Project", back_populates="objects")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Index, text
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+class SyncTombstone(BaseModel):
+    """Запись об удалённой строке для инкрементальной синхронизации (/api/v1/sync).
+    Пишут триггеры на удаление объектов, дефектов и изображений (миграция 0009)."""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index('ix_sync_tombstones_change_seq', 'change_seq', 'id'),
+        Index('ix_sync_tombstones_deleted_at', 'deleted_at'),
+        {'extend_existing': True},
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    # objects, defects или images
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    project_id = Column(Integer)
+    change_seq = Column(BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint"))
+    deleted_at = Column(DateTime, nullable=False, server_default=func.now())
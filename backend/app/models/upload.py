@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Index
+from sqlalchemy.sql import func
+from app.models.base import BaseModel
+
+class Upload(BaseModel):
+    """Возобновляемая загрузка изображения (протокол tus). Принятые байты лежат в файле
+    UPLOAD_TMP_PATH/<id>, его размер - текущее смещение; после последней части файл становится изображением дефекта."""
+    __tablename__ = "uploads"
+    __table_args__ = (
+        Index('ix_uploads_expires_at', 'expires_at'),
+        {'extend_existing': True},
+    )
+
+    id = Column(String(32), primary_key=True)
+    # Без внешних ключей: незавершённая загрузка не мешает удалить дефект или пользователя,
+    # она просто истечёт (или получит 404 на последней части)
+    user_id = Column(Integer, nullable=False)
+    defect_id = Column(Integer, nullable=False)
+    filename = Column(String(255), nullable=False)
+    length = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
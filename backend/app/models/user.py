@@ -14,7 +14,7 @@ class User(BaseModel):
     __tablename__ = "users"
     __table_args__ = {'extend_existing': True}
 
-    nickname: str = Column(String, nullable=False)
+    nickname: str = Column(String, nullable=False, unique=True, index=True)
     password: str = Column(String, nullable=False)
     role = Column(Enum(RoleEnum, name='roleenum', create_constraint=True), nullable=False, default=RoleEnum.OBSERVER)
     created_at = Column(DateTime, server_default=func.now())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, date
 from app.models.defect import DefectStatus, DefectPriority
@@ -54,9 +54,79 @@ class DefectResponse(DefectBase):
     updated_at: datetime
     assigned_user_ids: List[int] = []
     has_photo: bool = False
-    comments: List[DefectCommentResponse] = []
-    history: List[DefectHistoryResponse] = []
+    # Заполняются только по запросу (include=comments,history): первая страница и курсор следующей
+    comments: Optional[List[DefectCommentResponse]] = None
+    history: Optional[List[DefectHistoryResponse]] = None
+    comments_next_cursor: Optional[str] = None
+    history_next_cursor: Optional[str] = None
     image_count: int = 0
 
     class Config:
         from_attributes = True
+
+class DefectSummary(BaseModel):
+    id: int
+    title: str
+    status: DefectStatus
+    priority: DefectPriority
+    due_date: Optional[date] = None
+    object_id: int
+    project_id: int
+    created_at: datetime
+    updated_at: datetime
+    assigned_user_ids: List[int] = []
+    has_photo: bool = False
+    image_count: int = 0
+
+class DefectPage(BaseModel):
+    items: List[DefectSummary]
+    next_cursor: Optional[str] = None
+
+class DefectCommentPage(BaseModel):
+    items: List[DefectCommentResponse]
+    next_cursor: Optional[str] = None
+
+class DefectHistoryPage(BaseModel):
+    items: List[DefectHistoryResponse]
+    next_cursor: Optional[str] = None
+
+class DefectBulkChanges(BaseModel):
+    status: Optional[DefectStatus] = None
+    priority: Optional[DefectPriority] = None
+    due_date: Optional[date] = None
+    assigned_user_ids: Optional[List[int]] = None
+
+class DefectBulkUpdate(BaseModel):
+    defect_ids: List[int] = Field(..., min_length=1, max_length=5000)
+    changes: DefectBulkChanges
+
+class DefectBulkItemResult(BaseModel):
+    id: int
+    # updated, unchanged, not_found или forbidden
+    result: str
+    changed_fields: List[str] = []
+
+class DefectBulkResult(BaseModel):
+    updated: int
+    items: List[DefectBulkItemResult]
+
+class DefectSearchHit(BaseModel):
+    id: int
+    title: str
+    status: DefectStatus
+    priority: DefectPriority
+    object_id: int
+    object_name: str
+    project_id: int
+    created_at: datetime
+    rank: float
+    # Экранированный HTML, совпадения выделены <mark>
+    title_highlight: str
+    description_highlight: Optional[str] = None
+    comment_highlight: Optional[str] = None
+
+class DefectSearchPage(BaseModel):
+    items: List[DefectSearchHit]
+    next_cursor: Optional[str] = None
+    # fulltext - по словам, substring - по части названия (если по словам ничего не нашлось)
+    match: str
@@ -0,0 +1,48 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.models.user import RoleEnum
+from app.schemas.object import ObjectResponse
+from app.schemas.defect import DefectPage
+
+class ProjectInfo(BaseModel):
+    id: int
+    title: str
+
+    class Config:
+        from_attributes = True
+
+class UserInfo(BaseModel):
+    id: int
+    nickname: str
+    role: RoleEnum
+
+    class Config:
+        from_attributes = True
+
+class DashboardObject(ObjectResponse):
+    # Число дефектов объекта по статусам (все статусы, в том числе нулевые)
+    defect_counts: Dict[str, int]
+    defect_total: int
+
+class ProjectDashboard(BaseModel):
+    project: ProjectInfo
+    objects: List[DashboardObject]
+    defects: DefectPage
+    engineers: List[UserInfo]
+    current_user: UserInfo
+
+class ImportRowError(BaseModel):
+    # Номер строки в файле (заголовок - строка 1)
+    row: int
+    column: Optional[str] = None
+    message: str
+
+class ImportResult(BaseModel):
+    kind: str
+    dry_run: bool
+    total_rows: int
+    # При dry_run - сколько строк было бы импортировано
+    imported: int
+    error_count: int
+    # Не больше MAX_REPORTED_ERRORS первых ошибок
+    errors: List[ImportRowError]
@@ -0,0 +1,72 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime, date
+from app.models.defect import DefectStatus, DefectPriority
+
+class SyncObject(BaseModel):
+    id: int
+    project_id: int
+    name: str
+    description: Optional[str] = None
+    address: Optional[str] = None
+    created_at: datetime
+
+class SyncDefect(BaseModel):
+    id: int
+    object_id: int
+    title: str
+    description: Optional[str] = None
+    status: DefectStatus
+    priority: DefectPriority
+    due_date: Optional[date] = None
+    created_at: datetime
+    updated_at: datetime
+    assigned_user_ids: List[int] = []
+    has_photo: bool = False
+
+class SyncComment(BaseModel):
+    id: int
+    defect_id: int
+    content: str
+    user_id: int
+    user_nickname: str
+    created_at: datetime
+
+class SyncHistory(BaseModel):
+    id: int
+    defect_id: int
+    field_name: str
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    user_id: int
+    user_nickname: str
+    created_at: datetime
+
+class SyncImage(BaseModel):
+    # Только метаданные, сам файл - GET /api/v1/defects/{defect_id}/images/{id}
+    id: int
+    defect_id: int
+    filename: str
+    size: int
+    mime_type: str
+    created_at: datetime
+
+class SyncDeleted(BaseModel):
+    # Комментарии, история и изображения удалённого дефекта удаляются вместе с ним
+    objects: List[int] = []
+    defects: List[int] = []
+    images: List[int] = []
+
+class SyncPage(BaseModel):
+    # true - токен устарел или изменился набор доступных проектов: локальные данные нужно сбросить,
+    # страница начинает полную синхронизацию
+    reset: bool = False
+    objects: List[SyncObject] = []
+    defects: List[SyncDefect] = []
+    comments: List[SyncComment] = []
+    history: List[SyncHistory] = []
+    images: List[SyncImage] = []
+    deleted: SyncDeleted = SyncDeleted()
+    # Токен для следующего запроса; пока has_more, он продолжает текущую синхронизацию
+    next_token: str
+    has_more: bool = False
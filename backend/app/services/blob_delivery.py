@@ -0,0 +1,90 @@
+from typing import Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+from app.services.storage import get_blob_store
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Разбирает заголовок Range для одного диапазона байт.
+
+    Возвращает (start, end) включительно. None - если заголовок не поддерживается или
+    синтаксически неверен (RFC 7233, 3.1: отдаём файл целиком), ValueError - если
+    диапазон не пересекается с файлом.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # bytes=-N: последние N байт
+            suffix = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last else None
+    except ValueError:
+        return None
+    if not first:
+        if suffix < 0:
+            return None
+        if suffix == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - suffix, 0), size - 1
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def blob_response(request: Request, key: str, sha256: str, size: int, mime_type: str,
+                  extra_headers: Optional[dict] = None) -> Response:
+    """Ответ с содержимым файла из хранилища: потоковая отдача, Range, ETag и 304."""
+    etag = f'"{sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.IMAGE_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+        **(extra_headers or {}),
+    }
+
+    # Клиенту уже известна эта версия файла - хранилище не трогаем
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                get_blob_store().open(key, start, length),
+                status_code=206,
+                media_type=mime_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)},
+            )
+
+    return StreamingResponse(
+        get_blob_store().open(key),
+        media_type=mime_type,
+        headers={**headers, "Content-Length": str(size)},
+    )
@@ -0,0 +1,169 @@
+from collections import Counter
+from typing import Dict, List
+
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, Object, DefectHistory, User, project_users, defect_users
+from app.models.defect import DefectStatus
+from app.models.user import RoleEnum
+from app.schemas.defect import DefectBulkItemResult, DefectBulkResult
+from app.services.defect_events import changes_data, publish_many
+from app.services.defect_stats import record_defect_events
+from app.services.principals import Principal
+
+# Статусы, которые инженер может выставить (как в PUT /api/v1/defects/{id})
+ENGINEER_STATUSES = (DefectStatus.OPEN, DefectStatus.IN_PROGRESS, DefectStatus.UNDER_REVIEW)
+
+
+class BulkUpdateForbidden(Exception):
+    pass
+
+
+def _history_value(value):
+    # Тот же формат, что пишет update_defect
+    return str(value) if value else None
+
+
+async def bulk_update_defects(db: AsyncSession, user: Principal, defect_ids: List[int], changes: dict) -> DefectBulkResult:
+    """Применяет одни и те же изменения к набору дефектов одной транзакцией.
+
+    Запросов - фиксированное число, независимо от количества дефектов: одно чтение с блокировкой строк,
+    один UPDATE, пакетная вставка истории и назначений. Права - как у update_defect: инженер меняет
+    только статус (на разрешённый и не у новых дефектов); дополнительно оба видят только свои проекты.
+    """
+    # None для статуса и приоритета - «не менять», для срока - «снять срок»
+    changes = {k: v for k, v in changes.items() if v is not None or k == "due_date"}
+    assigned_user_ids = changes.pop("assigned_user_ids", None)
+
+    if user.role == RoleEnum.ENGINEER:
+        if "status" in changes and changes["status"] not in ENGINEER_STATUSES:
+            raise BulkUpdateForbidden("Engineer cannot set this status")
+        changes = {k: v for k, v in changes.items() if k == "status"}
+        assigned_user_ids = None
+
+    ids = list(dict.fromkeys(defect_ids))
+    rows = {row.id: row for row in (await db.execute(
+        select(Defect.id, Defect.status, Defect.priority, Defect.due_date, Defect.object_id, Object.project_id)
+        .join(Object, Object.id == Defect.object_id)
+        .where(Defect.id.in_(ids))
+        .order_by(Defect.id)
+        .with_for_update(of=Defect)
+    )).all()}
+
+    results: Dict[int, DefectBulkItemResult] = {}
+    editable = []
+    for defect_id in ids:
+        row = rows.get(defect_id)
+        if row is None:
+            results[defect_id] = DefectBulkItemResult(id=defect_id, result="not_found")
+        elif row.project_id not in user.project_ids or (
+            user.role == RoleEnum.ENGINEER and row.status == DefectStatus.NEW and "status" in changes
+        ):
+            results[defect_id] = DefectBulkItemResult(id=defect_id, result="forbidden")
+        else:
+            results[defect_id] = DefectBulkItemResult(id=defect_id, result="unchanged")
+            editable.append(row)
+
+    history = []
+    # id дефекта -> изменённые поля с новыми значениями, для ленты изменений
+    event_changes: Dict[int, dict] = {}
+    changed_scalar = []
+    # (проект, объект, статус, приоритет) -> переходы в статус и смены приоритета, для статистики
+    status_events = Counter()
+    priority_events = Counter()
+    for row in editable:
+        fields = [field for field, value in changes.items() if getattr(row, field) != value]
+        if not fields:
+            continue
+        changed_scalar.append(row.id)
+        results[row.id].changed_fields += fields
+        event_changes[row.id] = {field: changes[field] for field in fields}
+        for field in fields:
+            history.append({
+                "field_name": field,
+                "old_value": _history_value(getattr(row, field)),
+                "new_value": _history_value(changes[field]),
+                "defect_id": row.id,
+                "user_id": user.id,
+            })
+        if "status" in fields or "priority" in fields:
+            key = (row.project_id, row.object_id, changes.get("status", row.status), changes.get("priority", row.priority))
+            status_events[key] += "status" in fields
+            priority_events[key] += "priority" in fields
+
+    if changed_scalar:
+        await db.execute(
+            update(Defect)
+            .where(Defect.id.in_(changed_scalar))
+            .values(**changes, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    if assigned_user_ids is not None and editable:
+        await _bulk_assign(db, user, editable, assigned_user_ids, results, history, event_changes)
+
+    if history:
+        # Вставка через таблицу, а не ORM: ORM разбивает пакет на отдельные INSERT по набору непустых полей
+        await db.execute(insert(DefectHistory.__table__), history)
+    await record_defect_events(db, [
+        {"project_id": project_id, "object_id": object_id, "status": status, "priority": priority,
+         "created": 0, "entered": count, "reprioritized": priority_events[project_id, object_id, status, priority]}
+        for (project_id, object_id, status, priority), count in status_events.items()
+    ])
+    await publish_many(db, [
+        {"kind": "defect.updated", "project_id": rows[defect_id].project_id, "defect_id": defect_id,
+         "data": changes_data(fields), "user_id": user.id}
+        for defect_id, fields in event_changes.items()
+    ])
+
+    items = [results[defect_id] for defect_id in ids]
+    for item in items:
+        if item.changed_fields:
+            item.result = "updated"
+    return DefectBulkResult(updated=sum(item.result == "updated" for item in items), items=items)
+
+
+async def _bulk_assign(db: AsyncSession, user: Principal, rows, assigned_user_ids: List[int], results, history, event_changes) -> None:
+    """Назначает инженеров: в каждом дефекте остаются только инженеры его проекта."""
+    project_ids = {row.project_id for row in rows}
+    engineers = {}
+    for project_id, user_id in (await db.execute(
+        select(project_users.c.project_id, User.id)
+        .join(User, User.id == project_users.c.user_id)
+        .where(project_users.c.project_id.in_(project_ids), User.role == RoleEnum.ENGINEER)
+    )).all():
+        engineers.setdefault(project_id, set()).add(user_id)
+
+    current = {}
+    for defect_id, user_id in (await db.execute(
+        select(defect_users.c.defect_id, defect_users.c.user_id)
+        .where(defect_users.c.defect_id.in_([row.id for row in rows]))
+        .order_by(defect_users.c.defect_id, defect_users.c.user_id)
+    )).all():
+        current.setdefault(defect_id, []).append(user_id)
+
+    changed = []
+    new_links = []
+    for row in rows:
+        project_engineers = engineers.get(row.project_id, set())
+        valid_user_ids = list(dict.fromkeys(uid for uid in assigned_user_ids if uid in project_engineers))
+        old_users = current.get(row.id, [])
+        if sorted(old_users) == sorted(valid_user_ids):
+            continue
+        changed.append(row.id)
+        results[row.id].changed_fields.append("assigned_users")
+        event_changes.setdefault(row.id, {})["assigned_user_ids"] = valid_user_ids
+        history.append({
+            "field_name": "assigned_users",
+            "old_value": str(old_users),
+            "new_value": str(valid_user_ids),
+            "defect_id": row.id,
+            "user_id": user.id,
+        })
+        new_links += [{"defect_id": row.id, "user_id": uid} for uid in valid_user_ids]
+
+    if changed:
+        await db.execute(delete(defect_users).where(defect_users.c.defect_id.in_(changed)))
+    if new_links:
+        await db.execute(insert(defect_users), new_links)
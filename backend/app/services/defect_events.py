@@ -0,0 +1,290 @@
+"""Лента изменений дефектов для клиентов (Server-Sent Events).
+
+Обработчики записывают события в таблицу defect_events в той же транзакции, что и само изменение.
+Триггер БД рассылает каждое событие через NOTIFY defect_events, а каждый процесс API держит одно
+соединение с LISTEN и раздаёт события своим подписчикам. Переподключившийся клиент присылает
+Last-Event-ID и дочитывает пропущенное из таблицы.
+
+id в потоке - не номер события, а граница, как токен app.services.sync: xmin снимка, все транзакции
+с меньшим номером уже завершены и их события клиент получил. Дочитываются события с xact_id >= границы,
+поэтому событие транзакции, закоммиченной позже следующей за ней по id, не теряется. События у границы
+могут прийти повторно - клиент отбрасывает их по id из data.
+"""
+import asyncio
+import json
+import logging
+from datetime import date
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Set
+
+import asyncpg
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models import Defect, DefectEvent, Object
+from app.services.sync import CURRENT_XMIN
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "defect_events"
+
+# Служебные элементы очереди подписчика
+RESYNC = object()
+CLOSED = object()
+
+
+class Horizon(int):
+    """Элемент очереди: все события транзакций с меньшим номером уже разосланы."""
+
+EVENT_VALUE_FIELDS = ("title", "status", "priority", "due_date", "assigned_user_ids")
+
+# Пауза перед повторным подключением LISTEN после обрыва, секунд
+RECONNECT_DELAY = 2.0
+
+
+async def publish(
+    db: AsyncSession,
+    kind: str,
+    project_id: Optional[int] = None,
+    defect_id: Optional[int] = None,
+    data: Optional[dict] = None,
+    user_id: Optional[int] = None,
+) -> None:
+    """Записывает событие в текущую транзакцию; подписчики получат его после коммита.
+
+    Без project_id проект берётся по дефекту тем же запросом - для удаления его нужно вызвать до удаления дефекта.
+    """
+    if project_id is None:
+        project_id = (
+            select(Object.project_id)
+            .join(Defect, Defect.object_id == Object.id)
+            .where(Defect.id == defect_id)
+            .scalar_subquery()
+        )
+    await db.execute(insert(DefectEvent).values(
+        kind=kind, project_id=project_id, defect_id=defect_id, data=data, user_id=user_id
+    ))
+
+
+async def publish_many(db: AsyncSession, events: List[dict]) -> None:
+    """Пакетная запись событий (массовые изменения): словари с теми же ключами, что у publish."""
+    if events:
+        await db.execute(insert(DefectEvent.__table__), [
+            {"data": None, "user_id": None, "defect_id": None, **event} for event in events
+        ])
+
+
+def _json_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def changes_data(changes: dict) -> dict:
+    """data события defect.updated: список изменённых полей и новые значения коротких полей.
+
+    Описание и прочий длинный текст в событие не попадают - клиент перечитывает дефект сам.
+    """
+    return {
+        "fields": list(changes),
+        "values": {field: _json_value(value) for field, value in changes.items() if field in EVENT_VALUE_FIELDS},
+    }
+
+
+def event_dict(event: DefectEvent) -> dict:
+    return {
+        "id": event.id,
+        "kind": event.kind,
+        "project_id": event.project_id,
+        "defect_id": event.defect_id,
+        "user_id": event.user_id,
+        "data": event.data,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+class Subscription:
+    def __init__(self, project_ids: Optional[Set[int]], project_id: Optional[int], defect_id: Optional[int]):
+        # project_ids - доступные пользователю проекты (None - все)
+        self.project_ids = project_ids
+        self.project_id = project_id
+        self.defect_id = defect_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def matches(self, event: dict) -> bool:
+        if self.project_ids is not None and event["project_id"] not in self.project_ids:
+            return False
+        if self.project_id is not None and event["project_id"] != self.project_id:
+            return False
+        return self.defect_id is None or event["defect_id"] == self.defect_id
+
+    def put(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: выбрасываем очередь, поток перечитает пропущенное из БД
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class EventBroker:
+    """Одно соединение LISTEN на процесс; подключается при первом подписчике."""
+
+    def __init__(self):
+        self.subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, project_ids: Optional[Set[int]], project_id: Optional[int] = None, defect_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(project_ids, project_id, defect_id)
+        self.subscriptions.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(), name="defect-events-listener")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in self.subscriptions:
+            subscription.put(CLOSED)
+        self.subscriptions.clear()
+
+    def _dispatch(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Invalid defect event payload: %r", payload[:200])
+            return
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event):
+                subscription.put(event)
+
+    async def _listen(self) -> None:
+        dsn = settings.EVENTS_DATABASE_URL or settings.DATABASE_URL
+        dsn = dsn.replace("postgresql+asyncpg://", "postgresql://").replace("postgresql+psycopg2://", "postgresql://")
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(CHANNEL, self._dispatch)
+                # Пока соединения не было, события могли пройти мимо - все потоки дочитывают их из БД
+                for subscription in list(self.subscriptions):
+                    subscription.put(RESYNC)
+                previous = None
+                while not connection.is_closed():
+                    await asyncio.sleep(settings.EVENTS_HEARTBEAT_INTERVAL)
+                    xmin = await connection.fetchval(str(CURRENT_XMIN))
+                    # Уведомление приходит чуть позже, чем транзакция становится завершённой для снимков,
+                    # поэтому подписчикам отдаётся граница, снятая на прошлом шаге
+                    if previous is not None:
+                        for subscription in list(self.subscriptions):
+                            subscription.put(Horizon(previous))
+                    previous = xmin
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Defect events listener failed, reconnecting")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+event_broker = EventBroker()
+
+
+async def load_events(subscription: Subscription, horizon: int, limit: int) -> List[dict]:
+    query = select(DefectEvent).where(DefectEvent.xact_id >= horizon).order_by(DefectEvent.xact_id, DefectEvent.id).limit(limit)
+    if subscription.defect_id is not None:
+        query = query.where(DefectEvent.defect_id == subscription.defect_id)
+    if subscription.project_id is not None:
+        query = query.where(DefectEvent.project_id == subscription.project_id)
+    if subscription.project_ids is not None:
+        query = query.where(DefectEvent.project_id.in_(subscription.project_ids))
+    async with AsyncSessionLocal() as db:
+        return [event_dict(event) for event in (await db.execute(query)).scalars().all()]
+
+
+async def current_horizon() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(CURRENT_XMIN)
+
+
+def format_event(event: dict, horizon: int) -> str:
+    return f"id: {horizon}\nevent: {event['kind']}\ndata: {json.dumps(event, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+async def event_stream(
+    horizon: Optional[int],
+    project_ids: Optional[Set[int]] = None,
+    project_id: Optional[int] = None,
+    defect_id: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """Поток SSE: пропущенное после границы horizon из БД, затем события по мере коммитов.
+
+    Подписка оформляется до чтения БД, поэтому событие не теряется между дочитыванием и живым потоком.
+    """
+    subscription = event_broker.subscribe(project_ids, project_id, defect_id)
+    sent: Set[int] = set()
+
+    async def replay():
+        nonlocal horizon, sent
+        # Граница снимается до чтения: всё, что закоммичено раньше, чтение увидит
+        mark = await current_horizon()
+        events = await load_events(subscription, horizon, settings.EVENTS_REPLAY_LIMIT + 1)
+        if len(events) > settings.EVENTS_REPLAY_LIMIT:
+            # Пропущено слишком много - клиенту проще перечитать данные целиком
+            horizon = mark
+            sent = set()
+            return [f"id: {horizon}\nevent: reset\ndata: {{}}\n\n"]
+        sent = {event["id"] for event in events}
+        # Пока клиент не получил все события, граница прежняя
+        chunks = [format_event(event, horizon) for event in events]
+        horizon = max(horizon, mark)
+        return chunks + [f"id: {horizon}\n\n"]
+
+    try:
+        yield f"retry: {int(RECONNECT_DELAY * 1000)}\n\n"
+        if horizon is None:
+            # Новый клиент начинает с текущего момента
+            horizon = await current_horizon()
+            yield f"id: {horizon}\n\n"
+        else:
+            for chunk in await replay():
+                yield chunk
+
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if item is CLOSED:
+                break
+            if item is RESYNC:
+                for chunk in await replay():
+                    yield chunk
+                continue
+            if isinstance(item, Horizon):
+                if item > horizon:
+                    horizon = int(item)
+                    # Сообщение без data не доходит до обработчика, но обновляет Last-Event-ID клиента
+                    yield f"id: {horizon}\n\n"
+                continue
+            if item["id"] in sent:
+                continue
+            yield format_event(item, horizon)
+    finally:
+        event_broker.unsubscribe(subscription)
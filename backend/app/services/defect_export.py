@@ -0,0 +1,200 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+import xlsxwriter
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal
+from app.models import Defect, Object, Project
+from app.models.defect import DefectStatus
+from app.services.jobs import job_handler
+from app.services.storage import CHUNK_SIZE, claim_blob, get_blob_store
+
+EXPORT_HEADER = ['ID', 'Название', 'Описание', 'Статус', 'Приоритет', 'Создан', 'Обновлен', 'Объект', 'Проект']
+
+# Сколько строк забираем из курсора БД за раз
+EXPORT_BATCH_SIZE = 1000
+
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def export_query(
+    project_ids: Optional[List[int]] = None,
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    statuses: Optional[List[DefectStatus]] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+):
+    """Запрос строк выгрузки. project_ids - доступные пользователю проекты (None - все)."""
+    query = (
+        select(
+            Defect.id,
+            Defect.title,
+            Defect.description,
+            Defect.status,
+            Defect.priority,
+            Defect.created_at,
+            Defect.updated_at,
+            Object.name.label("object_name"),
+            Project.title.label("project_title"),
+        )
+        .join(Object, Object.id == Defect.object_id)
+        .join(Project, Project.id == Object.project_id)
+    )
+    if project_ids is not None:
+        query = query.where(Object.project_id.in_(project_ids))
+    if project_id:
+        query = query.where(Object.project_id == project_id)
+    if object_id:
+        query = query.where(Defect.object_id == object_id)
+    if statuses:
+        query = query.where(Defect.status.in_(statuses))
+    if created_from:
+        query = query.where(Defect.created_at >= datetime.combine(created_from, datetime.min.time()))
+    if created_to:
+        query = query.where(Defect.created_at < datetime.combine(created_to + timedelta(days=1), datetime.min.time()))
+    return query.order_by(Defect.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _format_datetime(value: Optional[datetime]) -> str:
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _csv_row(row) -> list:
+    return [
+        row.id,
+        row.title,
+        row.description or '',
+        row.status.value,
+        row.priority.value,
+        _format_datetime(row.created_at),
+        _format_datetime(row.updated_at),
+        row.object_name,
+        row.project_title,
+    ]
+
+
+async def _row_batches(query):
+    # Своя сессия: зависимость get_db закрывается раньше, чем отдаётся тело ответа.
+    # stream() читает результат серверным курсором порциями по EXPORT_BATCH_SIZE строк
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
+
+async def stream_csv(query) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    async for rows in _row_batches(query):
+        writer.writerows(_csv_row(row) for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _write_xlsx_rows(sheet, first_row: int, rows, date_format) -> None:
+    for offset, row in enumerate(rows):
+        values = _csv_row(row)
+        sheet.write_row(first_row + offset, 0, values[:5])
+        for column, value in ((5, row.created_at), (6, row.updated_at)):
+            if value:
+                sheet.write_datetime(first_row + offset, column, value, date_format)
+        sheet.write_row(first_row + offset, 7, values[7:])
+
+
+async def write_xlsx(query, path: str) -> None:
+    """Собирает XLSX в файле path: constant_memory держит в памяти только текущую строку."""
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    sheet = workbook.add_worksheet("Дефекты")
+    sheet.write_row(0, 0, EXPORT_HEADER, workbook.add_format({"bold": True}))
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+
+    next_row = 1
+    async for rows in _row_batches(query):
+        await run_in_threadpool(_write_xlsx_rows, sheet, next_row, rows, date_format)
+        next_row += len(rows)
+    await run_in_threadpool(workbook.close)
+
+
+async def stream_xlsx(query) -> AsyncIterator[bytes]:
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await write_xlsx(query, path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = await run_in_threadpool(f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
+
+
+def export_job_payload(
+    format: str,
+    project_ids: Optional[List[int]] = None,
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    statuses: Optional[List[DefectStatus]] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+) -> dict:
+    """Параметры выгрузки в виде, пригодном для Job.payload (JSON)."""
+    return {
+        "format": format,
+        "project_ids": project_ids,
+        "project_id": project_id,
+        "object_id": object_id,
+        "statuses": [s.value for s in statuses] if statuses else None,
+        "created_from": created_from.isoformat() if created_from else None,
+        "created_to": created_to.isoformat() if created_to else None,
+    }
+
+
+@job_handler("export_defects", concurrency=2)
+async def export_defects_job(db, job) -> dict:
+    """Готовит файл выгрузки и кладёт его в хранилище - клиент скачивает его по готовности задачи."""
+    params = job.payload
+    query = export_query(
+        project_ids=params["project_ids"],
+        project_id=params["project_id"],
+        object_id=params["object_id"],
+        statuses=[DefectStatus(s) for s in params["statuses"]] if params["statuses"] else None,
+        created_from=date.fromisoformat(params["created_from"]) if params["created_from"] else None,
+        created_to=date.fromisoformat(params["created_to"]) if params["created_to"] else None,
+    )
+    fmt = params["format"]
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    try:
+        if fmt == "xlsx":
+            os.close(fd)
+            await write_xlsx(query, path)
+        else:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in stream_csv(query):
+                    await run_in_threadpool(f.write, chunk)
+        with open(path, "rb") as f:
+            stored = await run_in_threadpool(get_blob_store().put, f)
+            # Ссылку на файл (Job.result_key) воркер сохраняет в этой же транзакции
+            await claim_blob(db, stored, f)
+    finally:
+        os.unlink(path)
+
+    return {
+        "storage_key": stored.key,
+        "filename": f"defects_export_{date.today()}.{fmt}",
+        "mime_type": XLSX_MIME_TYPE if fmt == "xlsx" else "text/csv",
+        "size": stored.size,
+        "sha256": stored.sha256,
+    }
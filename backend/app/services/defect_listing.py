@@ -0,0 +1,202 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import func, select, tuple_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, Object, DefectImage, DefectComment, DefectHistory, User, defect_users
+from app.models.defect import DefectStatus, DefectPriority
+from app.schemas.defect import DefectSummary, DefectPage
+
+# Колонки, по которым разрешена сортировка (keyset по паре (колонка, id))
+SORT_COLUMNS = {
+    "created_at": Defect.created_at,
+    "updated_at": Defect.updated_at,
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, value: datetime, defect_id: int) -> str:
+    raw = json.dumps({"s": sort, "v": value.isoformat(), "id": defect_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if data["s"] != sort:
+            raise InvalidCursor("Cursor was issued for another sort order")
+        return datetime.fromisoformat(data["v"]), int(data["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def list_defect_summaries(
+    db: AsyncSession,
+    project_ids: Optional[List[int]] = None,
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    statuses: Optional[List[DefectStatus]] = None,
+    priorities: Optional[List[DefectPriority]] = None,
+    assignee_id: Optional[int] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    q: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> DefectPage:
+    """Страница кратких записей дефектов с keyset-пагинацией.
+
+    project_ids ограничивает выборку проектами, доступными пользователю
+    (None - без ограничений, для наблюдателей).
+    """
+    sort_column = SORT_COLUMNS[sort]
+
+    image_count = (
+        select(func.count(DefectImage.id))
+        .where(DefectImage.defect_id == Defect.id)
+        .correlate(Defect)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Defect.id,
+            Defect.title,
+            Defect.status,
+            Defect.priority,
+            Defect.due_date,
+            Defect.object_id,
+            Object.project_id,
+            Defect.created_at,
+            Defect.updated_at,
+            Defect.photo_key.isnot(None).label("has_photo"),
+            image_count.label("image_count"),
+        )
+        .join(Object, Object.id == Defect.object_id)
+    )
+
+    if project_ids is not None:
+        query = query.where(Object.project_id.in_(project_ids))
+    if project_id:
+        query = query.where(Object.project_id == project_id)
+    if object_id:
+        query = query.where(Defect.object_id == object_id)
+    if statuses:
+        query = query.where(Defect.status.in_(statuses))
+    if priorities:
+        query = query.where(Defect.priority.in_(priorities))
+    if assignee_id:
+        query = query.where(exists().where(
+            defect_users.c.defect_id == Defect.id,
+            defect_users.c.user_id == assignee_id,
+        ))
+    if due_from:
+        query = query.where(Defect.due_date >= due_from)
+    if due_to:
+        query = query.where(Defect.due_date <= due_to)
+    if q:
+        query = query.where(Defect.title.ilike(f"%{_escape_like(q)}%", escape="\\"))
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if order == "desc":
+            query = query.where(tuple_(sort_column, Defect.id) < tuple_(value, last_id))
+        else:
+            query = query.where(tuple_(sort_column, Defect.id) > tuple_(value, last_id))
+
+    if order == "desc":
+        query = query.order_by(sort_column.desc(), Defect.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Defect.id.asc())
+
+    # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    assigned = {}
+    if rows:
+        assignments = (await db.execute(
+            select(defect_users.c.defect_id, defect_users.c.user_id)
+            .where(defect_users.c.defect_id.in_([r.id for r in rows]))
+        )).all()
+        for defect_id, user_id in assignments:
+            assigned.setdefault(defect_id, []).append(user_id)
+
+    items = [
+        DefectSummary(
+            id=r.id,
+            title=r.title,
+            status=r.status,
+            priority=r.priority,
+            due_date=r.due_date,
+            object_id=r.object_id,
+            project_id=r.project_id,
+            created_at=r.created_at,
+            updated_at=r.updated_at,
+            assigned_user_ids=assigned.get(r.id, []),
+            has_photo=r.has_photo,
+            image_count=r.image_count,
+        )
+        for r in rows
+    ]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort), last.id)
+
+    return DefectPage(items=items, next_cursor=next_cursor)
+
+
+async def _activity_page(db: AsyncSession, model, columns, sort: str, defect_id: int,
+                         cursor: Optional[str], limit: int, order: str):
+    query = (
+        select(model.id, model.created_at, model.user_id, User.nickname.label("user_nickname"), *columns)
+        .join(User, User.id == model.user_id)
+        .where(model.defect_id == defect_id)
+    )
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if order == "desc":
+            query = query.where(tuple_(model.created_at, model.id) < tuple_(value, last_id))
+        else:
+            query = query.where(tuple_(model.created_at, model.id) > tuple_(value, last_id))
+    if order == "desc":
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+async def list_defect_comments(db: AsyncSession, defect_id: int, cursor: Optional[str] = None,
+                               limit: int = 50, order: str = "asc"):
+    """Комментарии дефекта страницами (по умолчанию от старых к новым). Возвращает (строки, курсор)."""
+    return await _activity_page(db, DefectComment, (DefectComment.content,), "comments",
+                                defect_id, cursor, limit, order)
+
+
+async def list_defect_history(db: AsyncSession, defect_id: int, cursor: Optional[str] = None,
+                              limit: int = 50, order: str = "desc"):
+    """История изменений дефекта страницами (по умолчанию от новых к старым). Возвращает (строки, курсор)."""
+    return await _activity_page(db, DefectHistory,
+                                (DefectHistory.field_name, DefectHistory.old_value, DefectHistory.new_value),
+                                "history", defect_id, cursor, limit, order)
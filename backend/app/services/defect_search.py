@@ -0,0 +1,188 @@
+"""Поиск дефектов по названию, описанию, комментариям и объекту.
+
+Основной режим - полнотекстовый по defects.search_vector (его поддерживают триггеры миграции 0007),
+последнее слово запроса ищется как префикс. Если по словам ничего не нашлось, ищем подстроку в названии
+(ILIKE, с расширением pg_trgm - по триграммному индексу).
+"""
+import base64
+import html
+import json
+import re
+from typing import List, Optional
+
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, DefectComment, Object
+from app.models.defect import DefectStatus
+from app.schemas.defect import DefectSearchHit, DefectSearchPage
+from app.services.defect_listing import InvalidCursor, _escape_like
+
+SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+# Подстрока короче трёх символов не попадает в триграммный индекс
+MIN_SUBSTRING_LENGTH = 3
+
+# Маркеры ts_headline: управляющие символы не встречаются в тексте и переживают html.escape
+START_MARK, STOP_MARK = "\x02", "\x03"
+TITLE_HEADLINE_OPTIONS = f"StartSel={START_MARK}, StopSel={STOP_MARK}, HighlightAll=true"
+TEXT_HEADLINE_OPTIONS = f"StartSel={START_MARK}, StopSel={STOP_MARK}, MaxFragments=2, MaxWords=20, MinWords=5"
+
+
+def build_tsquery(q: str) -> Optional[str]:
+    """Текст для to_tsquery: все слова обязательны, последнее - префикс (поиск по мере набора)."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    return " & ".join(words[:-1] + [words[-1] + ":*"])
+
+
+def _highlight(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return html.escape(text).replace(START_MARK, "<mark>").replace(STOP_MARK, "</mark>")
+
+
+def _mark_substring(text: str, q: str) -> str:
+    return re.sub(re.escape(html.escape(q)), lambda m: f"<mark>{m.group(0)}</mark>", html.escape(text), flags=re.IGNORECASE)
+
+
+def encode_search_cursor(match: str, rank: float, defect_id: int) -> str:
+    raw = json.dumps({"m": match, "r": rank, "id": defect_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if data["m"] not in ("fulltext", "substring"):
+            raise InvalidCursor("Unknown match mode")
+        return data["m"], float(data["r"]), int(data["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def _scope(query, project_ids, project_id, object_id, statuses):
+    if project_ids is not None:
+        query = query.where(Object.project_id.in_(project_ids))
+    if project_id:
+        query = query.where(Object.project_id == project_id)
+    if object_id:
+        query = query.where(Defect.object_id == object_id)
+    if statuses:
+        query = query.where(Defect.status.in_(statuses))
+    return query
+
+
+async def search_defects(
+    db: AsyncSession,
+    q: str,
+    project_ids: Optional[List[int]] = None,
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    statuses: Optional[List[DefectStatus]] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> DefectSearchPage:
+    """Страница результатов по убыванию релевантности, keyset-пагинация по (rank, id).
+
+    project_ids ограничивает поиск проектами, доступными пользователю (None - все).
+    """
+    match, after = "fulltext", None
+    if cursor:
+        match, after_rank, after_id = decode_search_cursor(cursor)
+        after = (after_rank, after_id)
+
+    tsquery = build_tsquery(q)
+    if match == "fulltext" and tsquery:
+        page = await _fulltext_page(db, tsquery, project_ids, project_id, object_id, statuses, after, limit)
+        # Если по словам ничего нет, пробуем подстроку; следующие страницы продолжают выбранный режим
+        if page.items or cursor:
+            return page
+    if len(q.strip()) < MIN_SUBSTRING_LENGTH:
+        return DefectSearchPage(items=[], match="substring")
+    return await _substring_page(db, q.strip(), project_ids, project_id, object_id, statuses, after, limit)
+
+
+async def _fulltext_page(db, tsquery, project_ids, project_id, object_id, statuses, after, limit) -> DefectSearchPage:
+    ts_query = func.to_tsquery(SEARCH_CONFIG, tsquery)
+    rank = func.ts_rank(Defect.search_vector, ts_query)
+    ranked = _scope(
+        select(Defect.id, rank.label("rank"))
+        .join(Object, Object.id == Defect.object_id)
+        .where(Defect.search_vector.op("@@")(ts_query)),
+        project_ids, project_id, object_id, statuses,
+    )
+    if after:
+        ranked = ranked.where(or_(rank < after[0], and_(rank == after[0], Defect.id < after[1])))
+    # Подсветка считается только для строк страницы - во внешнем запросе после LIMIT
+    ranked = ranked.order_by(rank.desc(), Defect.id.desc()).limit(limit + 1).subquery()
+
+    comment_headline = (
+        select(func.ts_headline(SEARCH_CONFIG, DefectComment.content, ts_query, TEXT_HEADLINE_OPTIONS))
+        .where(
+            DefectComment.defect_id == ranked.c.id,
+            func.to_tsvector(SEARCH_CONFIG, DefectComment.content).op("@@")(ts_query),
+        )
+        .order_by(DefectComment.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(
+        select(
+            Defect.id, Defect.title, Defect.status, Defect.priority, Defect.object_id, Defect.created_at,
+            Object.name.label("object_name"), Object.project_id, ranked.c.rank,
+            func.ts_headline(SEARCH_CONFIG, Defect.title, ts_query, TITLE_HEADLINE_OPTIONS).label("title_headline"),
+            func.ts_headline(SEARCH_CONFIG, Defect.description, ts_query, TEXT_HEADLINE_OPTIONS).label("description_headline"),
+            comment_headline.label("comment_headline"),
+        )
+        .select_from(ranked)
+        .join(Defect, Defect.id == ranked.c.id)
+        .join(Object, Object.id == Defect.object_id)
+        .order_by(ranked.c.rank.desc(), ranked.c.id.desc())
+    )).all()
+
+    items = [
+        DefectSearchHit(
+            id=row.id, title=row.title, status=row.status, priority=row.priority, object_id=row.object_id,
+            object_name=row.object_name, project_id=row.project_id, created_at=row.created_at, rank=row.rank,
+            title_highlight=_highlight(row.title_headline),
+            # Без совпадения в описании ts_headline возвращает его начало - такую подсветку не отдаём
+            description_highlight=_highlight(row.description_headline) if START_MARK in (row.description_headline or "") else None,
+            comment_highlight=_highlight(row.comment_headline),
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_search_cursor("fulltext", items[-1].rank, items[-1].id)
+    return DefectSearchPage(items=items, next_cursor=next_cursor, match="fulltext")
+
+
+async def _substring_page(db, q, project_ids, project_id, object_id, statuses, after, limit) -> DefectSearchPage:
+    query = _scope(
+        select(
+            Defect.id, Defect.title, Defect.status, Defect.priority, Defect.object_id, Defect.created_at,
+            Object.name.label("object_name"), Object.project_id,
+        )
+        .join(Object, Object.id == Defect.object_id)
+        .where(Defect.title.ilike(f"%{_escape_like(q)}%", escape="\\")),
+        project_ids, project_id, object_id, statuses,
+    )
+    if after:
+        query = query.where(Defect.id < after[1])
+    rows = (await db.execute(query.order_by(Defect.id.desc()).limit(limit + 1))).all()
+
+    items = [
+        DefectSearchHit(
+            id=row.id, title=row.title, status=row.status, priority=row.priority, object_id=row.object_id,
+            object_name=row.object_name, project_id=row.project_id, created_at=row.created_at, rank=0,
+            title_highlight=_mark_substring(row.title, q),
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_search_cursor("substring", 0, items[-1].id)
+    return DefectSearchPage(items=items, next_cursor=next_cursor, match="substring")
@@ -0,0 +1,119 @@
+"""Отдача дефектов без лишних проходов по данным.
+
+Для эндпоинта с response_model FastAPI превращает возвращённую модель в dict, валидирует его заново
+и только потом сериализует. Данные, собранные самим приложением, повторная проверка не нужна:
+model_response сериализует готовую модель одним проходом pydantic-core, а старый список
+/api/v1/defects/ собирается из кортежей строк прямо в словари формата DefectResponse для orjson.
+"""
+from typing import Iterable, List, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import Integer, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, DefectComment, DefectHistory, DefectImage, Object, User, defect_users
+
+TRANSLATIONS = {
+    'status': {
+        'NEW': 'Новый',
+        'OPEN': 'Открыт',
+        'IN_PROGRESS': 'В работе',
+        'UNDER_REVIEW': 'На проверке',
+        'CLOSED': 'Закрыт'
+    },
+    'priority': {
+        'LOW': 'Низкий',
+        'MEDIUM': 'Средний',
+        'HIGH': 'Высокий',
+        'CRITICAL': 'Критический'
+    }
+}
+
+
+def translate_value(field_name: str, value: str) -> str:
+    if not value:
+        return value
+    return TRANSLATIONS.get(field_name, {}).get(value, value)
+
+
+def model_response(model: BaseModel) -> Response:
+    """Ответ из уже проверенной модели - без повторной валидации в FastAPI."""
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+async def defect_list(db: AsyncSession, project_ids: Optional[Iterable[int]], object_id: Optional[int] = None) -> List[dict]:
+    """Дефекты со всеми комментариями и историей в формате DefectResponse. project_ids - None для всех проектов.
+
+    Пять запросов независимо от числа дефектов; ORM-объекты и модели pydantic не создаются.
+    Комментарии и история - от старых к новым.
+    """
+    query = select(
+        Defect.id, Defect.title, Defect.description, Defect.status, Defect.priority, Defect.due_date,
+        Defect.object_id, Defect.created_at, Defect.updated_at, Defect.photo_key,
+    )
+    if object_id:
+        query = query.where(Defect.object_id == object_id)
+    if project_ids is not None:
+        query = query.join(Object, Object.id == Defect.object_id).where(Object.project_id.in_(project_ids))
+    rows = (await db.execute(query.order_by(Defect.id))).all()
+    if not rows:
+        return []
+
+    # Один параметр-массив вместо списка IN: число дефектов не ограничено числом параметров запроса
+    ids = any_(bindparam("ids", [row.id for row in rows], type_=ARRAY(Integer)))
+
+    assigned, comments, history = {}, {}, {}
+    for defect_id, user_id in (await db.execute(
+        select(defect_users.c.defect_id, defect_users.c.user_id)
+        .where(defect_users.c.defect_id == ids).order_by(defect_users.c.id)
+    )).all():
+        assigned.setdefault(defect_id, []).append(user_id)
+    image_counts = dict((await db.execute(
+        select(DefectImage.defect_id, func.count()).where(DefectImage.defect_id == ids).group_by(DefectImage.defect_id)
+    )).all())
+    for comment_id, defect_id, content, user_id, nickname, created_at in (await db.execute(
+        select(DefectComment.id, DefectComment.defect_id, DefectComment.content, DefectComment.user_id, User.nickname,
+               DefectComment.created_at)
+        .join(User, User.id == DefectComment.user_id)
+        .where(DefectComment.defect_id == ids).order_by(DefectComment.created_at, DefectComment.id)
+    )).all():
+        comments.setdefault(defect_id, []).append({
+            "id": comment_id, "content": content, "user_id": user_id, "user_nickname": nickname, "created_at": created_at,
+        })
+    for history_id, defect_id, field_name, old_value, new_value, user_id, nickname, created_at in (await db.execute(
+        select(DefectHistory.id, DefectHistory.defect_id, DefectHistory.field_name, DefectHistory.old_value,
+               DefectHistory.new_value, DefectHistory.user_id, User.nickname, DefectHistory.created_at)
+        .join(User, User.id == DefectHistory.user_id)
+        .where(DefectHistory.defect_id == ids).order_by(DefectHistory.created_at, DefectHistory.id)
+    )).all():
+        history.setdefault(defect_id, []).append({
+            "id": history_id,
+            "field_name": field_name,
+            "old_value": translate_value(field_name, old_value),
+            "new_value": translate_value(field_name, new_value),
+            "user_id": user_id,
+            "user_nickname": nickname,
+            "created_at": created_at,
+        })
+
+    # Порядок и состав полей - как у DefectResponse; перечисления orjson пишет их значениями
+    return [{
+        "title": row.title,
+        "description": row.description,
+        "status": row.status,
+        "priority": row.priority,
+        "due_date": row.due_date,
+        "id": row.id,
+        "object_id": row.object_id,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "assigned_user_ids": assigned.get(row.id, []),
+        "has_photo": row.photo_key is not None,
+        "comments": comments.get(row.id, []),
+        "history": history.get(row.id, []),
+        "comments_next_cursor": None,
+        "history_next_cursor": None,
+        "image_count": image_counts.get(row.id, 0),
+    } for row in rows]
@@ -0,0 +1,189 @@
+"""Суточная статистика по дефектам (таблица defect_daily_stats).
+
+Пересчитать таблицу по defects и defect_history:
+
+    python -m app.services.defect_stats backfill
+"""
+import sys
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, func, text, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DefectDailyStat
+from app.models.defect import DefectStatus, DefectPriority
+
+GRANULARITIES = ("day", "week", "month")
+
+
+async def record_defect_event(
+    db: AsyncSession,
+    project_id: int,
+    object_id: int,
+    status: DefectStatus,
+    priority: DefectPriority,
+    created: int = 0,
+    entered: int = 0,
+    reprioritized: int = 0,
+    day: Optional[date] = None,
+) -> None:
+    """Прибавляет счётчики в той же транзакции, что и изменение дефекта.
+
+    День по умолчанию - текущая дата БД, как у created_at в backfill, а не дата сервера приложения."""
+    await record_defect_events(db, [{
+        "day": day, "project_id": project_id, "object_id": object_id, "status": status, "priority": priority,
+        "created": created, "entered": entered, "reprioritized": reprioritized,
+    }])
+
+
+async def record_defect_events(db: AsyncSession, rows: List[dict]) -> None:
+    """То же для нескольких строк статистики одним запросом; ключи строк не должны повторяться."""
+    if not rows:
+        return
+    stmt = insert(DefectDailyStat).values([
+        dict(row, day=row.get("day") or func.current_date()) for row in rows
+    ])
+    # Параллельные запросы меняют одну строку атомарно, без чтения
+    await db.execute(stmt.on_conflict_do_update(
+        constraint="uq_defect_daily_stat",
+        set_={
+            "created": DefectDailyStat.created + stmt.excluded.created,
+            "entered": DefectDailyStat.entered + stmt.excluded.entered,
+            "reprioritized": DefectDailyStat.reprioritized + stmt.excluded.reprioritized,
+        },
+    ))
+
+
+# Статус и приоритет на момент каждого события восстанавливаются по истории: до первого изменения поля -
+# его old_value, после - new_value последнего изменения. Изменения с одним created_at (одна транзакция)
+# считаются одним моментом - как в record_defect_event, который получает дефект уже со всеми изменениями.
+# Старые записи истории хранят значения как "DefectStatus.CLOSED", новые - как "CLOSED"
+BACKFILL_SQL = """
+WITH changes AS (
+    SELECT defect_id, created_at, id, field_name,
+           regexp_replace(old_value, '^Defect(Status|Priority)\\.', '') AS old_value,
+           regexp_replace(new_value, '^Defect(Status|Priority)\\.', '') AS new_value
+    FROM defect_history
+    WHERE field_name IN ('status', 'priority')
+),
+initial AS (
+    SELECT DISTINCT ON (defect_id, field_name) defect_id, field_name, old_value
+    FROM changes
+    ORDER BY defect_id, field_name, created_at, id
+),
+numbered AS (
+    SELECT *,
+           count(*) FILTER (WHERE field_name = 'status') OVER w AS status_group,
+           count(*) FILTER (WHERE field_name = 'priority') OVER w AS priority_group
+    FROM changes
+    WINDOW w AS (PARTITION BY defect_id ORDER BY created_at)
+),
+timeline AS (
+    SELECT defect_id, created_at, field_name,
+           max(CASE WHEN field_name = 'status' THEN new_value END) OVER (PARTITION BY defect_id, status_group) AS status,
+           max(CASE WHEN field_name = 'priority' THEN new_value END) OVER (PARTITION BY defect_id, priority_group) AS priority
+    FROM numbered
+),
+events AS (
+    SELECT d.created_at::date AS day, o.project_id, d.object_id,
+           COALESCE(si.old_value::defectstatus, d.status) AS status,
+           COALESCE(pi.old_value::defectpriority, d.priority) AS priority,
+           1 AS created, 1 AS entered, 0 AS reprioritized
+    FROM defects d
+    JOIN objects o ON o.id = d.object_id
+    LEFT JOIN initial si ON si.defect_id = d.id AND si.field_name = 'status'
+    LEFT JOIN initial pi ON pi.defect_id = d.id AND pi.field_name = 'priority'
+    UNION ALL
+    SELECT t.created_at::date, o.project_id, d.object_id,
+           COALESCE(t.status::defectstatus, si.old_value::defectstatus, d.status),
+           COALESCE(t.priority::defectpriority, pi.old_value::defectpriority, d.priority),
+           0, (t.field_name = 'status')::int, (t.field_name = 'priority')::int
+    FROM timeline t
+    JOIN defects d ON d.id = t.defect_id
+    JOIN objects o ON o.id = d.object_id
+    LEFT JOIN initial si ON si.defect_id = d.id AND si.field_name = 'status'
+    LEFT JOIN initial pi ON pi.defect_id = d.id AND pi.field_name = 'priority'
+)
+INSERT INTO defect_daily_stats (day, project_id, object_id, status, priority, created, entered, reprioritized)
+SELECT day, project_id, object_id, status, priority, sum(created), sum(entered), sum(reprioritized)
+FROM events
+GROUP BY day, project_id, object_id, status, priority
+"""
+
+
+def backfill(connection) -> None:
+    """Пересобирает статистику с нуля. connection - синхронное соединение (миграция, консоль)."""
+    connection.execute(text("DELETE FROM defect_daily_stats"))
+    connection.execute(text(BACKFILL_SQL))
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+async def stats_series(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    granularity: str = "day",
+    project_ids: Optional[List[int]] = None,
+    project_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+) -> List[dict]:
+    """Созданные и закрытые дефекты по периодам, пустые периоды - с нулями.
+
+    project_ids ограничивает выборку проектами, доступными пользователю (None - все).
+    """
+    period = func.date_trunc(granularity, DefectDailyStat.day).cast(DefectDailyStat.day.type).label("period")
+    query = (
+        select(
+            period,
+            func.sum(DefectDailyStat.created).label("created"),
+            func.sum(DefectDailyStat.entered).filter(DefectDailyStat.status == DefectStatus.CLOSED).label("resolved"),
+        )
+        .where(DefectDailyStat.day >= date_from, DefectDailyStat.day <= date_to)
+        .group_by(literal_column("period"))
+    )
+    if project_ids is not None:
+        query = query.where(DefectDailyStat.project_id.in_(project_ids))
+    if project_id:
+        query = query.where(DefectDailyStat.project_id == project_id)
+    if object_id:
+        query = query.where(DefectDailyStat.object_id == object_id)
+
+    rows = {row.period: row for row in (await db.execute(query)).all()}
+
+    result = []
+    current = period_start(date_from, granularity)
+    while current <= date_to:
+        row = rows.get(current)
+        result.append({
+            'date': current.isoformat(),
+            'created': int(row.created or 0) if row else 0,
+            'resolved': int(row.resolved or 0) if row else 0,
+        })
+        current = _next_period(current, granularity)
+    return result
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        raise SystemExit("Использование: python -m app.services.defect_stats backfill")
+    from app.db.database import engine
+    with engine.begin() as conn:
+        backfill(conn)
+    print("Статистика пересчитана")
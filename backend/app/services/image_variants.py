@@ -0,0 +1,129 @@
+import io
+import logging
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import ImageVariant
+from app.services.jobs import enqueue, job_handler
+from app.services.storage import claim_blob, get_blob_store
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SIZES = {
+    "thumb": settings.IMAGE_THUMB_SIZE,
+    "preview": settings.IMAGE_PREVIEW_SIZE,
+}
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# Форматы, которые готовим сразу после загрузки
+DEFAULT_FORMAT = "webp"
+
+
+def pick_format(accept: Optional[str]) -> str:
+    """WebP для клиентов, которые его понимают, иначе JPEG."""
+    if accept and "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+def render_variant(data: bytes, max_side: int, fmt: str):
+    """Уменьшает изображение до max_side по большей стороне с учётом EXIF-ориентации."""
+    pil_format, _ = FORMATS[fmt]
+    with Image.open(io.BytesIO(data)) as img:
+        # Для JPEG декодер сразу уменьшает картинку в 2/4/8 раз - многократно быстрее
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        if pil_format == "JPEG" and img.mode != "RGB":
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            else:
+                img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        out = io.BytesIO()
+        # EXIF не копируем: ориентация уже применена, а геометки не нужны в превью
+        if pil_format == "WEBP":
+            img.save(out, pil_format, quality=80, method=4)
+        else:
+            img.save(out, pil_format, quality=82, optimize=True, progressive=True)
+        return out.getvalue(), img.width, img.height
+
+
+async def find_variant(db: AsyncSession, source_key: str, variant: str, fmt: str) -> Optional[ImageVariant]:
+    return (await db.execute(select(ImageVariant).where(
+        ImageVariant.source_key == source_key,
+        ImageVariant.variant == variant,
+        ImageVariant.format == fmt,
+    ))).scalars().first()
+
+
+def _render_and_store(source_key: str, variant: str, fmt: str):
+    store = get_blob_store()
+    data, width, height = render_variant(store.read(source_key), VARIANT_SIZES[variant], fmt)
+    return store.put(data), data, width, height
+
+
+async def ensure_variant(db: AsyncSession, source_key: str, variant: str, fmt: str) -> Optional[ImageVariant]:
+    """Возвращает вариант изображения, создавая его при отсутствии.
+
+    None - если исходный файл не удаётся декодировать (например, HEIC без плагина).
+    """
+    existing = await find_variant(db, source_key, variant, fmt)
+    if existing:
+        return existing
+
+    # Декодирование и сжатие занимают CPU - выполняем вне цикла событий
+    try:
+        stored, data, width, height = await run_in_threadpool(_render_and_store, source_key, variant, fmt)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        logger.warning("Cannot render %s/%s for %s: %s", variant, fmt, source_key, e)
+        return None
+
+    image_variant = ImageVariant(
+        source_key=source_key,
+        variant=variant,
+        format=fmt,
+        storage_key=stored.key,
+        size=stored.size,
+        mime_type=FORMATS[fmt][1],
+        sha256=stored.sha256,
+        width=width,
+        height=height,
+    )
+    await claim_blob(db, stored, data)
+    db.add(image_variant)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Тот же вариант параллельно создал другой запрос
+        await db.rollback()
+        return await find_variant(db, source_key, variant, fmt)
+    return image_variant
+
+
+def enqueue_variants(db: AsyncSession, source_key: str) -> None:
+    """После загрузки: ставит в очередь подготовку миниатюры и превью (в транзакции загрузки)."""
+    enqueue(db, "image_variants", {"source_key": source_key}, priority=0)
+
+
+@job_handler("image_variants", concurrency=2)
+async def generate_variants(db: AsyncSession, job) -> None:
+    source_key = job.payload["source_key"]
+    for variant in VARIANT_SIZES:
+        # Файл не декодируется - повторять бессмысленно, при отдаче будет исходник
+        if await ensure_variant(db, source_key, variant, DEFAULT_FORMAT) is None:
+            break
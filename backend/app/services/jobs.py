@@ -0,0 +1,283 @@
+"""Очередь фоновых задач на PostgreSQL (таблица jobs), без внешнего брокера.
+
+Воркер запускается вместе с API (JOB_RUNNER_IN_PROCESS) или отдельными процессами:
+
+    python -m app.services.jobs
+
+Несколько воркеров безопасно работают с одной таблицей: задача забирается
+через SELECT ... FOR UPDATE SKIP LOCKED и достаётся ровно одному из них. Пока задача выполняется,
+воркер обновляет её locked_at; задача без обновлений дольше JOB_LOCK_TIMEOUT возвращается в очередь.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, delete, func, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models import DefectEvent, Job, JobStatus, SyncTombstone, Upload
+
+logger = logging.getLogger(__name__)
+
+# Модули, которые регистрируют обработчики задач
+HANDLER_MODULES = ("app.services.image_variants", "app.services.defect_export")
+
+
+@dataclass
+class JobHandler:
+    func: Callable[[AsyncSession, Job], Awaitable[Optional[dict]]]
+    # Сколько задач этого вида один воркер выполняет одновременно
+    concurrency: int
+
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str, concurrency: int = 1):
+    """Регистрирует обработчик задач вида kind.
+
+    Обработчик получает свою сессию и задачу, может вернуть словарь - он сохраняется в Job.result.
+    Исключение - неудачная попытка: задача повторяется, пока не исчерпает max_attempts.
+    """
+    def decorator(func):
+        _handlers[kind] = JobHandler(func, concurrency)
+        return func
+    return decorator
+
+
+def load_handlers() -> Dict[str, JobHandler]:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    return _handlers
+
+
+def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[dict] = None,
+    priority: int = 0,
+    user_id: Optional[int] = None,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """Ставит задачу в очередь в текущей транзакции - она станет видна воркерам после коммита."""
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        status=JobStatus.QUEUED,
+        priority=priority,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        user_id=user_id,
+    )
+    db.add(job)
+    # Воркер в этом процессе не ждёт следующего опроса
+    event.listen(db.sync_session, "after_commit", lambda session: job_runner.wake(), once=True)
+    return job
+
+
+def claimed(job: Job) -> tuple:
+    """Условия: задача всё ещё выполняется той же попыткой.
+
+    Брошенную задачу maintenance возвращает в очередь, и её может забрать другой воркер; каждая попытка
+    увеличивает attempts, так что запоздавший воркер не перезапишет состояние чужой попытки."""
+    return Job.id == job.id, Job.status == JobStatus.RUNNING, Job.attempts == job.attempts
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная пауза перед повтором: 1x, 2x, 4x ... JOB_RETRY_DELAY, но не больше часа."""
+    return timedelta(seconds=min(settings.JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0), 3600))
+
+
+class JobRunner:
+    """Воркер: забирает задачи из таблицы и выполняет их с ограничением параллельности."""
+
+    def __init__(self, concurrency: int = None, name: str = None):
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[str, int] = {}
+        self._tasks = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Перестаёт брать задачи и дожидается текущих (не дольше JOB_SHUTDOWN_TIMEOUT)."""
+        self._stopping = True
+        self.wake()
+        if self._loop_task:
+            await self._loop_task
+            self._loop_task = None
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=settings.JOB_SHUTDOWN_TIMEOUT)
+        self._wakeup = None
+
+    async def run(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        handlers = load_handlers()
+        last_maintenance = None
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                if last_maintenance is None or loop.time() - last_maintenance > settings.JOB_MAINTENANCE_INTERVAL:
+                    await self.maintenance()
+                    last_maintenance = loop.time()
+                while len(self._tasks) < self.concurrency:
+                    kinds = [kind for kind, handler in handlers.items() if self._running.get(kind, 0) < handler.concurrency]
+                    job = await self.claim(kinds) if kinds else None
+                    if job is None:
+                        break
+                    self._running[job.kind] = self._running.get(job.kind, 0) + 1
+                    task = asyncio.create_task(self.execute(handlers[job.kind], job))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            except Exception:
+                logger.exception("Job runner %s failed to poll the queue", self.name)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self, kinds: List[str]) -> Optional[Job]:
+        """Забирает следующую готовую задачу из разрешённых видов."""
+        next_job = (
+            select(Job.id)
+            .where(Job.status == JobStatus.QUEUED, Job.run_at <= func.now(), Job.kind.in_(kinds))
+            .order_by(Job.priority, Job.run_at, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with AsyncSessionLocal() as db:
+            job = (await db.execute(
+                update(Job)
+                .where(Job.id == next_job)
+                .values(status=JobStatus.RUNNING, attempts=Job.attempts + 1, locked_at=func.now(), locked_by=self.name)
+                .returning(Job)
+            )).scalars().first()
+            await db.commit()
+            return job
+
+    async def heartbeat(self, job: Job) -> None:
+        """Обновляет locked_at, пока обработчик работает: по нему maintenance отличает живую задачу от брошенной."""
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(update(Job).where(*claimed(job)).values(locked_at=func.now()))
+                    await db.commit()
+            except Exception:
+                logger.exception("Job %s (%s) heartbeat failed", job.id, job.kind)
+
+    async def execute(self, handler: JobHandler, job: Job) -> None:
+        heartbeat = asyncio.create_task(self.heartbeat(job))
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await handler.func(db, job)
+                # Результат и статус фиксируются одним коммитом с изменениями обработчика
+                values = {"status": JobStatus.SUCCEEDED, "finished_at": func.now(),
+                          "locked_at": None, "locked_by": None, "error": None}
+                if result is not None:
+                    values["result_key"] = result.pop("storage_key", None)
+                    values["result"] = result
+                if (await db.execute(update(Job).where(*claimed(job)).values(**values))).rowcount:
+                    await db.commit()
+                else:
+                    logger.warning("Job %s (%s) was requeued while running, attempt %s result discarded",
+                                   job.id, job.kind, job.attempts)
+                    await db.rollback()
+        except Exception as e:
+            logger.exception("Job %s (%s) failed, attempt %s of %s", job.id, job.kind, job.attempts, job.max_attempts)
+            await self.fail(job, f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.cancel()
+            self._running[job.kind] -= 1
+            self.wake()
+
+    async def fail(self, job: Job, error: str) -> None:
+        values = {"error": error, "locked_at": None, "locked_by": None}
+        if job.attempts < job.max_attempts:
+            values.update(status=JobStatus.QUEUED, run_at=func.now() + retry_delay(job.attempts))
+        else:
+            values.update(status=JobStatus.FAILED, finished_at=func.now())
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(*claimed(job)).values(**values))
+            await db.commit()
+
+    async def maintenance(self) -> None:
+        """Возвращает в очередь задачи упавших воркеров (locked_at не обновлялся дольше JOB_LOCK_TIMEOUT),
+        удаляет старые завершённые задачи, события ленты изменений, записи об удалениях для синхронизации
+        и брошенные возобновляемые загрузки."""
+        from app.services.storage import release_blob
+        from app.services.uploads import remove_upload_file
+
+        async with AsyncSessionLocal() as db:
+            stale = Job.locked_at < func.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+            lock_values = {"locked_at": None, "locked_by": None, "error": "Воркер не завершил задачу"}
+            await db.execute(
+                update(Job)
+                .where(Job.status == JobStatus.RUNNING, stale, Job.attempts < Job.max_attempts)
+                .values(status=JobStatus.QUEUED, run_at=func.now(), **lock_values)
+            )
+            await db.execute(
+                update(Job)
+                .where(Job.status == JobStatus.RUNNING, stale, Job.attempts >= Job.max_attempts)
+                .values(status=JobStatus.FAILED, finished_at=func.now(), **lock_values)
+            )
+
+            expired = (await db.execute(
+                delete(Job)
+                .where(
+                    Job.status.in_([JobStatus.SUCCEEDED, JobStatus.FAILED]),
+                    Job.finished_at < func.now() - timedelta(hours=settings.JOB_RETENTION_HOURS),
+                )
+                .returning(Job.result_key)
+            )).scalars().all()
+            await db.execute(
+                delete(DefectEvent).where(DefectEvent.created_at < func.now() - timedelta(hours=settings.EVENTS_RETENTION_HOURS))
+            )
+            await db.execute(
+                delete(SyncTombstone).where(SyncTombstone.deleted_at < func.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS))
+            )
+            expired_uploads = (await db.execute(
+                delete(Upload).where(Upload.expires_at < func.now()).returning(Upload.id)
+            )).scalars().all()
+            await db.commit()
+
+            for key in set(expired):
+                await release_blob(db, key)
+            for upload_id in expired_uploads:
+                remove_upload_file(upload_id)
+
+
+job_runner = JobRunner()
+
+
+if __name__ == "__main__":
+    # Обработчики регистрируются в модуле app.services.jobs, а не в __main__
+    from app.services import jobs
+
+    logging.basicConfig(level=logging.INFO)
+    runner = jobs.JobRunner()
+    logger.info("Job worker %s started, concurrency %s", runner.name, runner.concurrency)
+    try:
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        pass
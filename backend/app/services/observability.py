@@ -0,0 +1,265 @@
+"""Метрики Prometheus, журнал в JSON, журнал медленных запросов к БД и поиск N+1.
+
+Middleware заводит на каждый HTTP-запрос контекст (id запроса, число запросов к БД и их время),
+обработчики событий SQLAlchemy пополняют его, а по завершении запроса всё попадает в гистограммы
+и в строку журнала app.access. При нескольких процессах uvicorn задайте PROMETHEUS_MULTIPROC_DIR
+(пустой каталог, общий для процессов) - тогда /metrics собирает значения всех процессов.
+
+В режиме QUERY_DEBUG (разработка) запоминаются тексты запросов: ответ получает заголовок X-DB-Queries,
+а запрос одного вида, повторённый QUERY_DEBUG_REPEAT_THRESHOLD раз за HTTP-запрос, пишется в журнал app.n_plus_one.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from collections import Counter as StatementCounter
+from typing import Iterable, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from sqlalchemy import event
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.access")
+slow_query_logger = logging.getLogger("app.slow_query")
+n_plus_one_logger = logging.getLogger("app.n_plus_one")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+
+# Маршруты без совпадения (404) сводятся к одной метке, иначе каждый случайный путь - новый ряд
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter("http_requests_total", "HTTP-запросы", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Запросы в обработке", ["method"], multiprocess_mode="livesum"
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Размер тела ответа", ["method", "route"], buckets=SIZE_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Число запросов к БД за HTTP-запрос", ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Суммарное время запросов к БД за HTTP-запрос", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+SLOW_QUERIES = Counter("db_slow_queries_total", "Запросы к БД дольше SLOW_QUERY_MS")
+PASSWORD_HASH_TIME = Histogram(
+    "password_hash_duration_seconds", "Хеширование и проверка паролей, включая ожидание пула процессов",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+
+
+# Список параметров IN (...) разной длины - один и тот же запрос
+_IN_LIST = re.compile(r"IN \(\$\d+(?:::[\w ]+)?(?:, \$\d+(?:::[\w ]+)?)*\)")
+
+
+@dataclass
+class RequestContext:
+    request_id: str
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    # Тексты запросов - только в режиме QUERY_DEBUG
+    statements: Optional[List[str]] = None
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("IN (...)", " ".join(statement.split()))
+
+
+def repeated_statements(statements: Iterable[str], threshold: int) -> List[Tuple[str, int]]:
+    """Запросы одного вида, выполненные не меньше threshold раз, - признак N+1 (ленивая загрузка в цикле)."""
+    counts = StatementCounter(statement_shape(statement) for statement in statements)
+    return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    context = request_context.get()
+    return context.request_id if context else None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись журнала; id текущего HTTP-запроса добавляется автоматически."""
+
+    # Стандартные атрибуты LogRecord - всё остальное пришло через extra и попадает в вывод
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = current_request_id()
+        if request_id:
+            data["request_id"] = request_id
+        data.update({key: value for key, value in vars(record).items() if key not in self._RESERVED})
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging() -> None:
+    """Формат журнала приложения: LOG_FORMAT=json (по умолчанию) или text."""
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [handler]
+    app_logger.setLevel(settings.LOG_LEVEL)
+    app_logger.propagate = False
+
+
+def instrument_engine(engine) -> None:
+    """Считает запросы к БД и их время в контексте текущего HTTP-запроса, пишет журнал медленных запросов."""
+
+    # Время начала храним в контексте выполнения: для упавшего запроса он просто отбрасывается,
+    # а в conn.info незакрытые записи копились бы до закрытия соединения
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        request = request_context.get()
+        if request is not None:
+            request.db_queries += 1
+            request.db_seconds += elapsed
+            if request.statements is not None:
+                request.statements.append(statement)
+        if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            SLOW_QUERIES.inc()
+            # Параметры не пишем: в них бывают пароли и персональные данные
+            slow_query_logger.warning(
+                "Slow query", extra={"duration_ms": round(elapsed * 1000, 1), "statement": statement[:2000]}
+            )
+
+
+class PoolCollector:
+    """Ожидание соединения и занятость пула (app.db.pool_metrics) в формате Prometheus - только этого процесса."""
+
+    def __init__(self, metrics, engine):
+        self.metrics = metrics
+        self.engine = engine
+
+    def collect(self):
+        data = self.metrics.snapshot(self.engine.pool)
+        buckets = [(str(bound), count) for bound, count in data["wait_seconds_buckets"].items()]
+        buckets.append(("+Inf", data["checkouts"]))
+        yield HistogramMetricFamily(
+            "db_pool_wait_seconds", "Ожидание соединения из пула", buckets=buckets, sum_value=data["wait_seconds_sum"]
+        )
+        timeouts = GaugeMetricFamily("db_pool_timeouts", "Таймауты ожидания соединения")
+        timeouts.add_metric([], data["timeouts"])
+        yield timeouts
+        if "checked_out" in data:
+            checked_out = GaugeMetricFamily("db_pool_checked_out", "Соединения, выданные из пула")
+            checked_out.add_metric([], data["checked_out"])
+            yield checked_out
+            size = GaugeMetricFamily("db_pool_size", "Размер пула с учётом max_overflow")
+            size.add_metric([], data["pool_size"] + max(data["max_overflow"], 0))
+            yield size
+
+
+def metrics_payload(pool_collector: PoolCollector):
+    """Текст для /metrics и его Content-Type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    pool_registry = CollectorRegistry()
+    pool_registry.register(pool_collector)
+    return generate_latest(registry) + generate_latest(pool_registry), CONTENT_TYPE_LATEST
+
+
+class ObservabilityMiddleware:
+    """ASGI-middleware: id запроса (X-Request-ID), метрики и строка журнала app.access на каждый HTTP-запрос.
+
+    Чистый ASGI, а не BaseHTTPMiddleware: потоковые ответы (SSE, выгрузки) не буферизуются.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        context = RequestContext(request_id=request_id[:64], statements=[] if settings.QUERY_DEBUG else None)
+        token = request_context.set(context)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", context.request_id)
+                if context.statements is not None:
+                    # Запросы, выполненные до начала ответа; у потоковых ответов - не все
+                    headers.append("X-DB-Queries", str(context.db_queries))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            elapsed = time.perf_counter() - started
+            # Шаблон пути (/api/v1/defects/{defect_id}) маршрутизатор FastAPI кладёт в scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+            REQUEST_DB_QUERIES.labels(method, route).observe(context.db_queries)
+            REQUEST_DB_TIME.labels(method, route).observe(context.db_seconds)
+            logger.info("%s %s %s", method, scope["path"], status, extra={
+                "method": method,
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 1),
+                "response_bytes": size,
+                "db_queries": context.db_queries,
+                "db_ms": round(context.db_seconds * 1000, 1),
+            })
+            if context.statements is not None:
+                for shape, count in repeated_statements(context.statements, settings.QUERY_DEBUG_REPEAT_THRESHOLD):
+                    n_plus_one_logger.warning("Possible N+1: %d identical queries in %s %s", count, method, route, extra={
+                        "route": route, "count": count, "statement": shape[:2000],
+                    })
+            request_context.reset(token)
@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+from app.core.config import settings
+from app.services.observability import PASSWORD_HASH_TIME
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование паролей переполнена - клиенту стоит повторить позже."""
+
+
+def _argon2_hasher():
+    try:
+        from argon2 import PasswordHasher
+    except ImportError:
+        raise RuntimeError("Для PASSWORD_HASH_SCHEME=argon2id нужно установить argon2-cffi")
+    return PasswordHasher(
+        time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+        memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+# Функции ниже выполняются в процессах пула и должны импортироваться на верхнем уровне
+
+def _hash(password: str) -> str:
+    if settings.PASSWORD_HASH_SCHEME == "argon2id":
+        return _argon2_hasher().hash(password)
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.PASSWORD_BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def _verify(password: str, hashed: str) -> bool:
+    if hashed.startswith("$argon2"):
+        from argon2.exceptions import VerifyMismatchError, InvalidHashError
+        try:
+            return _argon2_hasher().verify(hashed, password)
+        except (VerifyMismatchError, InvalidHashError):
+            return False
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Хеш получен другим алгоритмом или с другой стоимостью, чем настроено сейчас."""
+    if settings.PASSWORD_HASH_SCHEME == "argon2id":
+        return not hashed.startswith("$argon2id$") or _argon2_hasher().check_needs_rehash(hashed)
+    if not hashed.startswith("$2"):
+        return True
+    # $2b$12$... - стоимость записана во втором поле
+    try:
+        return int(hashed.split("$")[2]) != settings.PASSWORD_BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+
+
+def _workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: не копируем в дочерние процессы соединения с БД и цикл событий
+        _executor = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_password_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def _submit(fn, *args):
+    global _in_flight
+    # Ограничиваем очередь: лучше сразу ответить 429, чем копить запросы, ждущие по несколько секунд
+    if _in_flight >= _workers() + settings.PASSWORD_HASH_QUEUE_LIMIT:
+        raise PasswordHasherBusy()
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    with PASSWORD_HASH_TIME.labels("hash").time():
+        return await _submit(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    with PASSWORD_HASH_TIME.labels("verify").time():
+        return await _submit(_verify, password, hashed)
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import User, project_users
+from app.models.user import RoleEnum
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Текущий пользователь запроса: то, что нужно для проверки прав."""
+    id: int
+    nickname: str
+    role: RoleEnum
+    project_ids: FrozenSet[int]
+
+
+class PrincipalCache:
+    """LRU-кэш с ограничением времени жизни записи, ключ - subject токена.
+
+    Кэш живёт внутри процесса: другие воркеры увидят изменения прав не позже чем через ttl секунд.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            del self._entries[subject]
+            return None
+        self._entries.move_to_end(subject)
+        return principal
+
+    def put(self, subject: str, principal: Principal) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[subject] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for subject in [s for s, (_, p) in self._entries.items() if p.id == user_id]:
+            del self._entries[subject]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+
+async def get_principal(db: AsyncSession, subject: str, user_id: Optional[int] = None) -> Optional[Principal]:
+    """Пользователь по subject токена: из кэша или из БД.
+
+    user_id из токена позволяет искать по первичному ключу и отсечь токен,
+    выданный удалённому пользователю с тем же ником.
+    """
+    principal = principal_cache.get(subject)
+    if principal is not None and (user_id is None or principal.id == user_id):
+        return principal
+
+    if user_id is not None:
+        user = await db.get(User, user_id)
+        if user is None or user.nickname != subject:
+            return None
+    else:
+        user = (await db.execute(select(User).where(User.nickname == subject))).scalars().first()
+        if user is None:
+            return None
+
+    project_ids = (await db.execute(
+        select(project_users.c.project_id).where(project_users.c.user_id == user.id)
+    )).scalars().all()
+    principal = Principal(id=user.id, nickname=user.nickname, role=user.role, project_ids=frozenset(project_ids))
+    principal_cache.put(subject, principal)
+    return principal
@@ -0,0 +1,52 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, Object, Project, User, project_users
+from app.models.defect import DefectStatus
+from app.models.user import RoleEnum
+from app.schemas.project import DashboardObject, ProjectDashboard, ProjectInfo, UserInfo
+from app.services.defect_listing import list_defect_summaries
+from app.services.principals import Principal
+
+
+async def build_project_dashboard(db: AsyncSession, project: Project, user: Principal, limit: int = 50) -> ProjectDashboard:
+    """Всё для страницы проекта за фиксированное число запросов, независимо от числа объектов и дефектов:
+    объекты, счётчики дефектов по статусам, первая страница дефектов, инженеры проекта.
+    """
+    objects = (await db.execute(
+        select(Object).where(Object.project_id == project.id).order_by(Object.id)
+    )).scalars().all()
+
+    counts = {obj.id: {s.value: 0 for s in DefectStatus} for obj in objects}
+    # Фильтр по уже известным id объектов - планировщик идёт по индексу дефектов, а не сканирует таблицу
+    rows = (await db.execute(
+        select(Defect.object_id, Defect.status, func.count())
+        .where(Defect.object_id.in_(list(counts)))
+        .group_by(Defect.object_id, Defect.status)
+    )).all() if counts else []
+    for object_id, status, count in rows:
+        counts[object_id][status.value] = count
+
+    defects = await list_defect_summaries(db, project_id=project.id, limit=limit)
+
+    engineers = (await db.execute(
+        select(User)
+        .join(project_users, project_users.c.user_id == User.id)
+        .where(project_users.c.project_id == project.id, User.role == RoleEnum.ENGINEER)
+        .order_by(User.id)
+    )).scalars().all()
+
+    return ProjectDashboard(
+        project=ProjectInfo.model_validate(project),
+        objects=[
+            DashboardObject(
+                **{column: getattr(obj, column) for column in ("id", "name", "description", "address", "project_id", "created_at")},
+                defect_counts=counts[obj.id],
+                defect_total=sum(counts[obj.id].values()),
+            )
+            for obj in objects
+        ],
+        defects=defects,
+        engineers=[UserInfo.model_validate(u) for u in engineers],
+        current_user=UserInfo(id=user.id, nickname=user.nickname, role=user.role),
+    )
@@ -0,0 +1,345 @@
+"""Импорт объектов и дефектов проекта из CSV/XLSX.
+
+Файл читается потоком по IMPORT_BATCH_SIZE строк: каждая пачка проверяется схемами ObjectCreate/DefectCreate
+и вставляется пакетными INSERT вместе с историей и назначениями. Ошибочные строки пропускаются и попадают в отчёт,
+остальные сохраняются. Используется обработчиком POST /api/v1/projects/{id}/import и консольной командой:
+
+    python -m app.services.project_import <project_id> objects|defects <файл> --user <nickname> [--dry-run]
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import re
+from collections import Counter
+from datetime import date, datetime
+from itertools import chain, islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+import openpyxl
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import Integer, bindparam, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Defect, DefectHistory, Object, User, defect_users, project_users
+from app.models.user import RoleEnum
+from app.schemas.defect import DefectCreate
+from app.schemas.object import ObjectCreate
+from app.schemas.project import ImportResult, ImportRowError
+from app.services.defect_events import publish
+from app.services.defect_stats import record_defect_event
+
+IMPORT_KINDS = ("objects", "defects")
+
+IMPORT_BATCH_SIZE = 2000
+
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = {
+    "objects": {"name"},
+    "defects": {"title"},
+}
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def _cell(value):
+    # CSV отдаёт строки, XLSX - числа и даты: приводим к тому, что понимают схемы
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[list]:
+    text = codecs.getreader("utf-8-sig")(file)
+    header = text.readline()
+    if not header:
+        return
+    try:
+        # Excel с русской локалью сохраняет CSV через ";"
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(chain([header], text), dialect)
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFileError("Cannot read XLSX file")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(file: BinaryIO, filename: str, required: Set[str] = frozenset()) -> Iterator[Tuple[int, Dict[str, object]]]:
+    """Строки файла как (номер строки, {колонка: значение}); пустые строки пропускаются."""
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        rows = _xlsx_rows(file)
+    elif name.endswith(".csv"):
+        rows = _csv_rows(file)
+    else:
+        raise ImportFileError("Only CSV and XLSX files are supported")
+
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ImportFileError("File is empty")
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV file must be UTF-8 encoded")
+    columns = [str(column).strip().lower() if column is not None else "" for column in header]
+    missing = set(required) - set(columns)
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    row_number = 1
+    try:
+        for values in rows:
+            row_number += 1
+            row = {column: _cell(value) for column, value in zip(columns, values) if column}
+            if any(value is not None for value in row.values()):
+                yield row_number, row
+    except UnicodeDecodeError:
+        raise ImportFileError(f"CSV file must be UTF-8 encoded (row {row_number})")
+
+
+def _take(rows: Iterator, size: int) -> list:
+    return list(islice(rows, size))
+
+
+def _check_lengths(table, values: dict) -> Optional[Tuple[str, str]]:
+    for column, value in values.items():
+        length = getattr(table.c[column].type, "length", None) if column in table.c else None
+        if length and isinstance(value, str) and len(value) > length:
+            return column, f"Value is longer than {length} characters"
+    return None
+
+
+class ProjectImport:
+    """Состояние импорта одного файла: справочники проекта, счётчики и отчёт об ошибках."""
+
+    def __init__(self, db: AsyncSession, project_id: int, user_id: int, kind: str, dry_run: bool = False):
+        if kind not in IMPORT_KINDS:
+            raise ImportFileError(f"Unknown import kind: {kind}")
+        self.db = db
+        self.project_id = project_id
+        self.user_id = user_id
+        self.kind = kind
+        self.dry_run = dry_run
+        self.total_rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[ImportRowError] = []
+        self.object_ids: Set[int] = set()
+        self.object_names: Dict[str, int] = {}
+        self.engineer_ids: Set[int] = set()
+        # (объект, статус, приоритет) -> число созданных дефектов, для дневной статистики
+        self.stats = Counter()
+
+    async def load_references(self) -> None:
+        if self.kind != "defects":
+            return
+        for object_id, name in (await self.db.execute(
+            select(Object.id, Object.name).where(Object.project_id == self.project_id)
+        )).all():
+            self.object_ids.add(object_id)
+            # При повторяющихся именах ссылка по имени ведёт на первый объект
+            self.object_names.setdefault(name.strip().lower(), object_id)
+        self.engineer_ids = set((await self.db.execute(
+            select(User.id)
+            .join(project_users, project_users.c.user_id == User.id)
+            .where(project_users.c.project_id == self.project_id, User.role == RoleEnum.ENGINEER)
+        )).scalars().all())
+
+    def error(self, row: int, column: Optional[str], message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(row=row, column=column, message=message))
+
+    def validate(self, row_number: int, row: dict):
+        """Проверенные значения строки или None, если строка с ошибкой (ошибка уже записана)."""
+        if self.kind == "objects":
+            data = {column: row.get(column) for column in ("name", "description", "address")}
+            data["project_id"] = self.project_id
+            schema, table = ObjectCreate, Object.__table__
+        else:
+            data = {column: row[column] for column in ("title", "description", "due_date") if row.get(column) is not None}
+            for column in ("status", "priority"):
+                if row.get(column) is not None:
+                    data[column] = str(row[column]).upper()
+            object_id = self._resolve_object(row_number, row)
+            if object_id is None:
+                return None
+            data["object_id"] = object_id
+            user_ids = self._parse_user_ids(row_number, row.get("assigned_user_ids"))
+            if user_ids is None:
+                return None
+            data["assigned_user_ids"] = user_ids
+            schema, table = DefectCreate, Defect.__table__
+
+        try:
+            values = schema(**data).model_dump()
+        except ValidationError as e:
+            for err in e.errors():
+                self.error(row_number, str(err["loc"][0]) if err["loc"] else None, err["msg"])
+            return None
+        too_long = _check_lengths(table, values)
+        if too_long:
+            self.error(row_number, *too_long)
+            return None
+        return values
+
+    def _resolve_object(self, row_number: int, row: dict) -> Optional[int]:
+        if row.get("object_id") is not None:
+            try:
+                object_id = int(row["object_id"])
+            except ValueError:
+                self.error(row_number, "object_id", "Must be an integer")
+                return None
+            if object_id not in self.object_ids:
+                self.error(row_number, "object_id", "Object not found in project")
+                return None
+            return object_id
+        if row.get("object_name") is not None:
+            object_id = self.object_names.get(str(row["object_name"]).lower())
+            if object_id is None:
+                self.error(row_number, "object_name", "Object not found in project")
+            return object_id
+        self.error(row_number, "object_id", "object_id or object_name is required")
+        return None
+
+    def _parse_user_ids(self, row_number: int, value) -> Optional[List[int]]:
+        if value is None:
+            return []
+        try:
+            user_ids = [int(part) for part in re.split(r"[,;\s]+", str(value)) if part]
+        except ValueError:
+            self.error(row_number, "assigned_user_ids", "Must be a list of user ids")
+            return None
+        # Как в create_defect: назначаются только инженеры проекта
+        return [uid for uid in dict.fromkeys(user_ids) if uid in self.engineer_ids]
+
+    def validate_batch(self, batch: list) -> list:
+        self.total_rows += len(batch)
+        result = []
+        for row_number, row in batch:
+            values = self.validate(row_number, row)
+            if values is not None:
+                result.append(values)
+        return result
+
+    async def insert_batch(self, rows: list) -> None:
+        self.imported += len(rows)
+        if not rows or self.dry_run:
+            return
+        if self.kind == "objects":
+            await self.db.execute(insert(Object.__table__), rows)
+            return
+
+        table = Defect.__table__
+        defect_values = [{column: row[column] for column in row if column != "assigned_user_ids"} for row in rows]
+        # Пакетный INSERT ... RETURNING: id нужны для истории и назначений, порядок совпадает с порядком строк
+        ids = (await self.db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), defect_values
+        )).scalars().all()
+
+        # История одной вставкой из массива id вместо executemany по строке на дефект
+        history = DefectHistory.__table__
+        await self.db.execute(insert(history).from_select(
+            [history.c.field_name, history.c.new_value, history.c.defect_id, history.c.user_id],
+            select(
+                literal("created"),
+                literal("Дефект создан"),
+                func.unnest(bindparam("ids", ids, type_=ARRAY(Integer))),
+                literal(self.user_id),
+            ),
+        ))
+        links = [
+            {"defect_id": defect_id, "user_id": uid}
+            for defect_id, row in zip(ids, rows)
+            for uid in row["assigned_user_ids"]
+        ]
+        if links:
+            await self.db.execute(insert(defect_users), links)
+        for values in defect_values:
+            self.stats[(values["object_id"], values["status"], values["priority"])] += 1
+
+    async def finish(self) -> ImportResult:
+        for (object_id, status, priority), count in self.stats.items():
+            await record_defect_event(self.db, self.project_id, object_id, status, priority, created=count, entered=count)
+        if self.stats:
+            # Одно событие на импорт вместо события на каждый дефект - клиенты перечитывают список
+            await publish(self.db, "defects.imported", self.project_id, data={"count": self.imported}, user_id=self.user_id)
+        return ImportResult(
+            kind=self.kind,
+            dry_run=self.dry_run,
+            total_rows=self.total_rows,
+            imported=self.imported,
+            error_count=self.error_count,
+            errors=self.errors,
+        )
+
+
+async def import_file(
+    db: AsyncSession, project_id: int, user_id: int, kind: str, file: BinaryIO, filename: str, dry_run: bool = False
+) -> ImportResult:
+    """Импортирует файл в открытой транзакции; коммит - за вызывающим.
+
+    Чтение и проверка пачек идут в пуле потоков, чтобы разбор больших файлов не блокировал event loop.
+    """
+    state = ProjectImport(db, project_id, user_id, kind, dry_run)
+    await state.load_references()
+    rows = read_rows(file, filename, REQUIRED_COLUMNS[kind])
+    while True:
+        batch = await run_in_threadpool(_take, rows, IMPORT_BATCH_SIZE)
+        if not batch:
+            break
+        await state.insert_batch(await run_in_threadpool(state.validate_batch, batch))
+    return await state.finish()
+
+
+async def _main(args) -> None:
+    from app.db.database import AsyncSessionLocal, async_engine
+
+    try:
+        async with AsyncSessionLocal() as db:
+            user_id = await db.scalar(select(User.id).where(User.nickname == args.user))
+            if user_id is None:
+                raise SystemExit(f"Пользователь {args.user} не найден")
+            with open(args.file, "rb") as file:
+                try:
+                    result = await import_file(db, args.project_id, user_id, args.kind, file, args.file, args.dry_run)
+                except ImportFileError as e:
+                    raise SystemExit(str(e))
+            await db.commit()
+    finally:
+        await async_engine.dispose()
+
+    for error in result.errors:
+        print(f"Строка {error.row}: {error.column or '-'}: {error.message}")
+    action = "Готово к импорту" if result.dry_run else "Импортировано"
+    print(f"{action}: {result.imported} из {result.total_rows}, ошибок: {result.error_count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт объектов или дефектов проекта из CSV/XLSX")
+    parser.add_argument("project_id", type=int)
+    parser.add_argument("kind", choices=IMPORT_KINDS)
+    parser.add_argument("file")
+    parser.add_argument("--user", required=True, help="автор записей истории")
+    parser.add_argument("--dry-run", action="store_true", help="только проверить файл")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,175 @@
+"""Кэш готовых JSON-ответов для редко меняющихся справочных данных.
+
+Запись помечается тегами ("projects", "users", ...). Обработчики, меняющие данные,
+после коммита вызывают invalidate(теги): версия тега растёт, и все ключи со старой
+версией больше не читаются. Поэтому ответ, собранный параллельно с изменением,
+сохраняется под устаревшей версией и никому не отдаётся.
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.services.blob_delivery import etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+
+
+class CacheBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def versions(self, tags: Sequence[str]) -> List[int]:
+        raise NotImplementedError
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU внутри процесса. Другие воркеры об инвалидации не узнают - их записи живут до истечения ttl."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def versions(self, tags: Sequence[str]) -> List[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._versions.clear()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Общий для всех воркеров кэш в Redis или совместимом сервере (Valkey, KeyDB), требует redis."""
+
+    def __init__(self, url: str, prefix: str = "cc:response:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("Для RESPONSE_CACHE_BACKEND=redis нужно установить redis")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def versions(self, tags: Sequence[str]) -> List[int]:
+        values = await self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self.prefix}tag:{tag}")
+            await pipe.execute()
+
+
+class ResponseCache:
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def get_or_build(self, key: str, tags: Sequence[str], build: Callable[[], Awaitable[Any]]) -> CachedResponse:
+        """Ответ из кэша или результат build(), сериализованный в JSON и сохранённый в кэш.
+
+        Сбой общего кэша не ломает запрос - ответ просто собирается заново.
+        """
+        full_key = None
+        if self.backend is not None:
+            try:
+                versions = await self.backend.versions(tags)
+                full_key = f"{key}|" + ",".join(f"{tag}:{version}" for tag, version in zip(tags, versions))
+                cached = await self.backend.get(full_key)
+                if cached is not None:
+                    etag, _, body = cached.partition(b"\n")
+                    return CachedResponse(body=body, etag=etag.decode())
+            except Exception:
+                logger.exception("Response cache read failed for %s", key)
+                full_key = None
+
+        body = json.dumps(jsonable_encoder(await build()), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        response = CachedResponse(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+        if full_key is not None:
+            try:
+                await self.backend.set(full_key, response.etag.encode() + b"\n" + body, self.ttl)
+            except Exception:
+                logger.exception("Response cache write failed for %s", key)
+        return response
+
+    async def invalidate(self, *tags: str) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.bump(tags)
+        except Exception:
+            logger.exception("Response cache invalidation failed for %s", tags)
+
+
+def _create_backend() -> Optional[CacheBackend]:
+    if settings.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.RESPONSE_CACHE_SIZE)
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.RESPONSE_CACHE_REDIS_URL)
+    if settings.RESPONSE_CACHE_BACKEND == "none":
+        return None
+    raise RuntimeError(f"Неизвестный RESPONSE_CACHE_BACKEND: {settings.RESPONSE_CACHE_BACKEND}")
+
+
+response_cache = ResponseCache(_create_backend(), settings.RESPONSE_CACHE_TTL)
+
+
+async def cached_json(request: Request, key: str, tags: Sequence[str], build: Callable[[], Awaitable[Any]]) -> Response:
+    """JSON-ответ через кэш с ETag: клиент с актуальной версией получает 304 без тела."""
+    cached = await response_cache.get_or_build(key, tags, build)
+    # Браузер хранит ответ, но каждый раз сверяет ETag - изменения видны сразу после инвалидации
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,297 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+# Сигнатуры форматов, которые присылают телефоны и браузеры
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+
+
+def sniff_mime_type(head: bytes, default: str = "application/octet-stream") -> str:
+    """Определяет тип содержимого по первым байтам файла."""
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic"
+        if brand == b"avif":
+            return "image/avif"
+    return default
+
+
+@dataclass
+class StoredBlob:
+    key: str
+    size: int
+    sha256: str
+    mime_type: str
+
+
+def _iter_source(source: Union[bytes, BinaryIO]) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray)):
+        for offset in range(0, len(source), CHUNK_SIZE):
+            yield bytes(source[offset:offset + CHUNK_SIZE])
+        return
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def key_for_hash(sha256: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class BlobStore:
+    """Контентно-адресуемое хранилище: ключ объекта выводится из SHA-256,
+    поэтому одинаковые файлы хранятся один раз."""
+
+    def put(self, source: Union[bytes, BinaryIO]) -> StoredBlob:
+        raise NotImplementedError
+
+    def open(self, key: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        """Читает файл кусками по CHUNK_SIZE, начиная со start и не более length байт."""
+        raise NotImplementedError
+
+    def read(self, key: str) -> bytes:
+        return b"".join(self.open(key))
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, source: Union[bytes, BinaryIO]) -> StoredBlob:
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in _iter_source(source):
+                    if len(head) < 32:
+                        head += chunk[:32 - len(head)]
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            sha256 = digest.hexdigest()
+            key = key_for_hash(sha256)
+            path = self._path(key)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return StoredBlob(key=key, size=size, sha256=sha256, mime_type=sniff_mime_type(head))
+
+    def open(self, key: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            if start:
+                f.seek(start)
+            if length is None:
+                yield from _iter_source(f)
+                return
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """S3-совместимое хранилище (AWS S3, MinIO и т.п.), требует boto3."""
+
+    def __init__(self, bucket: str, endpoint_url: str = None, access_key: str = None,
+                 secret_key: str = None, region: str = None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("Для BLOB_BACKEND=s3 нужно установить boto3")
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+        )
+
+    def put(self, source: Union[bytes, BinaryIO]) -> StoredBlob:
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        # Ключ зависит от хеша, поэтому сначала буферизуем (большие файлы - на диск)
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            for chunk in _iter_source(source):
+                if len(head) < 32:
+                    head += chunk[:32 - len(head)]
+                digest.update(chunk)
+                size += len(chunk)
+                spool.write(chunk)
+            sha256 = digest.hexdigest()
+            key = key_for_hash(sha256)
+            mime_type = sniff_mime_type(head)
+            if not self.exists(key):
+                spool.seek(0)
+                self.client.upload_fileobj(spool, self.bucket, key, ExtraArgs={"ContentType": mime_type})
+        return StoredBlob(key=key, size=size, sha256=sha256, mime_type=mime_type)
+
+    def open(self, key: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+        params = {"Bucket": self.bucket, "Key": key}
+        if start or length is not None:
+            end = "" if length is None else str(start + length - 1)
+            params["Range"] = f"bytes={start}-{end}"
+        body = self.client.get_object(**params)["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    if settings.BLOB_BACKEND == "s3":
+        return S3BlobStore(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+        )
+    if settings.BLOB_BACKEND == "local":
+        return LocalBlobStore(settings.BLOB_LOCAL_PATH)
+    raise RuntimeError(f"Неизвестный BLOB_BACKEND: {settings.BLOB_BACKEND}")
+
+
+async def lock_blob(db, key: str) -> None:
+    """Блокировка ключа до конца транзакции (advisory lock): новая ссылка на файл и release_blob не пересекаются."""
+    from sqlalchemy import text
+
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": key})
+
+
+async def claim_blob(db, blob: StoredBlob, source: Union[bytes, BinaryIO, str]) -> None:
+    """Закрепляет файл за ссылкой на него, которая вставляется в текущей транзакции.
+
+    put пропускает запись, если такой файл уже есть, а release_blob мог удалить его до вставки ссылки.
+    Блокировка держится до коммита; если файла под ней нет, он записывается заново из source -
+    данных, открытого файла или пути к нему.
+    """
+    await lock_blob(db, blob.key)
+    store = get_blob_store()
+    if await run_in_threadpool(store.exists, blob.key):
+        return
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            await run_in_threadpool(store.put, f)
+    else:
+        if not isinstance(source, (bytes, bytearray)):
+            source.seek(0)
+        await run_in_threadpool(store.put, source)
+
+
+async def release_blob(db, key: str) -> None:
+    """Удаляет файл из хранилища, если на него больше не ссылается ни одна запись.
+
+    Вызывается после коммита, удалившего последнюю ссылку. Проверка и удаление идут под блокировкой
+    ключа в отдельной транзакции, которая здесь же и коммитится."""
+    from sqlalchemy import select, delete
+    from app.models import Defect, DefectImage, ImageVariant, Job
+
+    if not key:
+        return
+    await lock_blob(db, key)
+    for column in (Defect.photo_key, DefectImage.storage_key, ImageVariant.storage_key, Job.result_key):
+        if await db.scalar(select(column).where(column == key).limit(1)):
+            await db.commit()
+            return
+    await run_in_threadpool(get_blob_store().delete, key)
+
+    # Вместе с исходным файлом удаляем его миниатюры и превью
+    variant_keys = (await db.execute(
+        select(ImageVariant.storage_key).where(ImageVariant.source_key == key)
+    )).scalars().all()
+    if variant_keys:
+        await db.execute(delete(ImageVariant).where(ImageVariant.source_key == key))
+    await db.commit()
+    for variant_key in variant_keys:
+        await release_blob(db, variant_key)
+
+
+async def defect_blob_keys(db, *criteria) -> set:
+    """Ключи фото и изображений дефектов, подходящих под условия (Defect JOIN Object).
+
+    Собирается до удаления дефектов, чтобы затем освободить файлы через release_blob."""
+    from sqlalchemy import select
+    from app.models import Defect, DefectImage, Object
+
+    defect_ids = select(Defect.id).join(Object, Object.id == Defect.object_id).where(*criteria)
+    keys = set((await db.execute(
+        select(Defect.photo_key)
+        .join(Object, Object.id == Defect.object_id)
+        .where(*criteria, Defect.photo_key.isnot(None))
+    )).scalars().all())
+    keys |= set((await db.execute(
+        select(DefectImage.storage_key).where(DefectImage.defect_id.in_(defect_ids))
+    )).scalars().all())
+    return keys
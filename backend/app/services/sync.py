@@ -0,0 +1,205 @@
+"""Инкрементальная синхронизация для клиентов, работающих без сети.
+
+Каждая строка объектов, дефектов, комментариев, истории и изображений хранит в change_seq номер
+транзакции, которая её последней записала (триггеры миграции 0009), удаления попадают в sync_tombstones.
+Токен синхронизации - xmin снимка на момент её начала: все транзакции с меньшим номером уже завершены
+и их изменения клиент получил. В следующий раз отдаются строки с change_seq >= xmin - в том числе
+транзакций, которые тогда ещё шли и закоммитились позже (обычная последовательность их бы потеряла).
+Строки на границе могут прийти повторно - клиент применяет их как upsert.
+"""
+import base64
+import gzip
+import json
+import time
+import zlib
+from typing import List, Optional, Set
+
+from fastapi import Response
+from sqlalchemy import or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Defect, DefectComment, DefectHistory, DefectImage, Object, SyncTombstone, User, defect_users
+from app.schemas.sync import SyncComment, SyncDefect, SyncHistory, SyncImage, SyncObject, SyncPage
+from app.services.defect_listing import InvalidCursor
+
+# Порядок выдачи: родительские сущности раньше дочерних, удаления - последними
+SECTIONS = ("objects", "defects", "comments", "history", "images", "deleted")
+
+# Меньшие ответы сжимать невыгодно
+MIN_COMPRESS_SIZE = 1024
+
+CURRENT_XMIN = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def projects_fingerprint(project_ids: Optional[Set[int]]) -> str:
+    if project_ids is None:
+        return "*"
+    return format(zlib.crc32(",".join(map(str, sorted(project_ids))).encode("ascii")), "x")
+
+
+def encode_sync_token(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_sync_token(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        int(state["s"]), float(state["t"]), str(state["p"])
+        if "u" in state:
+            int(state["u"]), float(state["n"])
+            if not 0 <= int(state["e"]) < len(SECTIONS):
+                raise InvalidCursor("Unknown section")
+        return state
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def _token_expired(state: dict) -> bool:
+    # Записи об удалениях старше срока хранения уже стёрты; день запаса - на длинные транзакции,
+    # у которых deleted_at (время начала транзакции) раньше выдачи токена
+    max_age = (settings.SYNC_TOMBSTONE_RETENTION_DAYS - 1) * 86400
+    return time.time() - state["t"] > max_age
+
+
+def _in_projects(query, project_ids):
+    return query if project_ids is None else query.where(Object.project_id.in_(project_ids))
+
+
+def _section_query(section: str, project_ids):
+    if section == "objects":
+        return Object, _in_projects(select(Object), project_ids)
+    if section == "defects":
+        return Defect, _in_projects(select(Defect).join(Object, Object.id == Defect.object_id), project_ids)
+    if section == "deleted":
+        query = select(SyncTombstone)
+        if project_ids is not None:
+            query = query.where(or_(SyncTombstone.project_id.in_(project_ids), SyncTombstone.project_id.is_(None)))
+        return SyncTombstone, query
+    model, columns = {
+        "comments": (DefectComment, (DefectComment.content,)),
+        "history": (DefectHistory, (DefectHistory.field_name, DefectHistory.old_value, DefectHistory.new_value)),
+        "images": (DefectImage, (DefectImage.filename, DefectImage.size, DefectImage.mime_type)),
+    }[section]
+    if model is DefectImage:
+        query = select(model.id, model.change_seq, model.defect_id, model.created_at, *columns)
+    else:
+        query = (
+            select(model.id, model.change_seq, model.defect_id, model.created_at, model.user_id,
+                   User.nickname.label("user_nickname"), *columns)
+            .join(User, User.id == model.user_id)
+        )
+    query = query.join(Defect, Defect.id == model.defect_id).join(Object, Object.id == Defect.object_id)
+    return model, _in_projects(query, project_ids)
+
+
+async def _fill_section(db: AsyncSession, page: SyncPage, section: str, rows) -> None:
+    if section == "objects":
+        page.objects += [SyncObject(
+            id=obj.id, project_id=obj.project_id, name=obj.name, description=obj.description,
+            address=obj.address, created_at=obj.created_at,
+        ) for obj in rows]
+    elif section == "defects":
+        assigned = {}
+        if rows:
+            for defect_id, user_id in (await db.execute(
+                select(defect_users.c.defect_id, defect_users.c.user_id)
+                .where(defect_users.c.defect_id.in_([defect.id for defect in rows]))
+            )).all():
+                assigned.setdefault(defect_id, []).append(user_id)
+        page.defects += [SyncDefect(
+            id=defect.id, object_id=defect.object_id, title=defect.title, description=defect.description,
+            status=defect.status, priority=defect.priority, due_date=defect.due_date,
+            created_at=defect.created_at, updated_at=defect.updated_at,
+            assigned_user_ids=sorted(assigned.get(defect.id, [])), has_photo=defect.photo_key is not None,
+        ) for defect in rows]
+    elif section == "comments":
+        page.comments += [SyncComment.model_validate(row._mapping) for row in rows]
+    elif section == "history":
+        page.history += [SyncHistory.model_validate(row._mapping) for row in rows]
+    elif section == "images":
+        page.images += [SyncImage.model_validate(row._mapping) for row in rows]
+    else:
+        for tombstone in rows:
+            getattr(page.deleted, tombstone.entity).append(tombstone.entity_id)
+
+
+async def sync_page(db: AsyncSession, project_ids: Optional[Set[int]], token: Optional[str], limit: int = 1000) -> SyncPage:
+    """Страница изменений после token (без токена - полная синхронизация), не больше limit строк.
+
+    project_ids - доступные пользователю проекты (None - все). Если набор проектов с выдачи токена
+    изменился или токен пережил записи об удалениях, синхронизация начинается заново с reset=true.
+    """
+    fingerprint = projects_fingerprint(project_ids)
+    state, reset = None, False
+    if token:
+        state = decode_sync_token(token)
+        if state["p"] != fingerprint or _token_expired(state):
+            state, reset = None, True
+    if state is None:
+        state = {"s": 0, "t": time.time(), "p": fingerprint}
+    if "u" not in state:
+        # Начало прохода: всё, что не видно этому снимку, получит номер не меньше xmin
+        state.update(u=await db.scalar(CURRENT_XMIN), n=time.time(), e=0, c=None, i=None)
+
+    page = SyncPage(reset=reset, next_token="")
+    remaining = limit
+    while state["e"] < len(SECTIONS) and remaining > 0:
+        section = SECTIONS[state["e"]]
+        # Клиенту без данных удалять нечего
+        if section != "deleted" or state["s"] > 0:
+            model, query = _section_query(section, project_ids)
+            query = query.where(model.change_seq >= state["s"])
+            if state["c"] is not None:
+                query = query.where(tuple_(model.change_seq, model.id) > tuple_(state["c"], state["i"]))
+            result = await db.execute(query.order_by(model.change_seq, model.id).limit(remaining + 1))
+            rows = result.scalars().all() if section in ("objects", "defects", "deleted") else result.all()
+            await _fill_section(db, page, section, rows[:remaining])
+            if len(rows) > remaining:
+                state.update(c=rows[remaining - 1].change_seq, i=rows[remaining - 1].id)
+                remaining = 0
+                break
+            remaining -= len(rows)
+        state.update(e=state["e"] + 1, c=None, i=None)
+
+    if state["e"] < len(SECTIONS):
+        page.has_more = True
+        page.next_token = encode_sync_token(state)
+    else:
+        page.next_token = encode_sync_token({"s": state["u"], "t": state["n"], "p": fingerprint})
+    return page
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    encodings = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.append(name.strip().lower())
+    return encodings
+
+
+def _zstd_compress(body: bytes) -> Optional[bytes]:
+    # zstandard - необязательная зависимость; без неё отдаём gzip
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+
+def sync_response(page: SyncPage, accept_encoding: str) -> Response:
+    """JSON страницы, сжатый zstd или gzip - что поддерживает клиент."""
+    body = page.model_dump_json().encode("utf-8")
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-store"}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encodings = _accepted_encodings(accept_encoding)
+        compressed = _zstd_compress(body) if "zstd" in encodings else None
+        if compressed is not None:
+            body, headers["Content-Encoding"] = compressed, "zstd"
+        elif "gzip" in encodings:
+            body, headers["Content-Encoding"] = gzip.compress(body, compresslevel=6), "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
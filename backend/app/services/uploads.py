@@ -0,0 +1,209 @@
+"""Приём изображений: пределы размера и типа, возобновляемые загрузки по протоколу tus 1.0.
+
+Файл никогда не читается в память целиком: multipart-загрузки и части tus идут в хранилище кусками,
+тип проверяется по сигнатуре первых байт, размер - по мере чтения.
+"""
+import base64
+import fcntl
+import os
+import uuid
+from datetime import timedelta
+from typing import AsyncIterator, BinaryIO, Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.models import Upload
+from app.services.storage import StoredBlob, get_blob_store, sniff_mime_type
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination"
+TUS_CONTENT_TYPE = "application/offset+octet-stream"
+
+# Сколько первых байт нужно sniff_mime_type
+HEAD_SIZE = 32
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedUploadType(ValueError):
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    pass
+
+
+class UploadBusy(ValueError):
+    pass
+
+
+class InvalidUploadMetadata(ValueError):
+    pass
+
+
+def check_upload_type(head: bytes) -> str:
+    mime_type = sniff_mime_type(head)
+    if mime_type not in settings.UPLOAD_ALLOWED_TYPES:
+        raise UnsupportedUploadType(mime_type)
+    return mime_type
+
+
+class CheckedSource:
+    """Источник для BlobStore.put: тип проверяется по первым байтам, размер - по мере чтения,
+    так что недопустимый файл отбрасывается, не дочитываясь до конца."""
+
+    def __init__(self, file: BinaryIO, max_size: Optional[int] = None):
+        self.file = file
+        self.max_size = settings.UPLOAD_MAX_SIZE if max_size is None else max_size
+        self.size = 0
+        self.head: Optional[bytes] = b""
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.file.read(size)
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise UploadTooLarge(self.size)
+        if self.head is not None:
+            self.head += chunk[:HEAD_SIZE - len(self.head)]
+            if len(self.head) >= HEAD_SIZE or not chunk:
+                check_upload_type(self.head)
+                self.head = None
+        return chunk
+
+
+async def store_upload(upload: UploadFile) -> StoredBlob:
+    """Кладёт загруженный через multipart файл в хранилище с проверкой размера и типа."""
+    # Размер известен после разбора тела - слишком большой файл не читаем вовсе
+    if upload.size is not None and upload.size > settings.UPLOAD_MAX_SIZE:
+        raise UploadTooLarge(upload.size)
+    return await run_in_threadpool(get_blob_store().put, CheckedSource(upload.file))
+
+
+class MultipartSizeLimit:
+    """ASGI-middleware: multipart-запрос с Content-Length больше max_size получает 413 до чтения тела."""
+
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            length = headers.get("content-length", "")
+            if headers.get("content-type", "").startswith("multipart/") and length.isdigit() and int(length) > self.max_size:
+                response = JSONResponse(status_code=413, content={"detail": "Запрос слишком большой"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def tus_headers(**extra) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    headers.update({name.replace("_", "-"): str(value) for name, value in extra.items()})
+    return headers
+
+
+def parse_upload_metadata(header: str) -> dict:
+    """Upload-Metadata: пары «ключ значение-в-base64» через запятую."""
+    metadata = {}
+    for pair in filter(None, (part.strip() for part in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value.strip(), validate=True).decode("utf-8") if value else ""
+        except (ValueError, UnicodeDecodeError):
+            raise InvalidUploadMetadata(key)
+    return metadata
+
+
+def upload_path(upload_id: str) -> str:
+    return os.path.join(settings.UPLOAD_TMP_PATH, upload_id)
+
+
+def upload_offset(upload: Upload) -> int:
+    try:
+        return os.path.getsize(upload_path(upload.id))
+    except FileNotFoundError:
+        return 0
+
+
+def remove_upload_file(upload_id: str) -> None:
+    try:
+        os.remove(upload_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+async def create_upload(db: AsyncSession, user_id: int, defect_id: int, filename: str, length: int) -> Upload:
+    if length > settings.UPLOAD_MAX_SIZE:
+        raise UploadTooLarge(length)
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        defect_id=defect_id,
+        filename=filename[:255],
+        length=length,
+        expires_at=func.now() + timedelta(hours=settings.UPLOAD_EXPIRE_HOURS),
+    )
+    os.makedirs(settings.UPLOAD_TMP_PATH, exist_ok=True)
+    open(upload_path(upload.id), "xb").close()
+    db.add(upload)
+    return upload
+
+
+async def get_upload(db: AsyncSession, upload_id: str, user_id: int) -> Optional[Upload]:
+    """Незавершённая и не истёкшая загрузка пользователя."""
+    return (await db.execute(
+        select(Upload).where(Upload.id == upload_id, Upload.user_id == user_id, Upload.expires_at > func.now())
+    )).scalars().first()
+
+
+async def append_upload(upload: Upload, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """Дописывает тело PATCH к файлу загрузки и возвращает новое смещение.
+
+    Файл блокируется (flock) на время записи - параллельный PATCH той же загрузки получает UploadBusy.
+    Если соединение оборвётся, принятое до обрыва останется, и клиент продолжит с нового смещения.
+    """
+    f = open(upload_path(upload.id), "r+b")
+    try:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy(upload.id)
+        size = f.seek(0, os.SEEK_END)
+        if size != offset:
+            raise UploadOffsetMismatch(size)
+        # Тип проверяем по первой части, до записи остального файла
+        head = b"" if size == 0 else None
+        try:
+            async for chunk in chunks:
+                if size + len(chunk) > upload.length:
+                    raise UploadTooLarge(size + len(chunk))
+                if head is not None:
+                    head += chunk[:HEAD_SIZE - len(head)]
+                    if len(head) >= HEAD_SIZE:
+                        check_upload_type(head)
+                        head = None
+                await run_in_threadpool(f.write, chunk)
+                size += len(chunk)
+            if head is not None and size == upload.length:
+                check_upload_type(head)
+        except UnsupportedUploadType:
+            f.truncate(0)
+            raise
+        return size
+    finally:
+        f.close()
+
+
+def store_completed_upload(upload: Upload) -> StoredBlob:
+    """Переносит полностью принятый файл в хранилище (вызывать в пуле потоков)."""
+    with open(upload_path(upload.id), "rb") as f:
+        return get_blob_store().put(CheckedSource(f))
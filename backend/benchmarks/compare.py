@@ -0,0 +1,51 @@
+"""Сравнение двух отчётов (load_test.py, micro.py) одного вида: регрессии по задержкам.
+
+    python benchmarks/compare.py baseline.json current.json --metric p95_ms --threshold 10
+
+Печатает таблицу замеров, которые есть в обоих отчётах; код возврата 1, если хотя бы один
+стал медленнее больше чем на --threshold процентов (и больше чем на --min-delta-ms).
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float, min_delta_ms: float) -> list:
+    rows = []
+    for name in sorted(set(baseline["results"]) & set(current["results"])):
+        old, new = baseline["results"][name].get(metric), current["results"][name].get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        regressed = change > threshold and new - old > min_delta_ms
+        rows.append((name, old, new, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=10, help="допустимое замедление, %%")
+    parser.add_argument("--min-delta-ms", type=float, default=1, help="меньшие разницы считаются шумом")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    if baseline["kind"] != current["kind"]:
+        raise SystemExit(f"Отчёты разного вида: {baseline['kind']} и {current['kind']}")
+
+    rows = compare(baseline, current, args.metric, args.threshold, args.min_delta_ms)
+    width = max([len(row[0]) for row in rows] + [10])
+    print(f"{baseline['meta'].get('git_commit')} -> {current['meta'].get('git_commit')}, {args.metric}")
+    for name, old, new, change, regressed in rows:
+        print(f"{name:<{width}} {old:>10.2f} {new:>10.2f} {change:>+8.1f}%{'  РЕГРЕССИЯ' if regressed else ''}")
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Нагрузочный тест API: N одновременных пользователей в течение заданного времени.
+
+Каждый виртуальный пользователь повторяет путь по страницам фронтенда с теми же запросами, что они
+делают: список проектов (Projects.tsx), страница проекта с поиском (ProjectDetail.tsx), карточки
+дефектов (DefectDetail.tsx), иногда - комментарий или смена статуса. Запросы одной страницы идут
+так же, как во фронтенде: параллельно или друг за другом.
+
+    pip install httpx
+    python benchmarks/seed.py --truncate
+    python benchmarks/load_test.py --accounts manager:5,engineer:40,observer:5 --duration 60 --output load.json
+
+Отчёт (JSON, формат benchmarks/report.py) - задержки по каждому запросу и время загрузки страниц.
+Порог --slo-ms проверяется по p95 загрузки страниц; если он превышен, код возврата 1.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+
+from report import make_report, timings, write_report
+
+try:
+    import httpx
+except ImportError:
+    raise SystemExit("Для нагрузочного теста нужен httpx: pip install httpx")
+
+SEARCH_WORDS = ("трещина", "протечка", "кровля", "плитка", "подъезд", "фасад", "гидроизоляция")
+STATUSES = ("OPEN", "IN_PROGRESS", "UNDER_REVIEW")
+
+
+def parse_accounts(value: str) -> list:
+    """manager:5,engineer:40 -> manager1..manager5, engineer1..engineer40 (учётные записи benchmarks/seed.py)."""
+    nicknames = []
+    for part in value.split(","):
+        role, _, count = part.partition(":")
+        nicknames += [f"{role.strip()}{number}" for number in range(1, int(count or 1) + 1)]
+    return nicknames
+
+
+async def login(client, nickname, password):
+    response = await client.post("/auth", json={"nickname": nickname, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class VirtualUser:
+    def __init__(self, client, headers, args, stats, rng):
+        self.client = client
+        self.headers = headers
+        self.args = args
+        self.stats = stats
+        self.rng = rng
+
+    async def call(self, name, method, path, **kwargs):
+        """Запрос с замером; name - шаблон пути, по нему группируются результаты."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats["errors"][name] += 1
+            return None
+        self.stats["requests"][name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.stats["errors"][name] += 1
+            return None
+        return response.json()
+
+    async def get(self, name, path, **params):
+        return await self.call(f"GET {name}", "GET", path, params=params)
+
+    async def page(self, name, steps):
+        """Загрузка страницы: время от первого запроса до последнего ответа."""
+        started = time.perf_counter()
+        result = await steps()
+        self.stats["pages"][name].append(time.perf_counter() - started)
+        if self.args.think_time:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_time)
+        return result
+
+    async def app_start(self):
+        # App.tsx
+        userinfo, users = await asyncio.gather(
+            self.get("/userinfo", "/userinfo"), self.get("/api/v1/users/", "/api/v1/users/")
+        )
+        if userinfo and users:
+            return next((user for user in users if user["nickname"] == userinfo["nickname"]), None)
+        return None
+
+    async def projects_page(self):
+        return await self.get("/projects", "/projects")
+
+    async def project_page(self, project_id):
+        _, _, defects = await asyncio.gather(
+            self.get("/projects/{id}", f"/projects/{project_id}"),
+            self.get("/api/v1/objects/", "/api/v1/objects/", project_id=project_id),
+            self.get("/api/v1/defects/", "/api/v1/defects/"),
+        )
+        await self.get("/api/v1/projects/{id}/available-users", f"/api/v1/projects/{project_id}/available-users")
+        await self.get("/userinfo", "/userinfo")
+        await self.get("/api/v1/users/", "/api/v1/users/")
+        return defects
+
+    async def search(self, project_id):
+        return await self.get(
+            "/api/v1/defects/search", "/api/v1/defects/search",
+            q=self.rng.choice(SEARCH_WORDS), project_id=project_id, limit=200,
+        )
+
+    async def defect_page(self, defect_id):
+        defect, _, _, _ = await asyncio.gather(
+            self.get("/api/v1/defects/{id}?include", f"/api/v1/defects/{defect_id}", include="history", limit=50),
+            self.get("/api/v1/defects/{id}/comments", f"/api/v1/defects/{defect_id}/comments", order="desc", limit=50),
+            self.get("/api/v1/users/", "/api/v1/users/"),
+            self.get("/api/v1/defects/{id}/images", f"/api/v1/defects/{defect_id}/images"),
+        )
+        if defect:
+            await self.get("/api/v1/objects/{id}", f"/api/v1/objects/{defect['object_id']}")
+        return defect
+
+    async def edit_defect(self, defect_id, role):
+        if role == "MANAGER" and self.rng.random() < 0.5:
+            # Смена статуса и перечитывание истории, как applyDefectUpdate
+            updated = await self.call(
+                "PUT /api/v1/defects/{id}", "PUT", f"/api/v1/defects/{defect_id}",
+                json={"status": self.rng.choice(STATUSES)},
+            )
+            if updated:
+                await self.get("/api/v1/defects/{id}/history", f"/api/v1/defects/{defect_id}/history", limit=50)
+        else:
+            await self.call(
+                "POST /api/v1/defects/{id}/comments", "POST", f"/api/v1/defects/{defect_id}/comments",
+                json={"content": "Проверено на месте"},
+            )
+
+    async def run(self, deadline):
+        user = await self.page("app", self.app_start)
+        role = user["role"] if user else None
+        while time.monotonic() < deadline:
+            projects = await self.page("projects", self.projects_page)
+            if not projects or not projects["projects"]:
+                continue
+            project_id = self.rng.choice(projects["projects"])["id"]
+            defects = await self.page("project", lambda: self.project_page(project_id))
+            if self.rng.random() < 0.3:
+                found = await self.page("search", lambda: self.search(project_id))
+                ids = [item["id"] for item in found["items"]] if found else []
+            else:
+                ids = [defect["id"] for defect in defects or []]
+            for defect_id in self.rng.sample(ids, min(len(ids), self.rng.randint(1, 3))):
+                if time.monotonic() >= deadline:
+                    break
+                await self.page("defect", lambda: self.defect_page(defect_id))
+                if role in ("MANAGER", "ENGINEER") and self.rng.random() < self.args.write_ratio:
+                    await self.edit_defect(defect_id, role)
+
+
+async def run(args):
+    nicknames = parse_accounts(args.accounts) if args.accounts else [args.nickname]
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    stats = {"requests": defaultdict(list), "pages": defaultdict(list), "errors": defaultdict(int)}
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        sessions = {}
+        for nickname in nicknames[:args.users]:
+            sessions[nickname] = await login(client, nickname, args.password)
+        users = [
+            VirtualUser(client, sessions[nicknames[number % len(sessions)]], args, stats, random.Random(args.seed + number))
+            for number in range(args.users)
+        ]
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*[user.run(deadline) for user in users])
+        elapsed = time.monotonic() - started
+
+    latencies = [value for values in stats["requests"].values() for value in values]
+    page_latencies = [value for values in stats["pages"].values() for value in values]
+    results = {name: dict(timings(values), errors=stats["errors"][name]) for name, values in sorted(stats["requests"].items())}
+    results.update({f"page {name}": timings(values) for name, values in sorted(stats["pages"].items())})
+    page_p95 = timings(page_latencies).get("p95_ms")
+    summary = {
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies),
+        "errors": sum(stats["errors"].values()),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency": timings(latencies),
+        "page_latency": timings(page_latencies),
+        "slo_passed": page_p95 is not None and page_p95 <= args.slo_ms,
+    }
+    params = {key: value for key, value in vars(args).items() if key != "password"}
+    return make_report("load", params, results, summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--accounts", help="роли и число учётных записей seed.py, например manager:5,engineer:40,observer:5")
+    parser.add_argument("--nickname", default="admin", help="единственная учётная запись, если --accounts не задан")
+    parser.add_argument("--password", default="12345678")
+    parser.add_argument("--think-time", type=float, default=0, help="средняя пауза между страницами, с")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="доля открытых дефектов, которые изменяются")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="допустимый p95 загрузки страницы")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="сохранить отчёт в файл")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    write_report(report, args.output)
+    if not report["summary"]["slo_passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
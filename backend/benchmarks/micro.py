@@ -0,0 +1,127 @@
+"""Микробенчмарки горячих функций на заполненной базе (benchmarks/seed.py), без HTTP.
+
+Замеряются: сериализация старого списка дефектов проекта - через orjson, как отдаёт эндпоинт, и через
+response_model, как FastAPI делал бы без обхода проверки (items_per_s - дефектов в секунду), тот же список
+вместе с загрузкой из БД, карточка дефекта, выгрузка CSV и XLSX проекта и статистика за неделю, год и весь период.
+
+    python benchmarks/micro.py --project-id 1 --repeat 20 --output micro.json
+
+Отчёт - JSON в формате benchmarks/report.py; сравнение запусков - benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.db.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.main import defect_detail  # noqa: E402
+from app.schemas.defect import DefectResponse  # noqa: E402
+from app.services.defect_serialization import defect_list  # noqa: E402
+from app.services.defect_export import export_query, stream_csv, stream_xlsx  # noqa: E402
+from app.services.defect_stats import stats_series  # noqa: E402
+from report import make_report, timings, write_report  # noqa: E402
+
+
+async def measure(args, fn) -> dict:
+    """Время вызовов fn: сначала --warmup прогонов без замера, затем --repeat с замером.
+
+    fn возвращает число обработанных элементов - оно попадает в отчёт."""
+    for _ in range(args.warmup):
+        await fn()
+    seconds, items = [], None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        items = await fn()
+        seconds.append(time.perf_counter() - started)
+    result = timings(seconds)
+    if items is not None:
+        result["items"] = items
+        result["items_per_s"] = round(items * len(seconds) / sum(seconds))
+    return result
+
+
+async def consume(stream) -> int:
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+    return size
+
+
+async def run(args) -> dict:
+    results = {}
+    today = date.today()
+    async with AsyncSessionLocal() as db:
+        defects = await defect_list(db, [args.project_id])
+        if not defects:
+            raise SystemExit(f"В проекте {args.project_id} нет дефектов - заполните базу benchmarks/seed.py")
+        adapter = TypeAdapter(List[DefectResponse])
+
+        async def serialize_orjson():
+            orjson.dumps(defects)
+            return len(defects)
+
+        async def serialize_response_model():
+            # Что делает FastAPI с ответом эндпоинта с response_model: проверка, JSON-совместимые объекты, json.dumps
+            content = adapter.dump_python(adapter.validate_python(defects), mode="json")
+            json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+            return len(defects)
+
+        async def load_and_serialize():
+            orjson.dumps(await defect_list(db, [args.project_id]))
+            return len(defects)
+
+        results["defect_list_orjson"] = await measure(args, serialize_orjson)
+        results["defect_list_response_model"] = await measure(args, serialize_response_model)
+        results["defect_list_with_load"] = await measure(args, load_and_serialize)
+
+        rng = random.Random(args.seed)
+        defect_ids = [defect["id"] for defect in defects]
+
+        async def detail():
+            response = await defect_detail(db, rng.choice(defect_ids), ("comments", "history"), limit=200)
+            return len(response.comments) + len(response.history)
+
+        results["defect_detail"] = await measure(args, detail)
+
+        for name, date_from, granularity in (
+            ("stats_week_daily", today - timedelta(days=6), "day"),
+            ("stats_year_weekly", today - timedelta(days=364), "week"),
+            ("stats_all_monthly", today - timedelta(days=3650), "month"),
+        ):
+            async def stats(date_from=date_from, granularity=granularity):
+                return len(await stats_series(db, date_from, today, granularity))
+
+            results[name] = await measure(args, stats)
+
+    # Для выгрузок items - размер файла в байтах
+    query = export_query(project_id=args.project_id)
+    results["export_csv"] = await measure(args, lambda: consume(stream_csv(query)))
+    results["export_xlsx"] = await measure(args, lambda: consume(stream_xlsx(query)))
+    await async_engine.dispose()
+
+    return make_report("micro", vars(args), results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project-id", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="сохранить отчёт в файл")
+    args = parser.parse_args()
+    write_report(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
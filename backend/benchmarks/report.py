@@ -0,0 +1,73 @@
+"""Общий формат отчётов нагрузочного теста, микробенчмарков и заполнения базы.
+
+Отчёт - JSON с разделами meta (когда и на каком коммите снят), params (параметры запуска),
+results (замеры по именам: операция или эндпоинт) и summary. Отчёты разных запусков сравнивает compare.py.
+"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def timings(seconds: List[float]) -> dict:
+    """Сводка замеров в миллисекундах."""
+    if not seconds:
+        return {"count": 0}
+
+    def ms(value):
+        return round(value * 1000, 2)
+
+    return {
+        "count": len(seconds),
+        "mean_ms": ms(sum(seconds) / len(seconds)),
+        "min_ms": ms(min(seconds)),
+        "p50_ms": ms(percentile(seconds, 50)),
+        "p95_ms": ms(percentile(seconds, 95)),
+        "p99_ms": ms(percentile(seconds, 99)),
+        "max_ms": ms(max(seconds)),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_report(kind: str, params: dict, results: dict, summary: Optional[dict] = None) -> dict:
+    return {
+        "kind": kind,
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+        },
+        "params": params,
+        "results": results,
+        "summary": summary or {},
+    }
+
+
+def write_report(report: dict, path: Optional[str]) -> None:
+    """Печатает отчёт и, если задан path, сохраняет его в файл."""
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if path:
+        Path(path).write_text(text + "\n", encoding="utf-8")
+    sys.stdout.write(text + "\n")
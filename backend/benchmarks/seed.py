@@ -0,0 +1,309 @@
+"""Заполнение базы синтетическими данными для нагрузочного теста и бенчмарков.
+
+Объёмы задаются параметрами; одинаковые параметры и --seed дают одинаковые данные (даты отсчитываются
+от начала текущего дня). Строки загружаются через COPY партиями, пользовательские триггеры на время
+загрузки отключаются, поисковые векторы и статистика по дням считаются одним запросом в конце.
+Всё выполняется в одной транзакции: при ошибке база остаётся прежней.
+
+    python benchmarks/seed.py --truncate --projects 2000 --defects 1000000
+
+Пользователи - manager1.., engineer1.., observer1.. с паролем --password. База должна быть
+на последней миграции (alembic upgrade head), DATABASE_URL - как у приложения.
+"""
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncpg  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.defect_stats import BACKFILL_SQL  # noqa: E402
+from app.services.passwords import hash_password, shutdown_password_pool  # noqa: E402
+from app.services.storage import get_blob_store  # noqa: E402
+from report import make_report, write_report  # noqa: E402
+
+# Таблицы в порядке загрузки; TRUNCATE дополнительно чистит производные данные
+TABLES = (
+    "projects", "users", "project_users", "objects", "defects",
+    "defect_users", "defect_comments", "defect_history", "defect_images",
+)
+TRUNCATE_SQL = (
+    "TRUNCATE " + ", ".join(TABLES)
+    + ", image_variants, defect_daily_stats, defect_events, sync_tombstones, jobs, uploads RESTART IDENTITY CASCADE"
+)
+
+STATUS_FLOW = ("NEW", "OPEN", "IN_PROGRESS", "UNDER_REVIEW", "CLOSED")
+PRIORITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+PRIORITY_WEIGHTS = (30, 40, 20, 10)
+
+OBJECT_KINDS = ("Жилой дом", "Корпус", "Паркинг", "Школа", "Детский сад", "Котельная", "Торговый центр")
+STREETS = ("ул. Ленина", "пр. Мира", "ул. Садовая", "ул. Заводская", "наб. Речная", "ул. Строителей")
+DEFECT_KINDS = (
+    "Трещина в стене", "Протечка кровли", "Отслоение штукатурки", "Скол плитки", "Неровность пола",
+    "Повреждение гидроизоляции", "Отклонение от вертикали", "Коррозия арматуры", "Неплотное примыкание окна",
+    "Дефект сварного шва", "Отсутствие герметика", "Повреждение кабеля", "Сколы на ступенях",
+)
+PLACES = ("в подъезде {}", "на этаже {}", "в квартире {}", "на кровле", "в подвале", "на фасаде", "в секции {}")
+DESCRIPTIONS = (
+    "Обнаружено при плановом осмотре.",
+    "Требуется вскрытие и повторная проверка.",
+    "Отклонение превышает допуск по СП.",
+    "Заявлено жильцами, подтверждено на месте.",
+    "Необходимо согласовать способ устранения с проектировщиком.",
+    "Фотофиксация приложена.",
+)
+COMMENTS = (
+    "Принято в работу", "Подрядчик уведомлён", "Нужны фото после устранения", "Устранено, прошу проверить",
+    "Материалы заказаны, срок - неделя", "Осмотрено на месте, замечание подтверждается",
+    "Перенесено на следующий этап работ", "Проверено, замечаний нет",
+)
+
+
+def dsn() -> str:
+    # asyncpg принимает только postgresql://, без указания драйвера SQLAlchemy
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def make_images(rng: random.Random, count: int) -> list:
+    """Небольшие JPEG в хранилище; изображения дефектов ссылаются на них, чтобы выдача файлов тоже работала."""
+    store = get_blob_store()
+    blobs = []
+    for _ in range(count):
+        image = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = rng.randrange(600), rng.randrange(440)
+            draw.rectangle((x, y, x + rng.randrange(10, 200), y + rng.randrange(10, 200)),
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=80)
+        blobs.append(store.put(buffer.getvalue()))
+    return blobs
+
+
+class Generator:
+    """Строки таблиц. Случайные значения берутся из одного генератора в фиксированном порядке."""
+
+    def __init__(self, args, password_hash: str, blobs: list, change_seq: int):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.password_hash = password_hash
+        self.blobs = blobs
+        self.change_seq = change_seq
+        self.now = datetime.combine(date.today(), datetime.min.time())
+        self.members = {}
+        self.engineers = {}
+
+    def projects(self):
+        for project_id in range(1, self.args.projects + 1):
+            created_at = self.now - timedelta(days=self.args.days + self.rng.randrange(365))
+            yield project_id, f"Проект {project_id}", None, created_at
+
+    def users(self):
+        user_id = 0
+        for role, count in (("MANAGER", self.args.managers), ("ENGINEER", self.args.engineers),
+                            ("OBSERVER", self.args.observers)):
+            for number in range(1, count + 1):
+                user_id += 1
+                yield user_id, f"{role.lower()}{number}", self.password_hash, role, self.now - timedelta(days=self.args.days)
+
+    def project_users(self):
+        args = self.args
+        for project_id in range(1, args.projects + 1):
+            # У каждого проекта свой менеджер; менеджеры ведут проекты по кругу
+            if args.managers:
+                self.members.setdefault(project_id, []).append((project_id - 1) % args.managers + 1)
+        for number in range(args.engineers):
+            user_id = args.managers + number + 1
+            projects = {number % args.projects + 1}
+            if self.rng.random() < 0.3:
+                projects.add(self.rng.randrange(args.projects) + 1)
+            for project_id in sorted(projects):
+                self.members.setdefault(project_id, []).append(user_id)
+                self.engineers.setdefault(project_id, []).append(user_id)
+        for project_id in sorted(self.members):
+            for user_id in self.members[project_id]:
+                yield user_id, project_id
+
+    def objects(self):
+        object_id = 0
+        for project_id in range(1, self.args.projects + 1):
+            for _ in range(self.args.objects_per_project):
+                object_id += 1
+                yield (
+                    object_id, f"{self.rng.choice(OBJECT_KINDS)} {object_id}", None,
+                    f"{self.rng.choice(STREETS)}, {self.rng.randrange(1, 200)}", project_id,
+                    self.now - timedelta(days=self.args.days), self.change_seq,
+                )
+
+    def defect_batch(self, first_id: int, last_id: int) -> dict:
+        """Дефекты с first_id по last_id и их назначения, комментарии, история и изображения."""
+        args, rng, seq = self.args, self.rng, self.change_seq
+        rows = {table: [] for table in ("defects", "defect_users", "defect_comments", "defect_history", "defect_images")}
+        objects = args.projects * args.objects_per_project
+        for defect_id in range(first_id, last_id + 1):
+            object_id = rng.randrange(objects) + 1
+            project_id = (object_id - 1) // args.objects_per_project + 1
+            members = self.members.get(project_id) or [1]
+            engineers = self.engineers.get(project_id, [])
+
+            age = rng.random()
+            created_at = self.now - timedelta(seconds=int(age * args.days * 86400))
+            # Чем старше дефект, тем дальше он продвинулся по статусам
+            steps = sum(1 for _ in range(4) if rng.random() < 0.2 + 0.75 * age)
+            changes = sorted(rng.uniform(0, (self.now - created_at).total_seconds()) for _ in range(steps))
+            for step, offset in enumerate(changes):
+                rows["defect_history"].append((
+                    "status", f"DefectStatus.{STATUS_FLOW[step]}", f"DefectStatus.{STATUS_FLOW[step + 1]}",
+                    defect_id, rng.choice(members), created_at + timedelta(seconds=offset), seq,
+                ))
+            updated_at = created_at + timedelta(seconds=changes[-1]) if changes else created_at
+
+            place = rng.choice(PLACES).format(rng.randrange(1, 20))
+            description = " ".join(rng.sample(DESCRIPTIONS, rng.randrange(0, 3))) or None
+            due_date = (created_at + timedelta(days=rng.randrange(7, 60))).date() if rng.random() < 0.4 else None
+            rows["defects"].append((
+                defect_id, f"{rng.choice(DEFECT_KINDS)} {place}", description, STATUS_FLOW[steps],
+                rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0], due_date, object_id, created_at, updated_at, seq,
+            ))
+
+            if engineers:
+                for user_id in rng.sample(engineers, min(len(engineers), rng.randrange(0, 3))):
+                    rows["defect_users"].append((user_id, defect_id, created_at))
+            for _ in range(rng.randrange(args.comments_per_defect * 2 + 1)):
+                rows["defect_comments"].append((
+                    rng.choice(COMMENTS), defect_id, rng.choice(members),
+                    self.now - timedelta(seconds=int(rng.random() * (self.now - created_at).total_seconds())), seq,
+                ))
+            if self.blobs and rng.random() < args.image_ratio:
+                for number in range(rng.randrange(1, 4)):
+                    blob = rng.choice(self.blobs)
+                    rows["defect_images"].append((
+                        f"IMG_{defect_id}_{number}.jpg", blob.key, blob.size, blob.mime_type, blob.sha256,
+                        defect_id, created_at, seq,
+                    ))
+        return rows
+
+
+COLUMNS = {
+    "projects": ("id", "title", "description", "created_at"),
+    "users": ("id", "nickname", "password", "role", "created_at"),
+    "project_users": ("user_id", "project_id"),
+    "objects": ("id", "name", "description", "address", "project_id", "created_at", "change_seq"),
+    "defects": ("id", "title", "description", "status", "priority", "due_date", "object_id", "created_at",
+                "updated_at", "change_seq"),
+    "defect_users": ("user_id", "defect_id", "assigned_at"),
+    "defect_comments": ("content", "defect_id", "user_id", "created_at", "change_seq"),
+    "defect_history": ("field_name", "old_value", "new_value", "defect_id", "user_id", "created_at", "change_seq"),
+    "defect_images": ("filename", "storage_key", "size", "mime_type", "sha256", "defect_id", "created_at", "change_seq"),
+}
+
+
+async def seed(args) -> dict:
+    results = {}
+    started = time.perf_counter()
+
+    def stage(name, since, rows=None):
+        results[name] = {"seconds": round(time.perf_counter() - since, 2)}
+        if rows is not None:
+            results[name]["rows"] = rows
+
+    password_hash = await hash_password(args.password)
+    blobs = make_images(random.Random(args.seed), args.images)
+
+    conn = await asyncpg.connect(dsn())
+    try:
+        async with conn.transaction():
+            if args.truncate:
+                await conn.execute(TRUNCATE_SQL)
+            elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM projects)"):
+                raise SystemExit("База не пуста: запустите с --truncate, чтобы удалить все данные")
+            for table in TABLES:
+                # Триггеры change_seq, поиска и записей об удалении; внешние ключи проверяются как обычно
+                await conn.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+            change_seq = await conn.fetchval("SELECT pg_current_xact_id()::text::bigint")
+            generator = Generator(args, password_hash, blobs, change_seq)
+
+            for table, rows in (("projects", generator.projects()), ("users", generator.users()),
+                                ("project_users", generator.project_users()), ("objects", generator.objects())):
+                since = time.perf_counter()
+                rows = list(rows)
+                await conn.copy_records_to_table(table, records=rows, columns=COLUMNS[table])
+                stage(table, since, len(rows))
+
+            counts = dict.fromkeys(("defects", "defect_users", "defect_comments", "defect_history", "defect_images"), 0)
+            since = time.perf_counter()
+            for first_id in range(1, args.defects + 1, args.batch_size):
+                batch = generator.defect_batch(first_id, min(first_id + args.batch_size - 1, args.defects))
+                for table, rows in batch.items():
+                    await conn.copy_records_to_table(table, records=rows, columns=COLUMNS[table])
+                    counts[table] += len(rows)
+                print(f"{min(first_id + args.batch_size - 1, args.defects)}/{args.defects} дефектов", file=sys.stderr)
+            stage("defects", since, counts.pop("defects"))
+            for table, count in counts.items():
+                results[table] = {"rows": count}
+
+            for table in ("projects", "users", "objects", "defects"):
+                await conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), max(id)) FROM {table}")
+
+            since = time.perf_counter()
+            await conn.execute("UPDATE defects SET search_vector = defect_search_document(id, title, description, object_id)")
+            stage("search_vector", since)
+            since = time.perf_counter()
+            await conn.execute(BACKFILL_SQL)
+            stage("defect_daily_stats", since)
+
+            for table in TABLES:
+                await conn.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+
+        since = time.perf_counter()
+        await conn.execute("VACUUM ANALYZE")
+        stage("vacuum_analyze", since)
+    finally:
+        await conn.close()
+        shutdown_password_pool()
+
+    accounts = {"manager": args.managers, "engineer": args.engineers, "observer": args.observers}
+    return make_report("seed", vars(args), results, {
+        "duration_s": round(time.perf_counter() - started, 1),
+        "accounts": {role: f"{role}1..{role}{count}" for role, count in accounts.items() if count},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--objects-per-project", type=int, default=10)
+    parser.add_argument("--defects", type=int, default=1000000)
+    parser.add_argument("--comments-per-defect", type=int, default=3, help="в среднем")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="доля дефектов с изображениями")
+    parser.add_argument("--images", type=int, default=16, help="различных файлов изображений в хранилище")
+    parser.add_argument("--managers", type=int, default=100)
+    parser.add_argument("--engineers", type=int, default=6000)
+    parser.add_argument("--observers", type=int, default=50)
+    parser.add_argument("--days", type=int, default=730, help="за сколько дней созданы дефекты")
+    parser.add_argument("--password", default="12345678")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10000, help="дефектов в одной партии COPY")
+    parser.add_argument("--truncate", action="store_true", help="удалить все данные перед заполнением")
+    parser.add_argument("--output", help="сохранить отчёт в файл")
+    args = parser.parse_args()
+    if args.projects < 1 or args.objects_per_project < 1:
+        parser.error("нужен хотя бы один проект и объект")
+    report = asyncio.run(seed(args))
+    # Пароль в отчёт не пишем
+    report["params"].pop("password")
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Общие фикстуры: база PostgreSQL из TEST_DATABASE_URL, заполненная типичным объёмом данных.
+
+Схема public в этой базе пересоздаётся при каждом запуске.
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+SEED_SQL = """
+INSERT INTO projects (id, title) SELECT g, 'Проект ' || g FROM generate_series(1, 50) g;
+INSERT INTO users (id, nickname, password, role)
+    SELECT g, 'user' || g, 'x', (CASE WHEN g % 10 = 0 THEN 'MANAGER' WHEN g % 10 = 1 THEN 'OBSERVER' ELSE 'ENGINEER' END)::roleenum
+    FROM generate_series(1, 2000) g;
+INSERT INTO project_users (user_id, project_id) SELECT g, g % 50 + 1 FROM generate_series(1, 2000) g WHERE g % 10 <> 1;
+INSERT INTO objects (id, name, project_id) SELECT g, 'Объект ' || g, g % 50 + 1 FROM generate_series(1, 1000) g;
+INSERT INTO defects (id, title, status, priority, due_date, object_id, created_at, updated_at)
+    SELECT g, 'Дефект ' || g,
+        (ARRAY['NEW', 'OPEN', 'IN_PROGRESS', 'UNDER_REVIEW', 'CLOSED'])[g % 5 + 1]::defectstatus,
+        (ARRAY['LOW', 'MEDIUM', 'HIGH', 'CRITICAL'])[g % 4 + 1]::defectpriority,
+        CASE WHEN g % 3 = 0 THEN current_date + (g % 90) END,
+        g % 1000 + 1,
+        now() - (g % 730) * interval '1 day' - (g % 1440) * interval '1 minute',
+        now() - (g % 365) * interval '1 day'
+    FROM generate_series(1, 100000) g;
+INSERT INTO defect_users (user_id, defect_id) SELECT (g * 7) % 2000 + 1, g FROM generate_series(1, 100000) g;
+INSERT INTO defect_comments (content, defect_id, user_id) SELECT 'Комментарий', g % 100000 + 1, g % 2000 + 1 FROM generate_series(1, 200000) g;
+INSERT INTO defect_history (field_name, old_value, new_value, defect_id, user_id)
+    SELECT 'status', 'NEW', 'OPEN', g % 100000 + 1, g % 2000 + 1 FROM generate_series(1, 200000) g;
+INSERT INTO defect_images (filename, storage_key, size, mime_type, sha256, defect_id)
+    SELECT 'photo.jpg', 'aa/bb/' || g, 1, 'image/jpeg', md5(g::text), g * 5 FROM generate_series(1, 20000) g;
+SELECT setval(pg_get_serial_sequence(t, 'id'), 1000000) FROM unnest(ARRAY['projects', 'users', 'objects', 'defects']) t;
+"""
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    """Синхронное подключение к тестовой базе - одно на весь прогон."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    import sqlalchemy as sa
+
+    engine = sa.create_engine(TEST_DATABASE_URL)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory, db_engine):
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    storage = tmp_path_factory.mktemp("storage")
+    os.environ["BLOB_LOCAL_PATH"] = str(storage)
+    os.environ["UPLOAD_TMP_PATH"] = str(storage / ".uploads")
+    # Запросы воркера фоновых задач не должны попадать в проверяемые
+    os.environ["JOB_RUNNER_IN_PROCESS"] = "false"
+    # Кэш ответов скрыл бы запросы к базе при повторном обращении к тому же адресу
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+    import sqlalchemy as sa
+    from alembic import command
+    from alembic.config import Config
+
+    with db_engine.begin() as conn:
+        conn.execute(sa.text("DROP SCHEMA public CASCADE; CREATE SCHEMA public;"))
+    command.upgrade(Config(str(BACKEND_DIR / "alembic.ini")), "head")
+    with db_engine.begin() as conn:
+        conn.execute(sa.text(SEED_SQL))
+    with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(sa.text("ANALYZE"))
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        test_client.manager = auth_headers(10)
+        test_client.observer = auth_headers(11)
+        yield test_client
+
+
+def auth_headers(user_id: int) -> dict:
+    """Заголовок Authorization для пользователя из SEED_SQL (роль - по его номеру)."""
+    from app.main import create_access_token
+    from app.models.user import RoleEnum
+
+    class Token:
+        def __init__(self):
+            self.id, self.nickname = user_id, f"user{user_id}"
+            self.role = RoleEnum.MANAGER if user_id % 10 == 0 else RoleEnum.OBSERVER if user_id % 10 == 1 else RoleEnum.ENGINEER
+
+    return {"Authorization": f"Bearer {create_access_token(Token())}"}
+
+
+@pytest.fixture(scope="session")
+def db_scalar(client, db_engine):
+    """Одно значение из тестовой базы в обход API: db_scalar("SELECT ... WHERE id = :id", id=1)."""
+    import sqlalchemy as sa
+
+    def scalar(sql, **params):
+        with db_engine.connect() as conn:
+            return conn.scalar(sa.text(sql) if isinstance(sql, str) else sql, params)
+
+    return scalar
+
+
+@pytest.fixture(scope="session")
+def db_execute(client, db_engine):
+    """Запись в тестовую базу в обход API, в отдельной транзакции."""
+    import sqlalchemy as sa
+
+    def execute(sql: str, **params) -> None:
+        with db_engine.begin() as conn:
+            conn.execute(sa.text(sql), params)
+
+    return execute
+
+
+@pytest.fixture
+def captured_statements():
+    from sqlalchemy import event
+    from app.db.database import async_engine
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def query_budget(captured_statements):
+    """Проверка числа запросов к БД: блок укладывается в бюджет и не повторяет один запрос (N+1).
+
+        with query_budget(5):
+            client.get(...)
+    """
+    from app.services.observability import repeated_statements
+
+    @contextmanager
+    def check(budget: int, repeat_threshold: int = 3):
+        captured_statements.clear()
+        yield captured_statements
+        statements = [statement for statement, _ in captured_statements]
+        listing = "\n\n".join(statements)
+        assert len(statements) <= budget, f"{len(statements)} запросов к БД при бюджете {budget}:\n\n{listing}"
+        repeated = repeated_statements(statements, repeat_threshold)
+        assert not repeated, "Один и тот же запрос повторяется (N+1):\n\n" + "\n\n".join(
+            f"{count} раз: {shape}" for shape, count in repeated
+        )
+
+    return check
@@ -0,0 +1,111 @@
+"""Отдача файлов из хранилища (app.services.blob_delivery): Range, ETag, If-None-Match и If-Range."""
+import hashlib
+import uuid
+
+import pytest
+
+# Дефект в проекте 11 - проекте менеджера client.manager
+DEFECT_ID = 59
+
+
+def png(size: int = 1000) -> bytes:
+    body = uuid.uuid4().bytes * (size // 16 + 1)
+    return (b"\x89PNG\r\n\x1a\n" + body)[:size]
+
+
+def upload(client, data: bytes) -> str:
+    response = client.post(f"/api/v1/defects/{DEFECT_ID}/images", files={"image": ("photo.png", data)}, headers=client.manager)
+    assert response.status_code == 200
+    images = client.get(f"/api/v1/defects/{DEFECT_ID}/images", headers=client.manager).json()
+    return f"/api/v1/defects/{DEFECT_ID}/images/{max(image['id'] for image in images)}"
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=990-", (990, 999)),
+    ("bytes=-10", (990, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=500-5000", (500, 999)),
+    # Несколько диапазонов и другие единицы не поддерживаются - файл отдаётся целиком
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    # Синтаксически неверный диапазон игнорируется (RFC 7233, 3.1)
+    ("bytes=abc-", None),
+    ("bytes=1-x", None),
+    ("bytes=a-b", None),
+    ("bytes=20-10", None),
+])
+def test_parse_range(client, header, expected):
+    from app.services.blob_delivery import parse_range
+
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1001", "bytes=-0"])
+def test_parse_range_unsatisfiable(client, header):
+    from app.services.blob_delivery import parse_range
+
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_full_and_partial_content(client):
+    data = png()
+    url = upload(client, data)
+    etag = f'"{hashlib.sha256(data).hexdigest()}"'
+
+    full = client.get(url, headers=client.manager)
+    assert full.status_code == 200 and full.content == data
+    assert full.headers["ETag"] == etag
+    assert full.headers["Content-Type"] == "image/png"
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert full.headers["Content-Length"] == str(len(data))
+
+    part = client.get(url, headers={**client.manager, "Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.content == data[100:200]
+    assert part.headers["Content-Range"] == f"bytes 100-199/{len(data)}"
+    assert part.headers["Content-Length"] == "100"
+
+    tail = client.get(url, headers={**client.manager, "Range": "bytes=-10"})
+    assert tail.status_code == 206 and tail.content == data[-10:]
+
+    outside = client.get(url, headers={**client.manager, "Range": f"bytes={len(data)}-"})
+    assert outside.status_code == 416
+    assert outside.headers["Content-Range"] == f"bytes */{len(data)}"
+
+    for header in ("bytes=abc-", "bytes=5-3", "bytes=1-x"):
+        malformed = client.get(url, headers={**client.manager, "Range": header})
+        assert malformed.status_code == 200 and malformed.content == data
+        assert "Content-Range" not in malformed.headers
+
+
+def test_if_range(client):
+    data = png()
+    url = upload(client, data)
+    etag = f'"{hashlib.sha256(data).hexdigest()}"'
+
+    same = client.get(url, headers={**client.manager, "Range": "bytes=0-9", "If-Range": etag})
+    assert same.status_code == 206 and same.content == data[:10]
+    # Файл у клиента другой версии - докачивать нечего, отдаётся целиком
+    changed = client.get(url, headers={**client.manager, "Range": "bytes=0-9", "If-Range": '"other-version"'})
+    assert changed.status_code == 200 and changed.content == data
+
+
+def test_if_none_match_does_not_read_blob(client):
+    from app.services.storage import get_blob_store, key_for_hash
+
+    data = png()
+    url = upload(client, data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    etag = f'"{sha256}"'
+    stale = client.get(url, headers={**client.manager, "If-None-Match": '"stale"'})
+    assert stale.status_code == 200 and stale.content == data
+
+    # Файла в хранилище больше нет: ответ 304 строится только по записи в БД
+    get_blob_store().delete(key_for_hash(sha256))
+
+    for header in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        response = client.get(url, headers={**client.manager, "If-None-Match": header})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["ETag"] == etag
+        assert "max-age" in response.headers["Cache-Control"]
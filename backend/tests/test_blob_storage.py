@@ -0,0 +1,81 @@
+"""Файлы в хранилище и ссылки на них: release_blob не удаляет файл, на который ссылается новая запись."""
+import asyncio
+import uuid
+
+DEFECT_ID = 4243
+
+
+def unique_bytes() -> bytes:
+    return b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes
+
+
+async def add_image(db, stored, data):
+    from app.main import attach_images
+
+    image, = await attach_images(db, DEFECT_ID, [("photo.png", stored, data)])
+    return image
+
+
+def test_release_waits_for_uncommitted_reference(client):
+    from app.db.database import AsyncSessionLocal
+    from app.services.storage import get_blob_store, release_blob
+
+    store = get_blob_store()
+    data = unique_bytes()
+
+    async def scenario():
+        stored = store.put(data)
+        async with AsyncSessionLocal() as writer, AsyncSessionLocal() as releaser:
+            await add_image(writer, stored, data)
+            # Ссылка ещё не закоммичена - release_blob ждёт блокировки ключа, а не удаляет файл
+            release = asyncio.ensure_future(release_blob(releaser, stored.key))
+            await asyncio.sleep(0.3)
+            blocked = not release.done()
+            await writer.commit()
+            await release
+        return stored.key, blocked
+
+    key, blocked = client.portal.call(scenario)
+    assert blocked
+    assert store.exists(key)
+
+
+def test_claim_restores_blob_released_before_reference(client):
+    from app.db.database import AsyncSessionLocal
+    from app.models import DefectImage
+    from app.services.storage import get_blob_store, release_blob
+
+    store = get_blob_store()
+    data = unique_bytes()
+
+    async def scenario():
+        # Файл уже был, поэтому put его не записывал; до вставки ссылки release_blob успел его удалить
+        stored = store.put(data)
+        async with AsyncSessionLocal() as releaser:
+            await release_blob(releaser, stored.key)
+        assert not store.exists(stored.key)
+        async with AsyncSessionLocal() as writer:
+            image = await add_image(writer, stored, data)
+            await writer.commit()
+            image_id = image.id
+        async with AsyncSessionLocal() as db:
+            return await db.get(DefectImage, image_id), stored.key
+
+    image, key = client.portal.call(scenario)
+    assert image.storage_key == key
+    assert store.read(key) == data
+
+
+def test_release_deletes_unreferenced_blob(client):
+    from app.db.database import AsyncSessionLocal
+    from app.services.storage import get_blob_store, release_blob
+
+    store = get_blob_store()
+    stored = store.put(unique_bytes())
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await release_blob(db, stored.key)
+
+    client.portal.call(scenario)
+    assert not store.exists(stored.key)
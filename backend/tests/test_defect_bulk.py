@@ -0,0 +1,71 @@
+"""Массовое изменение дефектов (POST /api/v1/defects/bulk): права инженера и результат по каждому дефекту."""
+from tests.conftest import auth_headers
+
+# user12 - инженер проекта 13; дефекты 2011 и 3011 - открытые дефекты проекта 13 (объект 12),
+# 4242 - дефект проекта 44, 9 - дефект проекта 11 менеджера client.manager
+ENGINEER_ID = 12
+OBJECT_ID = 12
+OPEN_DEFECTS = [2011, 3011]
+OTHER_PROJECT_DEFECT = 4242
+MANAGER_DEFECT = 9
+
+
+def bulk(client, headers, defect_ids, **changes):
+    return client.post("/api/v1/defects/bulk", json={"defect_ids": defect_ids, "changes": changes}, headers=headers)
+
+
+def results(response) -> dict:
+    return {item["id"]: (item["result"], item["changed_fields"]) for item in response.json()["items"]}
+
+
+def defect(client, defect_id: int) -> dict:
+    return client.get(f"/api/v1/defects/{defect_id}", headers=client.manager).json()
+
+
+def test_engineer_changes_only_status(client):
+    headers = auth_headers(ENGINEER_ID)
+    priorities = {defect_id: defect(client, defect_id)["priority"] for defect_id in OPEN_DEFECTS}
+
+    response = bulk(client, headers, OPEN_DEFECTS + [OTHER_PROJECT_DEFECT, 999999], status="IN_PROGRESS",
+                    priority="LOW", due_date="2030-01-01", assigned_user_ids=[ENGINEER_ID])
+    assert response.status_code == 200
+    assert response.json()["updated"] == 2
+    assert results(response) == {
+        OPEN_DEFECTS[0]: ("updated", ["status"]),
+        OPEN_DEFECTS[1]: ("updated", ["status"]),
+        OTHER_PROJECT_DEFECT: ("forbidden", []),
+        999999: ("not_found", []),
+    }
+    for defect_id in OPEN_DEFECTS:
+        current = defect(client, defect_id)
+        # Приоритет, срок и назначения инженер не меняет - они молча отброшены
+        assert current["status"] == "IN_PROGRESS" and current["priority"] == priorities[defect_id]
+        assert current["due_date"] != "2030-01-01"
+
+    again = bulk(client, headers, OPEN_DEFECTS, status="IN_PROGRESS")
+    assert again.json()["updated"] == 0
+    assert {result for result, _ in results(again).values()} == {"unchanged"}
+
+
+def test_engineer_status_restrictions(client):
+    headers = auth_headers(ENGINEER_ID)
+    assert bulk(client, headers, OPEN_DEFECTS, status="CLOSED").status_code == 403
+
+    # Новый дефект инженер не переводит в работу - его сначала разбирает менеджер
+    created = client.post("/api/v1/defects/", headers=headers, data={"title": "Новый дефект", "object_id": OBJECT_ID})
+    new_id = created.json()["id"]
+    response = bulk(client, headers, [new_id, OPEN_DEFECTS[0]], status="UNDER_REVIEW")
+    assert results(response) == {new_id: ("forbidden", []), OPEN_DEFECTS[0]: ("updated", ["status"])}
+    assert defect(client, new_id)["status"] == "NEW"
+
+
+def test_manager_outside_project_is_forbidden(client):
+    response = bulk(client, client.manager, [MANAGER_DEFECT, OPEN_DEFECTS[0]], priority="HIGH", assigned_user_ids=[ENGINEER_ID])
+    assert response.status_code == 200
+    items = results(response)
+    assert items[OPEN_DEFECTS[0]] == ("forbidden", [])
+    assert items[MANAGER_DEFECT][0] in ("updated", "unchanged")
+    # Назначить можно только инженеров проекта дефекта: user12 в проекте 11 не состоит
+    assert ENGINEER_ID not in defect(client, MANAGER_DEFECT)["assigned_user_ids"]
+
+    assert bulk(client, client.observer, [MANAGER_DEFECT], priority="LOW").status_code == 403
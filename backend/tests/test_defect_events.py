@@ -0,0 +1,79 @@
+"""Лента изменений (app.services.defect_events): дочитывание пропущенного после переподключения.
+
+Бесконечный поток SSE через TestClient не прочитать, поэтому генератор потока проверяется
+напрямую - в цикле событий приложения (client.portal).
+"""
+import json
+
+DEFECT_ID = 4242
+
+
+async def read_replay(stream) -> tuple:
+    """События, которые поток отдал при подключении, и граница после них."""
+    events = []
+    assert (await stream.__anext__()).startswith("retry:")
+    async for chunk in stream:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+        if "data" not in fields:
+            return events, int(fields["id"])
+        events.append(json.loads(fields["data"]))
+    raise AssertionError("Поток закончился до границы")
+
+
+def test_resume_returns_events_committed_out_of_order(client):
+    from app.db.database import AsyncSessionLocal
+    from app.services.defect_events import event_stream, publish
+
+    async def scenario():
+        async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+            # Первая транзакция получает меньший id, но коммитится последней
+            await publish(first, "test.first", project_id=1, defect_id=DEFECT_ID)
+            await publish(second, "test.second", project_id=1, defect_id=DEFECT_ID)
+            await second.commit()
+
+            # Клиент подключился, когда вторая транзакция уже видна, а первая ещё нет
+            stream = event_stream(None, defect_id=DEFECT_ID)
+            _, horizon = await read_replay(stream)
+            await stream.aclose()
+            await first.commit()
+
+        stream = event_stream(horizon, defect_id=DEFECT_ID)
+        events, _ = await read_replay(stream)
+        await stream.aclose()
+        return events
+
+    events = client.portal.call(scenario)
+    kinds = [event["kind"] for event in events]
+    assert "test.first" in kinds and "test.second" in kinds
+    first = next(event for event in events if event["kind"] == "test.first")
+    second = next(event for event in events if event["kind"] == "test.second")
+    assert first["id"] < second["id"]
+
+
+def test_resume_after_last_event_id(client):
+    from app.db.database import AsyncSessionLocal
+    from app.services.defect_events import event_stream, publish
+
+    async def scenario():
+        stream = event_stream(None, defect_id=DEFECT_ID)
+        _, start = await read_replay(stream)
+        await stream.aclose()
+
+        async with AsyncSessionLocal() as db:
+            await publish(db, "test.missed", project_id=1, defect_id=DEFECT_ID)
+            await publish(db, "test.other_defect", project_id=1, defect_id=DEFECT_ID + 1)
+            await db.commit()
+
+        stream = event_stream(start, defect_id=DEFECT_ID)
+        missed, horizon = await read_replay(stream)
+        await stream.aclose()
+
+        stream = event_stream(horizon, defect_id=DEFECT_ID)
+        again, _ = await read_replay(stream)
+        await stream.aclose()
+        return missed, again
+
+    missed, again = client.portal.call(scenario)
+    assert [event["kind"] for event in missed] == ["test.missed"]
+    # После полученной границы дочитывать нечего
+    assert again == []
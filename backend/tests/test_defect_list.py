@@ -0,0 +1,12 @@
+"""Старый список /api/v1/defects/ собирается в обход response_model - формат должен совпадать с DefectResponse."""
+
+
+def test_defect_list_matches_response_model(client):
+    from app.schemas.defect import DefectResponse
+
+    response = client.get("/api/v1/defects/?object_id=60", headers=client.manager)
+    assert response.status_code == 200
+    defects = response.json()
+    assert defects and any(defect["comments"] for defect in defects) and any(defect["history"] for defect in defects)
+    for defect in defects:
+        assert DefectResponse.model_validate(defect).model_dump(mode="json") == defect
@@ -0,0 +1,109 @@
+"""Поиск дефектов (GET /api/v1/defects/search): префиксы, поиск по подстроке, страницы и права."""
+import uuid
+
+import pytest
+
+from tests.conftest import auth_headers
+
+# Проект менеджера client.manager; user12 - инженер другого проекта
+PROJECT_ID = 11
+ENGINEER_ID = 12
+
+
+def create_object(client) -> int:
+    name = f"Корпус {uuid.uuid4().hex[:8]}"
+    return client.post("/api/v1/objects/", json={"name": name, "project_id": PROJECT_ID}, headers=client.manager).json()["id"]
+
+
+def create_defect(client, object_id: int, title: str, description: str = "") -> int:
+    response = client.post("/api/v1/defects/", headers=client.manager,
+                           data={"title": title, "description": description, "object_id": object_id})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def search(client, q: str, object_id: int = None, headers=None, **params) -> dict:
+    if object_id:
+        params["object_id"] = object_id
+    response = client.get("/api/v1/defects/search", params={"q": q, **params}, headers=headers or client.manager)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def ids(page: dict) -> list:
+    return [item["id"] for item in page["items"]]
+
+
+def test_prefix_and_word_forms(client):
+    object_id = create_object(client)
+    crack = create_defect(client, object_id, "Трещина в несущей стене", "Ширина раскрытия до 2 мм")
+    leak = create_defect(client, object_id, "Протечка кровли <над входом>")
+
+    # Последнее слово - префикс: результаты появляются по мере набора
+    page = search(client, "несущ", object_id)
+    assert page["match"] == "fulltext" and ids(page) == [crack]
+    assert "<mark>" in page["items"][0]["title_highlight"]
+    # Другая форма слова находится за счёт русской морфологии
+    assert ids(search(client, "трещины стены", object_id)) == [crack]
+    assert ids(search(client, "раскрытие", object_id)) == [crack]
+    assert "<mark>" in search(client, "раскрытие", object_id)["items"][0]["description_highlight"]
+    # Все слова обязательны
+    assert search(client, "трещина кровли", object_id)["items"] == []
+
+    hit = search(client, "протечка", object_id)["items"][0]
+    assert hit["id"] == leak
+    # Текст экранируется, разметка остаётся только у совпадений
+    assert "&lt;над входом&gt;" in hit["title_highlight"] and "<mark>" in hit["title_highlight"]
+
+
+def test_comments_and_object_kept_current(client):
+    object_id = create_object(client)
+    defect_id = create_defect(client, object_id, "Отслоение штукатурки")
+    word = "Высолы"
+
+    assert search(client, word, object_id)["items"] == []
+    client.post(f"/api/v1/defects/{defect_id}/comments", json={"content": f"{word} на цоколе после дождей"}, headers=client.manager)
+    hit = search(client, word, object_id)["items"][0]
+    assert hit["id"] == defect_id and "<mark>" in hit["comment_highlight"]
+
+    client.put(f"/api/v1/objects/{object_id}", json={"name": "Паркинг", "address": "Набережная, 7"}, headers=client.manager)
+    assert ids(search(client, "паркинг набережная", object_id)) == [defect_id]
+
+
+def test_substring_fallback(client):
+    object_id = create_object(client)
+    defect_id = create_defect(client, object_id, "Гидроизоляция фундамента")
+
+    # Середина слова не находится по словам - ищем подстроку в названии
+    page = search(client, "изоляци", object_id)
+    assert page["match"] == "substring" and ids(page) == [defect_id]
+    assert page["items"][0]["title_highlight"] == "Гидро<mark>изоляци</mark>я фундамента"
+    # Слишком короткую подстроку не ищем
+    assert search(client, "ол", object_id) == {"items": [], "next_cursor": None, "match": "substring"}
+
+
+@pytest.mark.parametrize("q", ["коррозия", "оррози"])
+def test_cursor_paging(client, q):
+    object_id = create_object(client)
+    created = {create_defect(client, object_id, f"Коррозия арматуры {number}") for number in range(5)}
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = search(client, q, object_id, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += ids(page)
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) and set(seen) == created
+
+
+def test_search_is_scoped_to_user_projects(client):
+    object_id = create_object(client)
+    defect_id = create_defect(client, object_id, "Скол облицовки")
+
+    assert ids(search(client, "облицовки", headers=auth_headers(ENGINEER_ID))) == []
+    assert defect_id in ids(search(client, "облицовки", headers=client.observer))
+    response = client.get("/api/v1/defects/search", params={"q": "скол", "cursor": "нет"}, headers=client.manager)
+    assert response.status_code == 400
@@ -0,0 +1,80 @@
+"""Суточная статистика (defect_daily_stats): счётчики, которые ведут обработчики записи, совпадают с пересчётом.
+
+История сидовых дефектов не согласована с их статусами, поэтому проверки идут на новом объекте
+с дефектами, созданными через API.
+"""
+from tests.conftest import auth_headers
+
+# user20 - менеджер проекта 21
+PROJECT_ID = 21
+MANAGER_ID = 20
+
+ROLLUP_SQL = """
+SELECT day, status::text, priority::text, created, entered, reprioritized
+FROM defect_daily_stats WHERE object_id = :object_id
+ORDER BY day, status, priority
+"""
+
+
+def rollup(engine, object_id: int, rebuild: bool = False) -> list:
+    import sqlalchemy as sa
+    from app.services.defect_stats import backfill
+
+    with engine.begin() as conn:
+        if rebuild:
+            backfill(conn)
+        return [tuple(row) for row in conn.execute(sa.text(ROLLUP_SQL), {"object_id": object_id})]
+
+
+def create_defects(client, headers, count: int) -> tuple:
+    object_id = client.post("/api/v1/objects/", json={"name": "Объект статистики", "project_id": PROJECT_ID}, headers=headers).json()["id"]
+    defect_ids = []
+    for number in range(count):
+        response = client.post("/api/v1/defects/", headers=headers, data={"title": f"Дефект {number}", "object_id": object_id, "priority": "HIGH"})
+        assert response.status_code == 200
+        defect_ids.append(response.json()["id"])
+    return object_id, defect_ids
+
+
+def test_rollup_matches_recount_after_changes(client, db_engine):
+    headers = auth_headers(MANAGER_ID)
+    object_id, (closed, reprioritized, both, *bulk) = create_defects(client, headers, 5)
+
+    # Статус, только приоритет, статус вместе с приоритетом и массовое изменение
+    assert client.put(f"/api/v1/defects/{closed}", json={"status": "CLOSED"}, headers=headers).status_code == 200
+    assert client.put(f"/api/v1/defects/{reprioritized}", json={"priority": "CRITICAL"}, headers=headers).status_code == 200
+    assert client.put(f"/api/v1/defects/{both}", json={"status": "IN_PROGRESS", "priority": "LOW"}, headers=headers).status_code == 200
+    response = client.post("/api/v1/defects/bulk", headers=headers, json={
+        "defect_ids": bulk, "changes": {"status": "CLOSED", "priority": "CRITICAL"},
+    })
+    assert response.status_code == 200
+
+    incremental = rollup(db_engine, object_id)
+    assert incremental == rollup(db_engine, object_id, rebuild=True)
+    # Смена приоритета учтена отдельно от переходов в статус
+    assert sum(row[5] for row in incremental) == 4
+    assert sum(row[4] for row in incremental if row[1] == "CLOSED") == 3
+
+
+def test_resolved_matches_raw_count(client, db_scalar):
+    headers = auth_headers(MANAGER_ID)
+    object_id, defect_ids = create_defects(client, headers, 3)
+    for defect_id in defect_ids[:2]:
+        assert client.put(f"/api/v1/defects/{defect_id}", json={"status": "CLOSED"}, headers=headers).status_code == 200
+    # Переоткрытый и снова закрытый дефект закрыт дважды
+    assert client.put(f"/api/v1/defects/{defect_ids[0]}", json={"status": "OPEN"}, headers=headers).status_code == 200
+    assert client.put(f"/api/v1/defects/{defect_ids[0]}", json={"status": "CLOSED"}, headers=headers).status_code == 200
+
+    # Дата БД, а не сервера приложения: по ней же считает пересчёт
+    today = db_scalar("SELECT current_date")
+    closed_today = db_scalar("""
+        SELECT count(*) FROM defect_history h JOIN defects d ON d.id = h.defect_id
+        WHERE d.object_id = :object_id AND h.field_name = 'status'
+            AND h.new_value IN ('CLOSED', 'DefectStatus.CLOSED') AND h.created_at::date = current_date
+    """, object_id=object_id)
+
+    stats = client.get("/api/v1/defects/stats", headers=headers, params={
+        "date_from": today.isoformat(), "date_to": today.isoformat(), "project_id": PROJECT_ID, "object_id": object_id,
+    }).json()
+    assert closed_today == 3
+    assert stats == [{"date": today.isoformat(), "created": 3, "resolved": closed_today}]
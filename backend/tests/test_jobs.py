@@ -0,0 +1,184 @@
+"""Очередь фоновых задач (app.services.jobs): выбор задачи, повторы и возврат брошенных задач в очередь."""
+import asyncio
+from datetime import timedelta
+
+async def add_jobs(kind: str, count: int, **values) -> list:
+    from sqlalchemy import insert
+    from app.db.database import AsyncSessionLocal
+    from app.models import Job, JobStatus
+
+    rows = [dict({"kind": kind, "payload": {}, "status": JobStatus.QUEUED, "priority": 0, "attempts": 0,
+                  "max_attempts": 3}, **values) for _ in range(count)]
+    async with AsyncSessionLocal() as db:
+        ids = (await db.execute(insert(Job).values(rows).returning(Job.id))).scalars().all()
+        await db.commit()
+    return list(ids)
+
+
+async def get_job(job_id: int):
+    from app.db.database import AsyncSessionLocal
+    from app.models import Job
+
+    async with AsyncSessionLocal() as db:
+        return await db.get(Job, job_id)
+
+
+def test_claim_skips_locked_jobs(client):
+    from sqlalchemy import select
+    from app.db.database import AsyncSessionLocal
+    from app.models import Job, JobStatus
+    from app.services.jobs import JobRunner
+
+    async def scenario():
+        first, second = await add_jobs("test.claim", 2)
+        async with AsyncSessionLocal() as other_worker:
+            # Первую задачу прямо сейчас забирает другой воркер
+            await other_worker.execute(select(Job).where(Job.id == first).with_for_update())
+            claimed = await JobRunner(name="test").claim(["test.claim"])
+            await other_worker.rollback()
+        return first, second, claimed
+
+    first, second, claimed = client.portal.call(scenario)
+    assert claimed.id == second
+    assert claimed.status == JobStatus.RUNNING
+    assert claimed.attempts == 1
+    assert claimed.locked_by == "test" and claimed.locked_at is not None
+    assert client.portal.call(get_job, first).status == JobStatus.QUEUED
+
+
+def test_claim_ignores_future_and_other_kinds(client):
+    from sqlalchemy import func
+    from app.services.jobs import JobRunner
+
+    async def scenario():
+        await add_jobs("test.future", 1, run_at=func.now() + timedelta(hours=1))
+        runner = JobRunner(name="test")
+        return await runner.claim(["test.future"]), await runner.claim(["test.nothing"])
+
+    assert client.portal.call(scenario) == (None, None)
+
+
+def test_retry_delay_doubles_up_to_an_hour(client, monkeypatch):
+    from app.core.config import settings
+    from app.services.jobs import retry_delay
+
+    monkeypatch.setattr(settings, "JOB_RETRY_DELAY", 10)
+    assert [retry_delay(attempts).total_seconds() for attempts in (1, 2, 3, 4)] == [10, 20, 40, 80]
+    assert retry_delay(20) == timedelta(hours=1)
+
+
+def test_failed_attempt_is_retried_with_backoff_then_failed(client):
+    from sqlalchemy import func, select, update
+    from app.db.database import AsyncSessionLocal
+    from app.models import Job, JobStatus
+    from app.services.jobs import JobRunner, retry_delay
+
+    async def scenario():
+        job_id, = await add_jobs("test.fail", 1, max_attempts=2)
+        runner = JobRunner(name="test")
+        job = await runner.claim(["test.fail"])
+        await runner.fail(job, "first")
+        retried = await get_job(job_id)
+        async with AsyncSessionLocal() as db:
+            now = await db.scalar(select(func.now()))
+
+        # Повтор ещё не наступил - задача не забирается
+        early = await runner.claim(["test.fail"])
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(run_at=func.now()))
+            await db.commit()
+        job = await runner.claim(["test.fail"])
+        await runner.fail(job, "second")
+        return retried, now.replace(tzinfo=None), early, await get_job(job_id)
+
+    retried, now, early, failed = client.portal.call(scenario)
+    assert retried.status == JobStatus.QUEUED and retried.error == "first"
+    assert retried.locked_at is None and retried.locked_by is None
+    delay = (retried.run_at - now).total_seconds()
+    assert abs(delay - retry_delay(1).total_seconds()) < 5
+    assert early is None
+    assert failed.status == JobStatus.FAILED and failed.error == "second" and failed.attempts == 2
+    assert failed.finished_at is not None
+
+
+def test_maintenance_requeues_only_stale_jobs(client):
+    from sqlalchemy import func
+    from app.core.config import settings
+    from app.models import JobStatus
+    from app.services.jobs import JobRunner
+
+    async def scenario():
+        lock_timeout = timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        running = dict(status=JobStatus.RUNNING, attempts=1, locked_by="gone")
+        stale, = await add_jobs("test.stale", 1, locked_at=func.now() - lock_timeout - timedelta(seconds=5), **running)
+        exhausted, = await add_jobs("test.stale", 1, locked_at=func.now() - lock_timeout - timedelta(seconds=5),
+                                    **dict(running, attempts=3))
+        alive, = await add_jobs("test.stale", 1, locked_at=func.now() - lock_timeout + timedelta(seconds=30), **running)
+        await JobRunner(name="test").maintenance()
+        return await get_job(stale), await get_job(exhausted), await get_job(alive)
+
+    stale, exhausted, alive = client.portal.call(scenario)
+    assert stale.status == JobStatus.QUEUED and stale.locked_by is None
+    assert exhausted.status == JobStatus.FAILED
+    assert alive.status == JobStatus.RUNNING and alive.locked_by == "gone"
+
+
+def test_heartbeat_keeps_long_job_claimed(client, monkeypatch):
+    from app.core.config import settings
+    from app.models import JobStatus
+    from app.services.jobs import JobHandler, JobRunner
+
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_INTERVAL", 0.2)
+    monkeypatch.setattr(settings, "JOB_LOCK_TIMEOUT", 1)
+
+    async def scenario():
+        job_id, = await add_jobs("test.long", 1)
+        runner = JobRunner(name="test")
+        release = asyncio.Event()
+
+        async def handler(db, job):
+            await release.wait()
+            return {"done": True}
+
+        job = await runner.claim(["test.long"])
+        runner._running[job.kind] = 1
+        task = asyncio.ensure_future(runner.execute(JobHandler(handler, 1), job))
+        # Обработчик работает дольше JOB_LOCK_TIMEOUT, но задача не считается брошенной
+        await asyncio.sleep(2)
+        await runner.maintenance()
+        during = await get_job(job_id)
+        release.set()
+        await task
+        return during, await get_job(job_id)
+
+    during, finished = client.portal.call(scenario)
+    assert during.status == JobStatus.RUNNING and during.attempts == 1
+    assert finished.status == JobStatus.SUCCEEDED and finished.result == {"done": True}
+
+
+def test_requeued_attempt_does_not_overwrite_new_claim(client):
+    from sqlalchemy import update
+    from app.db.database import AsyncSessionLocal
+    from app.models import Job, JobStatus
+    from app.services.jobs import JobHandler, JobRunner
+
+    async def scenario():
+        job_id, = await add_jobs("test.requeued", 1)
+        runner = JobRunner(name="test")
+        job = await runner.claim(["test.requeued"])
+        # Пока обработчик работал, задачу вернули в очередь и забрали снова
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(status=JobStatus.QUEUED))
+            await db.commit()
+        again = await runner.claim(["test.requeued"])
+
+        async def handler(db, job):
+            return {"stale": True}
+
+        runner._running[job.kind] = 1
+        await runner.execute(JobHandler(handler, 1), job)
+        return again, await get_job(job_id)
+
+    again, current = client.portal.call(scenario)
+    assert again.attempts == 2
+    assert current.status == JobStatus.RUNNING and current.attempts == 2 and current.result is None
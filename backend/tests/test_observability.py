@@ -0,0 +1,85 @@
+"""Метрики и трассировка запросов (app.services.observability): ряды /metrics и X-Request-ID."""
+import pytest
+
+DEFECT_ROUTE = "/api/v1/defects/{defect_id}"
+
+
+def scrape(client) -> dict:
+    """Сэмплы /metrics: (имя, метки) -> значение."""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def value(samples: dict, name: str, **labels) -> float:
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def test_request_series(client):
+    before = scrape(client)
+    for _ in range(2):
+        assert client.get("/api/v1/defects/59", headers=client.manager).status_code == 200
+    assert client.get("/api/v1/defects/999999", headers=client.manager).status_code == 404
+    after = scrape(client)
+
+    # Метка route - шаблон пути, а не сам путь: число рядов не растёт с числом дефектов
+    ok = dict(method="GET", route=DEFECT_ROUTE, status="200")
+    assert value(after, "http_requests_total", **ok) - value(before, "http_requests_total", **ok) == 2
+    missing = dict(method="GET", route=DEFECT_ROUTE, status="404")
+    assert value(after, "http_requests_total", **missing) - value(before, "http_requests_total", **missing) == 1
+    route = dict(method="GET", route=DEFECT_ROUTE)
+    assert value(after, "http_request_duration_seconds_count", **route) - value(before, "http_request_duration_seconds_count", **route) == 3
+    assert value(after, "http_response_size_bytes_sum", **route) > value(before, "http_response_size_bytes_sum", **route)
+    assert value(after, "http_request_db_queries_sum", **route) > value(before, "http_request_db_queries_sum", **route)
+    assert value(after, "http_request_db_seconds_sum", **route) > value(before, "http_request_db_seconds_sum", **route)
+    assert ("http_requests_in_progress", (("method", "GET"),)) in after
+
+
+def test_unmatched_paths_share_one_series(client):
+    for path in ("/no-such-page-1", "/no-such-page-2"):
+        assert client.get(path).status_code == 404
+    samples = scrape(client)
+    assert value(samples, "http_requests_total", method="GET", route="unmatched", status="404") >= 2
+    assert not any("no-such-page" in str(labels) for _, labels in samples)
+
+
+def test_pool_series(client):
+    client.get("/api/v1/defects/59", headers=client.manager)
+    samples = scrape(client)
+    checkouts = value(samples, "db_pool_wait_seconds_count")
+    assert checkouts > 0
+    assert value(samples, "db_pool_wait_seconds_bucket", le="+Inf") == checkouts
+    assert ("db_pool_timeouts", ()) in samples
+    assert value(samples, "db_pool_size") > 0
+    assert ("db_pool_checked_out", ()) in samples
+
+    snapshot = client.get("/metrics/db-pool").json()
+    assert snapshot["checkouts"] >= checkouts and snapshot["timeouts"] >= 0
+
+
+def test_failed_statement_leaves_no_timing_state(client):
+    import sqlalchemy as sa
+    from app.services.observability import instrument_engine
+
+    engine = sa.create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(sa.exc.OperationalError):
+                conn.execute(sa.text("SELECT * FROM no_such_table"))
+        assert conn.execute(sa.text("SELECT 1")).scalar() == 1
+        assert not any(isinstance(value, list) for value in conn.info.values())
+    engine.dispose()
+
+def test_request_id(client):
+    response = client.get("/", headers={"X-Request-ID": "trace-42"})
+    assert response.headers["X-Request-ID"] == "trace-42"
+    generated = client.get("/").headers["X-Request-ID"]
+    assert len(generated) == 32 and generated != client.get("/").headers["X-Request-ID"]
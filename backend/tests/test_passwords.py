@@ -0,0 +1,53 @@
+"""Хеширование паролей (app.services.passwords): ограничение очереди и пересчёт устаревших хешей при входе."""
+
+PASSWORD = "Secret123"
+
+
+STORED_HASH = "SELECT password FROM users WHERE id = :id"
+
+
+def test_needs_rehash(client, monkeypatch):
+    import bcrypt
+    from app.core.config import settings
+    from app.services.passwords import needs_rehash
+
+    monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 5)
+    assert not needs_rehash(bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=5)).decode())
+    assert needs_rehash(bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=4)).decode())
+    assert needs_rehash("$argon2id$v=19$m=65536,t=3,p=4$c2FsdA$aGFzaA")
+    assert needs_rehash("x")
+
+
+def test_saturated_hasher_returns_429(client, monkeypatch):
+    from app.core.config import settings
+    from app.services import passwords
+
+    # Все процессы пула заняты и очередь заполнена
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_LIMIT", 0)
+    monkeypatch.setattr(passwords, "_in_flight", passwords._workers())
+    response = client.post("/auth", json={"nickname": "user12", "password": PASSWORD})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    monkeypatch.setattr(passwords, "_in_flight", 0)
+    assert client.post("/auth", json={"nickname": "user12", "password": PASSWORD}).status_code != 429
+
+
+def test_login_rehashes_outdated_hash(client, db_scalar, db_execute):
+    import bcrypt
+    from app.core.config import settings
+
+    db_execute("UPDATE users SET password = :hashed WHERE id = :id", id=12,
+               hashed=bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode())
+    assert client.post("/auth", json={"nickname": "user12", "password": "Wrong12345"}).status_code == 401
+    assert db_scalar(STORED_HASH, id=12).startswith("$2b$04$")
+
+    response = client.post("/auth", json={"nickname": "user12", "password": PASSWORD})
+    assert response.status_code == 200 and response.json()["access_token"]
+    rehashed = db_scalar(STORED_HASH, id=12)
+    assert rehashed.startswith(f"$2b${settings.PASSWORD_BCRYPT_ROUNDS:02d}$")
+    assert bcrypt.checkpw(PASSWORD.encode(), rehashed.encode())
+
+    # Хеш уже с текущими настройками - повторный вход его не трогает
+    assert client.post("/auth", json={"nickname": "user12", "password": PASSWORD}).status_code == 200
+    assert db_scalar(STORED_HASH, id=12) == rehashed
@@ -0,0 +1,47 @@
+"""Пользователь запроса (app.services.principals): кэш прав не переживает изменения участников проекта."""
+from tests.conftest import auth_headers
+
+# Инженер вне сида, участник проекта 13
+USER_ID = 5002
+PROJECT_ID = 13
+
+
+def test_membership_changes_apply_immediately(client, db_execute):
+    db_execute("INSERT INTO users (id, nickname, password, role) VALUES (:id, :nickname, 'x', 'ENGINEER')",
+            id=USER_ID, nickname=f"user{USER_ID}")
+    db_execute("INSERT INTO project_users (user_id, project_id) VALUES (:id, :project_id)", id=USER_ID, project_id=PROJECT_ID)
+    headers = auth_headers(USER_ID)
+    # Первый запрос кладёт пользователя с его проектами в кэш
+    assert client.get(f"/projects/{PROJECT_ID}", headers=headers).status_code == 200
+
+    assert client.delete(f"/api/v1/projects/{PROJECT_ID}/users/{USER_ID}", headers=client.manager).status_code == 200
+    assert client.get(f"/projects/{PROJECT_ID}", headers=headers).status_code == 403
+
+    assert client.post(f"/api/v1/projects/{PROJECT_ID}/users/{USER_ID}", headers=client.manager).status_code == 200
+    assert client.get(f"/projects/{PROJECT_ID}", headers=headers).status_code == 200
+
+    assert client.delete(f"/api/v1/users/{USER_ID}", headers=client.manager).status_code == 200
+    assert client.get(f"/projects/{PROJECT_ID}", headers=headers).status_code == 404
+
+    # Новый пользователь с тем же ником: токен удалённого к нему не подходит (uid в токене другой)
+    db_execute("INSERT INTO users (id, nickname, password, role) VALUES (:id, :nickname, 'x', 'ENGINEER')",
+            id=USER_ID + 1, nickname=f"user{USER_ID}")
+    db_execute("INSERT INTO project_users (user_id, project_id) VALUES (:id, :project_id)", id=USER_ID + 1, project_id=PROJECT_ID)
+    assert client.get(f"/projects/{PROJECT_ID}", headers=headers).status_code == 404
+
+
+def test_cache_is_bounded_and_expires(client, monkeypatch):
+    from app.models.user import RoleEnum
+    from app.services import principals
+    from app.services.principals import Principal, PrincipalCache
+
+    now = [100.0]
+    monkeypatch.setattr(principals.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(max_size=2, ttl=10)
+    for user_id in (1, 2, 3):
+        cache.put(f"user{user_id}", Principal(user_id, f"user{user_id}", RoleEnum.ENGINEER, frozenset()))
+    # Самая давняя запись вытеснена
+    assert cache.get("user1") is None and cache.get("user2").id == 2
+
+    now[0] += 11
+    assert cache.get("user2") is None and cache.get("user3") is None
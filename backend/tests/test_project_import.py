@@ -0,0 +1,107 @@
+"""Импорт объектов и дефектов из CSV/XLSX (POST /api/v1/projects/{id}/import): отчёт по строкам и dry_run."""
+import io
+import uuid
+from datetime import datetime
+
+# Проект менеджера client.manager; проект 13 - чужой
+PROJECT_ID = 11
+OTHER_PROJECT_ID = 13
+
+
+def import_file(client, kind: str, filename: str, content: bytes, dry_run: bool = False, project_id: int = PROJECT_ID):
+    return client.post(
+        f"/api/v1/projects/{project_id}/import",
+        params={"kind": kind, "dry_run": str(dry_run).lower()},
+        files={"file": (filename, content)},
+        headers=client.manager,
+    )
+
+
+def errors(response) -> list:
+    return [(error["row"], error["column"]) for error in response.json()["errors"]]
+
+
+def create_object(client) -> str:
+    name = f"Корпус {uuid.uuid4().hex[:8]}"
+    content = f"name,address\n{name},ул. Строителей, 1\n".encode()
+    assert import_file(client, "objects", "objects.csv", content).json()["imported"] == 1
+    return name
+
+
+def test_objects_csv_with_errors(client, db_scalar):
+    name = f"Корпус {uuid.uuid4().hex[:8]}"
+    # Excel с русской локалью: BOM и ";" в качестве разделителя
+    content = f"Name;Address;Description\n{name};ул. Ленина, 1;\n;без имени;\n\n{name}-2;;{'x' * 10}\n".encode("utf-8-sig")
+    response = import_file(client, "objects", "objects.csv", content)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["total_rows"], result["imported"], result["error_count"]) == (3, 2, 1)
+    assert errors(response) == [(3, "name")]
+    assert db_scalar("SELECT count(*) FROM objects WHERE project_id = :project_id AND name LIKE :name",
+                     project_id=PROJECT_ID, name=f"{name}%") == 2
+
+
+def test_defects_dry_run_then_import(client, db_scalar, monkeypatch):
+    from app.services import project_import
+
+    # Пачки по две строки: номера строк в отчёте не должны сбиваться на границах пачек
+    monkeypatch.setattr(project_import, "IMPORT_BATCH_SIZE", 2)
+    object_name = create_object(client)
+    title = f"Импорт {uuid.uuid4().hex[:8]}"
+    content = (
+        "title,object_name,priority,status,due_date\n"
+        f"{title} 1,{object_name},high,open,2030-01-15\n"
+        f"{title} 2,{object_name},urgent,,\n"
+        f"{title} 3,Нет такого объекта,,,\n"
+        f",{object_name},,,\n"
+        f"{title} 5,{object_name},,,15.01.2030\n"
+        f"{title} 6,{object_name.upper()},low,,\n"
+    ).encode()
+    count = "SELECT count(*) FROM defects WHERE title LIKE :title"
+
+    dry_run = import_file(client, "defects", "defects.csv", content, dry_run=True)
+    assert dry_run.status_code == 200
+    result = dry_run.json()
+    assert result["dry_run"] and (result["total_rows"], result["imported"], result["error_count"]) == (6, 2, 4)
+    assert errors(dry_run) == [(3, "priority"), (4, "object_name"), (5, "title"), (6, "due_date")]
+    assert db_scalar(count, title=f"{title}%") == 0
+
+    response = import_file(client, "defects", "defects.csv", content)
+    assert response.json()["imported"] == 2 and errors(response) == errors(dry_run)
+    assert db_scalar(count, title=f"{title}%") == 2
+    assert db_scalar("SELECT status::text || ' ' || priority::text || ' ' || due_date FROM defects WHERE title = :title",
+                     title=f"{title} 1") == "OPEN HIGH 2030-01-15"
+    # У каждого импортированного дефекта есть запись истории о создании
+    assert db_scalar("""
+        SELECT count(*) FROM defect_history h JOIN defects d ON d.id = h.defect_id
+        WHERE d.title LIKE :title AND h.field_name = 'created'
+    """, title=f"{title}%") == 2
+
+
+def test_defects_xlsx(client, db_scalar):
+    import openpyxl
+
+    object_id = db_scalar("SELECT min(id) FROM objects WHERE project_id = :project_id", project_id=PROJECT_ID)
+    title = f"Из Excel {uuid.uuid4().hex[:8]}"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["title", "object_id", "due_date", "assigned_user_ids"])
+    # Excel хранит числа как float, а даты - как datetime
+    sheet.append([title, float(object_id), datetime(2030, 2, 1), None])
+    sheet.append([f"{title} чужой", 12, None, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    response = import_file(client, "defects", "defects.xlsx", buffer.getvalue())
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert errors(response) == [(3, "object_id")]
+    assert str(db_scalar("SELECT due_date FROM defects WHERE title = :title", title=title)) == "2030-02-01"
+
+
+def test_rejected_files(client):
+    assert import_file(client, "objects", "objects.txt", b"name\nx\n").status_code == 400
+    assert import_file(client, "defects", "defects.csv", b"name,object_id\nx,1\n").status_code == 400
+    assert import_file(client, "defects", "defects.csv", b"").status_code == 400
+    assert import_file(client, "objects", "objects.xlsx", b"not a workbook").status_code == 400
+    assert import_file(client, "objects", "objects.csv", b"name\nx\n", project_id=OTHER_PROJECT_ID).status_code == 403
@@ -0,0 +1,61 @@
+"""Бюджет запросов к БД для основных эндпоинтов на заполненной базе (фикстура client, tests/conftest.py).
+
+Бюджет - сколько запросов эндпоинт делает сейчас. Если изменение его превышает, скорее всего появилась
+ленивая загрузка в цикле (N+1); если бюджет стал меньше нужного - его стоит уменьшить вслед за кодом.
+"""
+import pytest
+
+QUERY_BUDGETS = [
+    ("manager", "/projects", 1),
+    ("manager", "/projects/11", 1),
+    ("manager", "/api/v1/objects/?project_id=11", 1),
+    ("manager", "/api/v1/objects/60", 1),
+    ("manager", "/api/v1/defects/?object_id=60", 5),
+    ("manager", "/api/v1/defects/page?project_id=11", 2),
+    ("observer", "/api/v1/defects/page", 2),
+    ("observer", "/api/v1/defects/4242", 3),
+    ("observer", "/api/v1/defects/4242?include=comments,history", 5),
+    ("observer", "/api/v1/defects/4242/comments", 2),
+    ("observer", "/api/v1/defects/4242/history", 2),
+    ("observer", "/api/v1/defects/4245/images", 1),
+    ("observer", "/api/v1/defects/stats/weekly", 1),
+    ("observer", "/api/v1/defects/search?q=4242", 1),
+    ("manager", "/api/v1/projects/11/users", 2),
+    ("manager", "/api/v1/projects/11/available-users", 2),
+    ("manager", "/api/v1/projects/11/dashboard", 6),
+    ("manager", "/api/v1/users/", 1),
+    ("observer", "/api/v1/sync?limit=500", 2),
+    ("manager", "/api/v1/sync?limit=500", 4),
+]
+
+
+@pytest.mark.parametrize("role,path,budget", QUERY_BUDGETS)
+def test_get_query_budget(client, query_budget, role, path, budget):
+    headers = getattr(client, role)
+    # Первый запрос заполняет кэш пользователей - считаем запросы уже без него
+    client.get(path, headers=headers)
+    with query_budget(budget):
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_write_query_budget(client, query_budget):
+    ids = [d["id"] for d in client.get("/api/v1/defects/page?object_id=60&limit=50", headers=client.manager).json()["items"]]
+
+    # Число запросов не зависит от количества дефектов; статистика - один запрос на все дефекты
+    with query_budget(8):
+        response = client.post(
+            "/api/v1/defects/bulk",
+            json={"defect_ids": ids, "changes": {"priority": "HIGH", "assigned_user_ids": [20, 70]}},
+            headers=client.manager,
+        )
+    assert response.status_code == 200
+    assert response.json()["updated"] == len(ids)
+
+    with query_budget(12):
+        response = client.put(
+            f"/api/v1/defects/{ids[0]}", json={"title": "Проверка", "status": "OPEN", "assigned_user_ids": [20]},
+            headers=client.manager,
+        )
+    assert response.status_code == 200
+
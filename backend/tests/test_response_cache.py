@@ -0,0 +1,86 @@
+"""Кэш JSON-ответов (app.services.response_cache): изменения видны сразу после записи через API.
+
+В остальных тестах кэш выключен (RESPONSE_CACHE_BACKEND=none), здесь он включается на время теста.
+"""
+import pytest
+
+PROJECT_ID = 11
+OBJECT_ID = 10
+
+
+@pytest.fixture
+def memory_cache(client, monkeypatch):
+    from app.services.response_cache import MemoryCacheBackend, response_cache
+
+    backend = MemoryCacheBackend(64)
+    monkeypatch.setattr(response_cache, "backend", backend)
+    return backend
+
+
+def object_names(client) -> list:
+    return [item["name"] for item in client.get(f"/api/v1/objects/?project_id={PROJECT_ID}", headers=client.manager).json()]
+
+
+def test_objects_invalidated_after_write(client, memory_cache, db_execute):
+    before = object_names(client)
+    # Запись в обход API кэш не сбрасывает - значит, ответ действительно берётся из кэша
+    db_execute("INSERT INTO objects (name, project_id) VALUES ('Объект в обход API', :project_id)", project_id=PROJECT_ID)
+    assert object_names(client) == before
+
+    created = client.post("/api/v1/objects/", json={"name": "Объект через API", "project_id": PROJECT_ID}, headers=client.manager)
+    assert created.status_code == 200
+    after = object_names(client)
+    assert "Объект в обход API" in after and "Объект через API" in after
+
+
+def test_etag_changes_after_write(client, memory_cache):
+    url = f"/api/v1/objects/?project_id={PROJECT_ID}"
+    first = client.get(url, headers=client.manager)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert client.get(url, headers={**client.manager, "If-None-Match": etag}).status_code == 304
+
+    client.post("/api/v1/objects/", json={"name": "Ещё объект", "project_id": PROJECT_ID}, headers=client.manager)
+    changed = client.get(url, headers={**client.manager, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_weekly_stats_invalidated_after_defect_changes(client, memory_cache):
+    def today() -> dict:
+        return client.get("/api/v1/defects/stats/weekly", headers=client.manager).json()[-1]
+
+    before = today()
+    created = client.post("/api/v1/defects/", headers=client.manager, data={"title": "Для статистики", "object_id": OBJECT_ID})
+    defect_id = created.json()["id"]
+    assert today()["created"] == before["created"] + 1
+
+    assert client.put(f"/api/v1/defects/{defect_id}", json={"status": "CLOSED"}, headers=client.manager).status_code == 200
+    assert today()["resolved"] == before["resolved"] + 1
+
+
+async def _value(data: dict) -> dict:
+    return dict(data)
+
+
+def test_response_built_during_invalidation_is_not_served(client, memory_cache):
+    from app.services.response_cache import ResponseCache
+
+    cache = ResponseCache(memory_cache, ttl=60)
+    data = {"value": 1}
+
+    async def build():
+        # Данные поменялись, пока ответ собирался
+        result = dict(data)
+        data["value"] = 2
+        await cache.invalidate("test")
+        return result
+
+    async def scenario():
+        stale = await cache.get_or_build("test", ("test",), build)
+        fresh = await cache.get_or_build("test", ("test",), lambda: _value(data))
+        cached = await cache.get_or_build("test", ("test",), lambda: _value({"value": 3}))
+        return stale.body, fresh.body, cached.body
+
+    stale, fresh, cached = client.portal.call(scenario)
+    assert stale == b'{"value":1}'
+    assert fresh == cached == b'{"value":2}'
@@ -0,0 +1,147 @@
+"""Синхронизация для офлайн-клиентов (/api/v1/sync, app.services.sync).
+
+Полная синхронизация проекта из сида - десятки тысяч строк, поэтому токен «клиент уже всё получил»
+собирается так же, как его выдаёт последняя страница прохода: xmin текущего снимка, время и набор проектов.
+"""
+import time
+
+import pytest
+
+from tests.conftest import auth_headers
+
+# Проект менеджера client.manager
+PROJECT_ID = 11
+
+
+def sync(client, headers, token=None, **params) -> dict:
+    if token:
+        params["token"] = token
+    response = client.get("/api/v1/sync", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def synced_token(db_scalar):
+    """Токен клиента, который получил всё, что закоммичено к этому моменту."""
+    from app.services.sync import CURRENT_XMIN, encode_sync_token, projects_fingerprint
+
+    def token(project_ids, issued_at: float = None) -> str:
+        return encode_sync_token({"s": db_scalar(CURRENT_XMIN), "t": issued_at or time.time(), "p": projects_fingerprint(project_ids)})
+
+    return token
+
+
+def sync_all(client, headers, token, limit: int = 1000) -> tuple:
+    """Все страницы после token: собранные страницы и токен для следующего раза."""
+    pages = []
+    while True:
+        page = sync(client, headers, token, limit=limit)
+        pages.append(page)
+        token = page["next_token"]
+        if not page["has_more"]:
+            return pages, token
+
+
+def section_ids(pages, section: str) -> list:
+    return [row["id"] for page in pages for row in page[section]]
+
+
+def create_defect(client, object_id: int, title: str) -> int:
+    response = client.post("/api/v1/defects/", headers=client.manager, data={"title": title, "object_id": object_id})
+    return response.json()["id"]
+
+
+def test_change_seq_is_reloaded_after_write(client):
+    from sqlalchemy import inspect, text
+    from app.db.database import AsyncSessionLocal
+    from app.models import DefectComment, Object
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            obj = await db.get(Object, 5)
+            before = obj.change_seq
+            obj.address = "Адрес после синхронизации"
+            comment = DefectComment(content="Комментарий", defect_id=5, user_id=10)
+            db.add(comment)
+            await db.flush()
+            # Номер ставит триггер: после UPDATE ORM не держит старое значение, после INSERT читает его из RETURNING
+            expired = "change_seq" in inspect(obj).unloaded
+            inserted = comment.change_seq
+            current = await db.scalar(text("SELECT pg_current_xact_id()::text::bigint"))
+            await db.refresh(obj, ["change_seq"])
+            updated = obj.change_seq
+            await db.rollback()
+        return before, expired, current, updated, inserted
+
+    before, expired, current, updated, inserted = client.portal.call(scenario)
+    assert expired
+    assert updated == inserted == current != before
+
+
+def test_first_page_of_full_sync(client):
+    page = sync(client, client.manager, limit=10)
+    assert page["reset"] is False and page["has_more"] is True
+    assert len(page["objects"]) == 10 and page["defects"] == []
+    assert all(row["project_id"] == PROJECT_ID for row in page["objects"])
+
+    # Следующая страница продолжает с места остановки
+    following = sync(client, client.manager, page["next_token"], limit=10)
+    assert not set(section_ids([page], "objects")) & set(section_ids([following], "objects"))
+
+
+def test_changes_and_tombstones_since_token(client, synced_token):
+    token = synced_token({PROJECT_ID})
+    object_id = client.post("/api/v1/objects/", json={"name": "Секция 4", "project_id": PROJECT_ID}, headers=client.manager).json()["id"]
+    kept, deleted = create_defect(client, object_id, "Останется"), create_defect(client, object_id, "Будет удалён")
+    comment_id = client.post(f"/api/v1/defects/{kept}/comments", json={"content": "Проверено"}, headers=client.manager).json()["id"]
+    client.put(f"/api/v1/objects/{object_id}", json={"address": "Новый адрес"}, headers=client.manager)
+    assert client.delete(f"/api/v1/defects/{deleted}").status_code == 200
+
+    pages, next_token = sync_all(client, client.manager, token, limit=2)
+    assert len(pages) > 1 and not any(page["reset"] for page in pages)
+    assert section_ids(pages, "objects") == [object_id]
+    assert pages[0]["objects"][0]["address"] == "Новый адрес"
+    assert section_ids(pages, "defects") == [kept]
+    assert section_ids(pages, "comments") == [comment_id]
+    assert "created" in [row["field_name"] for page in pages for row in page["history"] if row["defect_id"] == kept]
+    assert [defect_id for page in pages for defect_id in page["deleted"]["defects"]] == [deleted]
+
+    # Всё получено - следующий раз отдавать нечего
+    again, _ = sync_all(client, client.manager, next_token)
+    assert all(not again[0][section] for section in ("objects", "defects", "comments", "history", "images"))
+    assert again[0]["deleted"]["defects"] == []
+
+
+def test_other_projects_are_not_synced(client, synced_token):
+    token = synced_token({PROJECT_ID})
+    client.put("/api/v1/objects/12", json={"address": "Адрес в проекте 13"}, headers=auth_headers(12))
+    page = sync(client, client.manager, token)
+    assert 12 not in section_ids([page], "objects")
+
+
+def test_expired_token_starts_over(client, synced_token, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", 2)
+    fresh = sync(client, client.manager, synced_token({PROJECT_ID}, time.time() - 3600), limit=1)
+    assert fresh["reset"] is False
+    # Записи об удалениях старше срока хранения стёрты - изменения после такого токена не восстановить
+    expired = sync(client, client.manager, synced_token({PROJECT_ID}, time.time() - 2 * 86400), limit=1)
+    assert expired["reset"] is True and len(expired["objects"]) == 1 and expired["has_more"]
+
+
+def test_membership_change_starts_over(client, synced_token):
+    page = sync(client, client.manager, synced_token({PROJECT_ID, 13}), limit=1)
+    assert page["reset"] is True and page["objects"][0]["project_id"] == PROJECT_ID
+
+    response = client.get("/api/v1/sync", params={"token": "не токен"}, headers=client.manager)
+    assert response.status_code == 400
+
+
+def test_large_page_is_compressed(client):
+    response = client.get("/api/v1/sync", params={"limit": 200}, headers={**client.manager, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == "no-store"
+    # Распакованный ответ - обычная страница (20 объектов проекта из сида и созданные тестами)
+    assert len(response.json()["objects"]) >= 20
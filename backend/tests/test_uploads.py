@@ -0,0 +1,159 @@
+"""Приём изображений: пределы размера и типа, пакетная загрузка и возобновляемые загрузки tus."""
+import base64
+import hashlib
+import uuid
+
+# Дефект в проекте 11 - проекте менеджера client.manager; дефект 4242 - в чужом проекте
+DEFECT_ID = 59
+OTHER_DEFECT_ID = 4242
+
+TUS = {"Tus-Resumable": "1.0.0"}
+CHUNK = {"Content-Type": "application/offset+octet-stream"}
+
+
+def png(size: int = 64) -> bytes:
+    body = uuid.uuid4().bytes * (size // 16 + 1)
+    return (b"\x89PNG\r\n\x1a\n" + body)[:size]
+
+
+def image_count(client, defect_id: int = DEFECT_ID) -> int:
+    return len(client.get(f"/api/v1/defects/{defect_id}/images", headers=client.manager).json())
+
+
+def blob_exists(data: bytes) -> bool:
+    from app.services.storage import get_blob_store, key_for_hash
+
+    return get_blob_store().exists(key_for_hash(hashlib.sha256(data).hexdigest()))
+
+
+def create_upload(client, length: int, defect_id: int = DEFECT_ID):
+    metadata = ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in (("defect_id", str(defect_id)), ("filename", "photo.png"))
+    )
+    return client.post("/api/v1/uploads", headers={**client.manager, **TUS, "Upload-Length": str(length), "Upload-Metadata": metadata})
+
+
+def patch(client, location: str, offset: int, body: bytes, headers=CHUNK):
+    return client.patch(location, content=body, headers={**client.manager, **TUS, **headers, "Upload-Offset": str(offset)})
+
+
+def test_image_upload_is_stored(client):
+    data = png()
+    before = image_count(client)
+    response = client.post(f"/api/v1/defects/{DEFECT_ID}/images", files={"image": ("photo.png", data)}, headers=client.manager)
+    assert response.status_code == 200
+    assert image_count(client) == before + 1
+    assert blob_exists(data)
+
+
+def test_image_upload_limits(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "UPLOAD_MAX_SIZE", 100)
+    too_large = client.post(f"/api/v1/defects/{DEFECT_ID}/images", files={"image": ("photo.png", png(200))}, headers=client.manager)
+    assert too_large.status_code == 413
+    not_image = client.post(f"/api/v1/defects/{DEFECT_ID}/images", files={"image": ("photo.png", b"plain text")}, headers=client.manager)
+    assert not_image.status_code == 415
+
+
+def test_batch_upload(client):
+    first, second = png(), png()
+    before = image_count(client)
+    response = client.post(
+        f"/api/v1/defects/{DEFECT_ID}/images/batch",
+        files=[("images", ("1.png", first)), ("images", ("2.png", second))],
+        headers=client.manager,
+    )
+    assert response.status_code == 200
+    assert len(response.json()["image_ids"]) == 2
+    assert image_count(client) == before + 2
+
+
+def test_batch_upload_is_all_or_nothing(client):
+    good = png()
+    before = image_count(client)
+    response = client.post(
+        f"/api/v1/defects/{DEFECT_ID}/images/batch",
+        files=[("images", ("1.png", good)), ("images", ("2.txt", b"plain text"))],
+        headers=client.manager,
+    )
+    assert response.status_code == 415
+    assert image_count(client) == before
+    # Уже сохранённый файл первой части удалён
+    assert not blob_exists(good)
+
+
+def test_batch_upload_limits(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "UPLOAD_MAX_FILES", 1)
+    response = client.post(
+        f"/api/v1/defects/{DEFECT_ID}/images/batch",
+        files=[("images", ("1.png", png())), ("images", ("2.png", png()))],
+        headers=client.manager,
+    )
+    assert response.status_code == 413
+    forbidden = client.post(
+        f"/api/v1/defects/{OTHER_DEFECT_ID}/images/batch", files=[("images", ("1.png", png()))], headers=client.manager
+    )
+    assert forbidden.status_code == 403
+
+
+def test_resumable_upload(client):
+    data = png(1000)
+    before = image_count(client)
+    options = client.options("/api/v1/uploads")
+    assert options.headers["Tus-Version"] == "1.0.0"
+
+    created = create_upload(client, len(data))
+    assert created.status_code == 201
+    location = created.headers["Location"]
+    assert client.head(location, headers=client.manager).headers["Upload-Offset"] == "0"
+
+    first = patch(client, location, 0, data[:400])
+    assert first.status_code == 204 and first.headers["Upload-Offset"] == "400"
+    # После обрыва клиент узнаёт принятое смещение и продолжает с него
+    head = client.head(location, headers=client.manager)
+    assert head.headers["Upload-Offset"] == "400" and head.headers["Upload-Length"] == str(len(data))
+    assert patch(client, location, 100, data[100:]).status_code == 409
+    assert patch(client, location, 400, data[400:], headers={"Content-Type": "application/octet-stream"}).status_code == 415
+
+    last = patch(client, location, 400, data[400:])
+    assert last.status_code == 204 and last.headers["Upload-Offset"] == str(len(data))
+    assert last.headers["X-Image-Id"]
+    assert image_count(client) == before + 1
+    assert blob_exists(data)
+    assert client.head(location, headers=client.manager).status_code == 404
+
+
+def test_resumable_upload_limits(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "UPLOAD_MAX_SIZE", 100)
+    assert create_upload(client, 200).status_code == 413
+
+    location = create_upload(client, 50).headers["Location"]
+    assert patch(client, location, 0, png(60)).status_code == 413
+
+    location = create_upload(client, 50).headers["Location"]
+    assert patch(client, location, 0, b"plain text" * 5).status_code == 415
+    # Отвергнутый файл не сохраняется, загрузку можно начать заново
+    assert client.head(location, headers=client.manager).headers["Upload-Offset"] == "0"
+
+
+def test_resumable_upload_bad_metadata(client):
+    headers = {**client.manager, **TUS, "Upload-Length": "10"}
+    not_base64 = client.post("/api/v1/uploads", headers={**headers, "Upload-Metadata": "defect_id %%%"})
+    assert not_base64.status_code == 400 and "defect_id" in not_base64.json()["detail"]
+    no_defect = client.post("/api/v1/uploads", headers={**headers, "Upload-Metadata": "filename cGhvdG8ucG5n"})
+    assert no_defect.status_code == 400
+
+
+def test_resumable_upload_without_access_leaves_no_blob(client, db_execute):
+    data = png(100)
+    location = create_upload(client, len(data)).headers["Location"]
+    # Пока файл передавался, дефект оказался вне проектов пользователя
+    db_execute("UPDATE uploads SET defect_id = :defect_id WHERE id = :id", defect_id=OTHER_DEFECT_ID, id=location.rsplit("/", 1)[1])
+
+    assert patch(client, location, 0, data).status_code == 403
+    assert not blob_exists(data)
@@ -0,0 +1,85 @@
+import { useEffect, useRef } from "react";
+
+export interface ChangeEvent {
+    id: number;
+    kind: string;
+    project_id: number;
+    defect_id: number | null;
+    user_id: number | null;
+    data: any;
+    created_at: string;
+}
+
+const baseUrl = () => `${new URL(document.URL).protocol}//${new URL(document.URL).hostname}:8000`;
+
+// Сколько последних id событий помнить для отбрасывания повторов
+const SEEN_LIMIT = 1000;
+
+// Лента изменений (SSE) через fetch: EventSource не умеет передавать заголовок Authorization.
+// После обрыва переподключается и дочитывает пропущенное по последнему id потока (границе, а не номеру события).
+// События у границы сервер может прислать повторно - они отбрасываются по id события
+export function useEventStream(path: string | null, onEvent: (event: ChangeEvent) => void) {
+    const handler = useRef(onEvent);
+    handler.current = onEvent;
+
+    useEffect(() => {
+        if (!path) return;
+        const controller = new AbortController();
+        let lastEventId: number | null = null;
+        const seen = new Set<number>();
+
+        const connect = async () => {
+            while (!controller.signal.aborted) {
+                try {
+                    const url = new URL(`${baseUrl()}${path}`);
+                    if (lastEventId !== null) url.searchParams.set("last_event_id", String(lastEventId));
+                    const response = await fetch(url, {
+                        headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` },
+                        signal: controller.signal,
+                    });
+                    if (!response.ok || !response.body) {
+                        // 403/404 - подписка бессмысленна
+                        if (response.status < 500) return;
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                    let buffer = "";
+                    for (;;) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += value;
+                        let boundary;
+                        while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+                            const message = buffer.slice(0, boundary);
+                            buffer = buffer.slice(boundary + 2);
+                            let kind = "message", data = "", id: number | null = null;
+                            for (const line of message.split("\n")) {
+                                if (line.startsWith("event:")) kind = line.slice(6).trim();
+                                else if (line.startsWith("data:")) data += line.slice(5).trim();
+                                else if (line.startsWith("id:")) id = Number(line.slice(3).trim());
+                            }
+                            if (id !== null) lastEventId = id;
+                            if (kind === "reset") {
+                                seen.clear();
+                                handler.current({ id: id ?? 0, kind, project_id: 0, defect_id: null, user_id: null, data: null, created_at: "" });
+                            } else if (data) {
+                                const event: ChangeEvent = JSON.parse(data);
+                                if (seen.has(event.id)) continue;
+                                seen.add(event.id);
+                                if (seen.size > SEEN_LIMIT) seen.delete(seen.values().next().value as number);
+                                handler.current(event);
+                            }
+                        }
+                    }
+                } catch (error) {
+                    if (controller.signal.aborted) return;
+                    console.error(error);
+                }
+                await new Promise(resolve => setTimeout(resolve, 2000));
+            }
+        };
+
+        connect();
+        return () => controller.abort();
+    }, [path]);
+}
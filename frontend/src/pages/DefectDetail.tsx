@@ -6,6 +6,7 @@ import axios from "axios";
 import Carousel from 'react-multi-carousel';
 import 'react-multi-carousel/lib/styles.css';
 import EditDefectModal from "../components/EditDefectModal";
+import {useEventStream} from "../hooks/useEventStream";
 
 interface Defect {
     id: number;
@@ -56,6 +57,23 @@ interface OutletContext {
     setHeader: (name: string | "Пиздец") => void;
 }
 
+// Точка карусели - миниатюра изображения (size=thumb); props onClick, active и index передаёт Carousel
+const ThumbnailDot = ({onClick, active, index, sources}: { onClick?: () => void; active?: boolean; index?: number; sources: string[] }) => (
+    <button onClick={onClick} className={`m-1 rounded ${active ? 'ring-2 ring-yellow-500' : 'opacity-60'}`}>
+        <img src={sources[index ?? 0]} alt="" className="h-12 w-12 object-cover rounded"/>
+    </button>
+);
+
+// Комментарии и история загружаются страницами: сначала новые, более ранние - по кнопке
+const PAGE_SIZE = 50;
+
+// Объединяет загруженные страницы без повторов, от старых к новым
+const mergeById = <T extends { id: number; created_at: string }>(current: T[], incoming: T[]) => {
+    const byId = new Map(current.map(item => [item.id, item]));
+    incoming.forEach(item => byId.set(item.id, item));
+    return Array.from(byId.values()).sort((a, b) => a.created_at.localeCompare(b.created_at) || a.id - b.id);
+};
+
 function DefectDetail() {
     const { setHeader } = useOutletContext<OutletContext>();
     const {projectId, defectId} = useParams<{ projectId: string; defectId: string }>();
@@ -69,6 +87,9 @@ function DefectDetail() {
     const [newComment, setNewComment] = useState("");
     const [currentUserId, setCurrentUserId] = useState<number | null>(null);
     const [images, setImages] = useState<{id: number, filename: string}[]>([]);
+    // Курсоры следующих (более ранних) страниц; null - всё загружено
+    const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
+    const [historyCursor, setHistoryCursor] = useState<string | null>(null);
 
     const baseUrl = `${new URL(document.URL).protocol}//${new URL(document.URL).hostname}:8000`;
 
@@ -141,13 +162,16 @@ function DefectDetail() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [defectRes, usersRes, imagesRes] = await Promise.all([
-                    api.get(`/api/v1/defects/${defectId}`),
+                const [defectRes, commentsRes, usersRes, imagesRes] = await Promise.all([
+                    api.get(`/api/v1/defects/${defectId}?include=history&limit=${PAGE_SIZE}`),
+                    api.get(`/api/v1/defects/${defectId}/comments`, {params: {order: 'desc', limit: PAGE_SIZE}}),
                     api.get('/api/v1/users/'),
                     api.get(`/api/v1/defects/${defectId}/images`)
                 ]);
 
-                setDefect(defectRes.data);
+                setDefect({...defectRes.data, comments: mergeById([], commentsRes.data.items)});
+                setCommentsCursor(commentsRes.data.next_cursor);
+                setHistoryCursor(defectRes.data.history_next_cursor);
                 setHeader(defectRes.data.title)
                 setUsers(usersRes.data);
                 setImages(imagesRes.data);
@@ -166,10 +190,64 @@ function DefectDetail() {
         }
     }, [defectId, projectId, navigate]);
 
+    // PUT возвращает только сам дефект - комментарии сохраняем, к истории добавляем новые записи
+    const applyDefectUpdate = async (updated: Defect) => {
+        setDefect(prev => ({...updated, comments: prev?.comments ?? [], history: prev?.history ?? []}));
+        const historyRes = await api.get(`/api/v1/defects/${defectId}/history`, {params: {limit: PAGE_SIZE}});
+        setDefect(prev => prev ? {...prev, history: mergeById(prev.history, historyRes.data.items)} : null);
+    };
+
+    const loadOlderComments = async () => {
+        if (!commentsCursor) return;
+        try {
+            const response = await api.get(`/api/v1/defects/${defectId}/comments`, {
+                params: {order: 'desc', limit: PAGE_SIZE, cursor: commentsCursor}
+            });
+            setDefect(prev => prev ? {...prev, comments: mergeById(prev.comments, response.data.items)} : null);
+            setCommentsCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error(error);
+        }
+    };
+
+    const loadOlderHistory = async () => {
+        if (!historyCursor) return;
+        try {
+            const response = await api.get(`/api/v1/defects/${defectId}/history`, {
+                params: {limit: PAGE_SIZE, cursor: historyCursor}
+            });
+            setDefect(prev => prev ? {...prev, history: mergeById(prev.history, response.data.items)} : null);
+            setHistoryCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error(error);
+        }
+    };
+
+    // Изменения от других пользователей приходят по ленте событий - страницу не нужно обновлять
+    useEventStream(defectId ? `/api/v1/defects/${defectId}/events` : null, async (event) => {
+        try {
+            if (event.kind === "defect.deleted") {
+                navigate(`/projects/${projectId}`);
+            } else if (event.kind === "comment.created") {
+                const commentsRes = await api.get(`/api/v1/defects/${defectId}/comments`, {params: {order: 'desc', limit: PAGE_SIZE}});
+                setDefect(prev => prev ? {...prev, comments: mergeById(prev.comments, commentsRes.data.items)} : null);
+            } else if (event.kind === "image.added" || event.kind === "image.deleted" || event.kind === "photo.deleted") {
+                const imagesRes = await api.get(`/api/v1/defects/${defectId}/images`);
+                setImages(imagesRes.data);
+            } else if (event.kind === "defect.updated" || event.kind === "reset") {
+                const defectRes = await api.get(`/api/v1/defects/${defectId}`);
+                await applyDefectUpdate(defectRes.data);
+                setAssignedUsers(users.filter(user => defectRes.data.assigned_user_ids.includes(user.id)));
+            }
+        } catch (error) {
+            console.error(error);
+        }
+    });
+
     const updateDefectStatus = async (status: string) => {
         try {
             const response = await api.put(`/api/v1/defects/${defectId}`, {status});
-            setDefect(response.data);
+            await applyDefectUpdate(response.data);
         } catch (error) {
             console.error(error);
         }
@@ -178,7 +256,7 @@ function DefectDetail() {
     const updateDefect = async (data: any) => {
         try {
             const response = await api.put(`/api/v1/defects/${defectId}`, data);
-            setDefect(response.data);
+            await applyDefectUpdate(response.data);
             setHeader(response.data.title)
             setAssignedUsers(users.filter(user => response.data.assigned_user_ids.includes(user.id)));
             setIsEditing(false);
@@ -205,7 +283,7 @@ function DefectDetail() {
             const response = await api.post(`/api/v1/defects/${defectId}/comments`, {
                 content: newComment
             });
-            setDefect(prev => prev ? {...prev, comments: [...prev.comments, response.data]} : null);
+            setDefect(prev => prev ? {...prev, comments: mergeById(prev.comments, [response.data])} : null);
             setNewComment("");
         } catch (error) {
             console.error(error);
@@ -216,6 +294,13 @@ function DefectDetail() {
         return <div>Загрузка...</div>;
     }
 
+    // Карусель показывает превью, точки - миниатюры; исходный файл открывается только по ссылке
+    const imageUrls = [
+        ...(defect.has_photo ? [`${baseUrl}/api/v1/defects/${defect.id}/photo`] : []),
+        ...images.map(image => `${baseUrl}/api/v1/defects/${defect.id}/images/${image.id}`),
+    ];
+    const imageNames = [...(defect.has_photo ? ['Фото дефекта'] : []), ...images.map(image => image.filename)];
+
     const statusColors = {
         NEW: 'bg-gray-500 text-shadow-[0_0_12px_white] font-bold',
         OPEN: 'bg-red-500 text-shadow-[0_0_12px_white] font-bold',
@@ -298,25 +383,21 @@ function DefectDetail() {
                                 }}
                                 infinite
                                 showDots
+                                renderDotsOutside
+                                customDot={<ThumbnailDot sources={imageUrls.map(url => `${url}?size=thumb`)}/>}
                                 arrows
                                 className="w-full"
                             >
-                                {defect.has_photo && (
-                                    <div className="flex justify-center">
-                                        <img
-                                            src={`${baseUrl}/api/v1/defects/${defect.id}/photo`}
-                                            alt="Фото дефекта"
-                                            className="max-h-96 object-contain"
-                                        />
-                                    </div>
-                                )}
-                                {images.map((image) => (
-                                    <div key={image.id} className="flex justify-center">
+                                {imageUrls.map((url, index) => (
+                                    <div key={url} className="flex flex-col items-center">
                                         <img
-                                            src={`${baseUrl}/api/v1/defects/${defect.id}/images/${image.id}`}
-                                            alt={image.filename}
+                                            src={`${url}?size=preview`}
+                                            alt={imageNames[index]}
                                             className="max-h-96 object-contain"
                                         />
+                                        <a href={url} target="_blank" rel="noreferrer" className="mt-2 text-sm text-gray-500 hover:text-black">
+                                            Открыть оригинал
+                                        </a>
                                     </div>
                                 ))}
                             </Carousel>
@@ -385,6 +466,14 @@ function DefectDetail() {
                     {/* Комментарии */}
                     <div className="mt-8">
                         <h2 className="text-xl font-semibold mb-4">Комментарии</h2>
+                        {commentsCursor && (
+                            <button
+                                onClick={loadOlderComments}
+                                className="mb-4 px-4 py-2 rounded-lg transition-all duration-200 hover:bg-[#efefef] bg-[#fafafa]"
+                            >
+                                Показать более ранние
+                            </button>
+                        )}
                         <div className="space-y-4 mb-4">
                             {defect.comments?.map(comment => (
                                 <div key={comment.id} className="bg-gray-50 p-4 rounded-lg">
@@ -434,6 +523,14 @@ function DefectDetail() {
                                 </div>
                             ))}
                         </div>
+                        {historyCursor && (
+                            <button
+                                onClick={loadOlderHistory}
+                                className="mt-4 px-4 py-2 rounded-lg transition-all duration-200 hover:bg-[#efefef] bg-[#fafafa]"
+                            >
+                                Показать более ранние
+                            </button>
+                        )}
                     </div>
                 </div>
 
@@ -6,6 +6,7 @@ import ProjectUsersModal from "../components/ProjectUsersModal";
 import CreateObjectModal from "../components/CreateObjectModal";
 import CreateDefectModal from "../components/CreateDefectModal";
 import EditObjectModal from "../components/EditObjectModal";
+import { useEventStream } from "../hooks/useEventStream";
 
 interface Project {
     id: number;
@@ -18,6 +19,9 @@ interface ObjectType {
     description?: string;
     address?: string;
     project_id: number;
+    // Есть только у объектов из сводки проекта
+    defect_counts?: { [status: string]: number };
+    defect_total?: number;
 }
 
 interface Defect {
@@ -38,6 +42,14 @@ interface User {
     role: string;
 }
 
+interface ProjectDashboard {
+    project: Project;
+    objects: ObjectType[];
+    defects: { items: Defect[]; next_cursor: string | null };
+    engineers: User[];
+    current_user: User;
+}
+
 interface OutletContext {
     setHeader: (name: string) => void;
 }
@@ -49,8 +61,10 @@ function ProjectDetail() {
     const [project, setProject] = useState<Project | null>(null);
     const [objects, setObjects] = useState<ObjectType[]>([]);
     const [defects, setDefects] = useState<Defect[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [users, setUsers] = useState<User[]>([]);
     const [searchTerm, setSearchTerm] = useState("");
+    const [searchIds, setSearchIds] = useState<Set<number> | null>(null);
     const [statusFilter, setStatusFilter] = useState("");
     const [priorityFilter, setPriorityFilter] = useState("");
     const { userRole = 'OBSERVER' } = useOutletContext<{ userRole?: string }>();
@@ -76,46 +90,27 @@ function ProjectDetail() {
         return priorityMap[priority] || priority;
     };
 
+    // Проект, объекты со счётчиками, первая страница дефектов, инженеры и текущий пользователь - одним запросом
+    const fetchDashboard = async () => {
+        const response = await axios.get<ProjectDashboard>(`${baseUrl}/api/v1/projects/${id}/dashboard`, {
+            params: { limit: 200 },
+            headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
+        });
+        const dashboard = response.data;
+        setProject(dashboard.project);
+        setHeader(dashboard.project.title);
+        setObjects(dashboard.objects);
+        setDefects(dashboard.defects.items);
+        setNextCursor(dashboard.defects.next_cursor);
+        setUsers(dashboard.engineers);
+        setCurrentUserId(dashboard.current_user.id);
+        setCurrentUserRole(dashboard.current_user.role);
+    };
+
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [projectRes, objectsRes, defectsRes] = await Promise.all([
-                    axios.get(`${baseUrl}/projects/${id}`, {
-                        headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                    }),
-                    axios.get(`${baseUrl}/api/v1/objects/?project_id=${id}`, {
-                        headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                    }),
-                    axios.get(`${baseUrl}/api/v1/defects/`, {
-                        headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                    })
-                ]);
-
-                setProject(projectRes.data);
-                setHeader(projectRes.data.title);
-                setObjects(objectsRes.data);
-                setDefects(defectsRes.data);
-                
-                // Получить доступных пользователей для дефектов (только инженеры из проекта)
-                const availableUsersRes = await axios.get(`${baseUrl}/api/v1/projects/${id}/available-users`, {
-                    headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                });
-                setUsers(availableUsersRes.data);
-                
-                // Найти текущего пользователя
-                const userInfoRes = await axios.get(`${baseUrl}/userinfo`, {
-                    headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                });
-                
-                const allUsersRes = await axios.get(`${baseUrl}/api/v1/users/`, {
-                    headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
-                });
-                
-                const currentUser = allUsersRes.data.find((u: User) => u.nickname === userInfoRes.data.nickname);
-                if (currentUser) {
-                    setCurrentUserId(currentUser.id);
-                    setCurrentUserRole(currentUser.role);
-                }
+                await fetchDashboard();
             } catch (error) {
                 console.log(error);
                 navigate('/projects');
@@ -127,6 +122,62 @@ function ProjectDetail() {
         }
     }, [id, navigate]);
 
+    // Следующие страницы дефектов проекта по курсору из сводки
+    const loadMoreDefects = async () => {
+        if (!nextCursor) return;
+        try {
+            const response = await axios.get(`${baseUrl}/api/v1/defects/page`, {
+                params: { project_id: id, cursor: nextCursor, limit: 200 },
+                headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
+            });
+            setDefects(prev => [...prev, ...response.data.items.filter((item: Defect) => !prev.some(defect => defect.id === item.id))]);
+            setNextCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error(error);
+        }
+    };
+
+    // Новые и изменённые дефекты приходят по ленте событий проекта
+    useEventStream(id ? `/api/v1/projects/${id}/events` : null, async (event) => {
+        const headers = { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` };
+        try {
+            if (event.kind === "defect.deleted") {
+                setDefects(prev => prev.filter(defect => defect.id !== event.defect_id));
+            } else if ((event.kind === "defect.created" || event.kind === "defect.updated") && event.defect_id) {
+                const defectRes = await axios.get(`${baseUrl}/api/v1/defects/${event.defect_id}`, { headers });
+                setDefects(prev => prev.some(defect => defect.id === defectRes.data.id)
+                    ? prev.map(defect => defect.id === defectRes.data.id ? { ...defect, ...defectRes.data } : defect)
+                    : [...prev, defectRes.data]);
+            } else if (event.kind === "defects.imported" || event.kind === "object.deleted" || event.kind === "reset") {
+                // Перечитываем только этот проект, а не все дефекты
+                await fetchDashboard();
+            }
+        } catch (error) {
+            console.error(error);
+        }
+    });
+
+    // Поиск на сервере (названия, описания, комментарии, объекты) с задержкой после ввода
+    useEffect(() => {
+        const query = searchTerm.trim();
+        if (!query) {
+            setSearchIds(null);
+            return;
+        }
+        const timer = setTimeout(async () => {
+            try {
+                const response = await axios.get(`${baseUrl}/api/v1/defects/search`, {
+                    params: { q: query, project_id: id, limit: 200 },
+                    headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
+                });
+                setSearchIds(new Set(response.data.items.map((item: { id: number }) => item.id)));
+            } catch (error) {
+                console.error(error);
+            }
+        }, 300);
+        return () => clearTimeout(timer);
+    }, [searchTerm, id]);
+
     const createObject = async (name: string, description: string, address: string) => {
         try {
             const response = await axios.post(`${baseUrl}/api/v1/objects/`, {
@@ -185,7 +236,9 @@ function ProjectDetail() {
 
 
     const filteredDefects = defects.filter(defect => {
-        const matchesSearch = defect.title.toLowerCase().includes(searchTerm.toLowerCase());
+        const matchesSearch = !searchTerm.trim() || (searchIds
+            ? searchIds.has(defect.id)
+            : defect.title.toLowerCase().includes(searchTerm.toLowerCase()));
         const matchesStatus = !statusFilter || defect.status === statusFilter;
         const matchesPriority = !priorityFilter || defect.priority === priorityFilter;
         const matchesAssignedToMe = !assignedToMeFilter || (currentUserId && defect.assigned_user_ids.includes(currentUserId));
@@ -299,7 +352,12 @@ function ProjectDetail() {
                     <div key={object.id} className="w-full flex flex-row justify-center">
                     <div className="bg-white/50 rounded-lg p-4 md:w-[80vw] w-full">
                         <div className="flex justify-between items-center mb-4">
-                            <h2 className="text-xl font-bold">{object.name}</h2>
+                            <h2 className="text-xl font-bold">
+                                {object.name}
+                                {object.defect_total !== undefined && (
+                                    <span className="ml-2 text-sm font-normal text-gray-600">дефектов: {object.defect_total}</span>
+                                )}
+                            </h2>
                             <div className="flex gap-2">
                                 <button
                                     onClick={() => setEditingObject(object)}
@@ -353,6 +411,17 @@ function ProjectDetail() {
                     </div>
                 ))}
 
+                {nextCursor && (
+                    <div className="w-full flex flex-row justify-center p-4">
+                        <button
+                            onClick={loadMoreDefects}
+                            className="px-4 py-2 rounded-lg transition-all duration-200 hover:bg-[#efefef] bg-[#fafafa]"
+                        >
+                            Загрузить ещё дефекты
+                        </button>
+                    </div>
+                )}
+
                 {/* Модальные окна */}
                 {showCreateObject && <CreateObjectModal onClose={() => setShowCreateObject(false)} onCreate={createObject} />}
                 {showCreateDefect && <CreateDefectModal objectId={showCreateDefect} users={users} onClose={() => setShowCreateDefect(null)} onCreate={createDefect} />}